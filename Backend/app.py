@@ -3,13 +3,31 @@ import re
 import json
 import csv
 import io
-from flask import Flask, jsonify, request, make_response
+import threading
+import zlib
+import click
+from flask import Flask, Response, jsonify, request, g, stream_with_context, send_file, url_for
+from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from flask_cors import CORS
 from werkzeug.security import check_password_hash
 from pydantic import BaseModel, field_validator, ValidationError, Field
 from typing import List, Optional
-from datetime import datetime, date, timezone
+from datetime import datetime, date, timezone, timedelta
 import sys # Import sys for logging
+import hashing
+from hashing import HashingBusyError
+from throttle import TokenBucketLimiter
+from identity_cache import IdentityCache, Identity
+from report_jobs import ReportJobManager, DONE
+import parallel_reports
+from skill_analytics import skill_gap_cache, mark_skills_changed
+from olap_snapshot import FACTS as PIVOT_FACTS, OlapSnapshot, PivotError, mark_rows_changed
+from table_versions import VersionedCache
+from commit_hooks import on_commit, queue as queue_after_commit
+from event_stream import broker, format_message, queue_invite_updates
+from report_definitions import compile_definition, filter_clause, skill_match, ReportDefinitionError
+from sqlalchemy import event
+from sqlalchemy.dialects import sqlite
 
 # Import all models and the db object from your models.py
 # Update: includes EventInvite and Notification module because apparently these didn't exist back then - Will
@@ -21,35 +39,194 @@ from models import (
     VolunteerHistory,
     States,
     EventInvite,
-    Notification
+    Notification,
+    VolunteerStats,
+    ActivityLog,
+    DailyRollup,
+    AvailabilityDay,
+    NotificationReceipt,
+    BroadcastCounter,
+    normalize_email
+)
+from volunteer_stats import delete_history, delete_invites, rebuild_volunteer_stats, stats_for_user
+from daily_rollups import METRICS as ROLLUP_METRICS, add_counts, daily_series, rebuild_daily_rollups
+from availability import add_profiles, availability_by_day, rebuild_availability
+from notification_counters import (
+    DEFAULT_AUDIENCE, addressed_to, delete_user_notifications, import_legacy_read_flags, mark_all_read, mark_read,
+    mark_read_for_audience, rebuild_notification_counters, unread_count
 )
 
 # App & DB Setup
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 app = Flask(__name__)
 # Make sure your React app is running on 5173
-CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173"])
+CORS(app, origins=["http://localhost:5173", "http://127.0.0.1:5173"], expose_headers=["X-Next-Cursor", "X-Next-Watermark", "X-Total-Count"])
 app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(BASE_DIR, 'volunteer.db')}"
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Signs session tokens; set SECRET_KEY in the environment so tokens survive restarts
+# and work across workers (tokens signed with another key just fall back to the email lookup)
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY') or os.urandom(32).hex()
+if not os.environ.get('SECRET_KEY'):
+    print("WARNING: SECRET_KEY is not set; session tokens only work in this process", file=sys.stderr)
+app.config['SESSION_TOKEN_MAX_AGE'] = 12 * 60 * 60
+app.config['IDENTITY_CACHE_SIZE'] = 10000
+
+# Pending invites older than this (or for events that already happened) get expired
+app.config['INVITE_EXPIRY_DAYS'] = int(os.environ.get('INVITE_EXPIRY_DAYS', 30))
+app.config['INVITE_SWEEP_BATCH_SIZE'] = 500
+# 0 turns the in-process sweeper off (e.g. when cron runs `flask expire-invites` instead)
+app.config['INVITE_SWEEP_INTERVAL_SECONDS'] = int(os.environ.get('INVITE_SWEEP_INTERVAL_SECONDS', 3600))
+
+# Login throttling: burst = attempts allowed at once, rate = attempts regained per second
+app.config['LOGIN_THROTTLE_IP_BURST'] = 30
+app.config['LOGIN_THROTTLE_IP_RATE'] = 0.5
+app.config['LOGIN_THROTTLE_EMAIL_BURST'] = 10
+app.config['LOGIN_THROTTLE_EMAIL_RATE'] = 1 / 6
 
 # Link the db object from models.py to our app
 db.init_app(app)
 
 
 #  Helper Function to create notifications 
-def create_notification(message, msg_type='info'):
-    """Helper to create a new notification."""
+def create_notification(message, msg_type='info', recipient=None):
+    """Helper to create a new notification: to one user when recipient is given, else to the admins."""
     try:
         # We must be inside an app context to do database operations
-            new_notif = Notification(message=message, type=msg_type)
+            new_notif = Notification(message=message, type=msg_type,
+                                     recipient_id=recipient.id if recipient is not None else None)
             db.session.add(new_notif)
             db.session.commit()
     except Exception as e:
         print(f"Error creating notification: {e}", file=sys.stderr)
         db.session.rollback()
 
+
+def log_activity(activity_type, user=None, event=None, user_email=None):
+    """Add an activity_log row to the current transaction; it commits with the change it describes."""
+    db.session.add(ActivityLog(
+        type=activity_type,
+        user_email=user.email if user is not None else user_email,
+        user_id=user.id if user is not None else None,
+        event_name=event.event_name if event is not None else None,
+        event_id=event.id if event is not None else None
+    ))
+
+#  Session Tokens 
+def _token_serializer():
+    return URLSafeTimedSerializer(app.config['SECRET_KEY'], salt='session-token')
+
+
+def issue_session_token(user):
+    """Signed token carrying the user's id, role and normalized email."""
+    return _token_serializer().dumps({"uid": user.id, "role": user.role, "email": user.email_normalized})
+
+
+@app.before_request
+def load_session_token():
+    """Verify 'Authorization: Bearer <token>' if sent; no database access.
+
+    Sets g.current_user to {"user_id", "role", "email"} or None. The token only
+    saves the email lookup, so a bad or expired one (e.g. signed by another
+    worker or before a restart) is ignored and the request is handled the old way.
+    """
+    g.current_user = None
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        payload = _token_serializer().loads(header[7:], max_age=app.config['SESSION_TOKEN_MAX_AGE'])
+    except BadSignature:
+        # SignatureExpired is a BadSignature too
+        return None
+    g.current_user = {"user_id": payload["uid"], "role": payload["role"], "email": payload["email"]}
+    return None
+
+
+identity_cache = IdentityCache(maxsize=app.config['IDENTITY_CACHE_SIZE'])
+
+
+def _invalidate_identity(mapper, connection, target):
+    # UserProfile shares its primary key with UserCredentials. Evicting now
+    # would let a concurrent lookup re-cache the pre-commit row; wait for the commit.
+    queue_after_commit(db.inspect(target).session, "identity_cache", target.id)
+
+
+for _model in (UserCredentials, UserProfile):
+    for _event_name in ('after_insert', 'after_update', 'after_delete'):
+        event.listen(_model, _event_name, _invalidate_identity)
+
+
+@on_commit("identity_cache")
+def _evict_committed_identities(user_ids):
+    for user_id in set(user_ids):
+        identity_cache.invalidate_user(user_id)
+
+# Ids mean nothing once the tables are rebuilt
+event.listen(db.metadata, 'after_create', lambda *args, **kwargs: identity_cache.clear())
+event.listen(db.metadata, 'after_drop', lambda *args, **kwargs: identity_cache.clear())
+event.listen(db.metadata, 'after_create', lambda *args, **kwargs: skill_gap_cache.invalidate())
+
+
+def get_identity(email):
+    """(user_id, role, full_name) for an email from the LRU cache; one joined query on a miss."""
+    key = normalize_email(email)
+    if not key:
+        return None
+    identity = identity_cache.get(key)
+    if identity is None:
+        generation = identity_cache.generation()
+        row = UserCredentials.query.outerjoin(
+            UserProfile, UserProfile.id == UserCredentials.id
+        ).with_entities(
+            UserCredentials.id, UserCredentials.role, UserProfile.full_name
+        ).filter(UserCredentials.email_normalized == key).first()
+        if row is None:
+            return None
+        identity = Identity(*row)
+        identity_cache.put(key, identity, generation)
+    return identity
+
+
+def resolve_user_id(email):
+    """User id for an email from the URL: session token first, then the identity cache.
+
+    Only reads trust the token; it can outlive a deleted account or a role
+    change, so anything that changes data goes through the identity cache.
+    """
+    current = g.get('current_user')
+    if current and email and request.method in ('GET', 'HEAD') and current['email'] == normalize_email(email):
+        return current['user_id']
+    identity = get_identity(email)
+    return identity.user_id if identity else None
+
+
+def find_user_by_email(email):
+    """Case-insensitive user lookup through the email_normalized unique index."""
+    if not email:
+        return None
+    return UserCredentials.query.filter_by(email_normalized=normalize_email(email)).first()
+
+login_ip_limiter = TokenBucketLimiter()
+login_email_limiter = TokenBucketLimiter()
+
+
+def too_many_attempts_response(retry_after):
+    """429 for throttled login attempts."""
+    response = jsonify({"message": "Too many login attempts, please try again later"})
+    response.headers["Retry-After"] = str(retry_after)
+    return response, 429
+
+
+def server_busy_response():
+    """503 for when we shed load instead of queueing more work."""
+    response = jsonify({"message": "Server is busy, please try again shortly"})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 #  Pydantic Models for Data Validation 
 
+EMAIL_PATTERN = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
 class UserRegistration(BaseModel):
     email: str
     password: str
@@ -57,7 +234,7 @@ class UserRegistration(BaseModel):
     @field_validator('email')
     @classmethod
     def email_must_be_valid(cls, value):
-        if not re.match(r"[^@]+@[^@]+\.[^@]+", value):
+        if not EMAIL_PATTERN.match(value):
             raise ValueError('Email is not valid')
         return value
 
@@ -250,16 +427,19 @@ def register_user():
     except ValidationError as e:
         return jsonify({"message": "Validation error", "errors": json.loads(e.json())}), 400
 
-    if UserCredentials.query.filter_by(email=user_data.email).first():
+    email = normalize_email(user_data.email)
+    if find_user_by_email(email):
         return jsonify({"message": "User with this email already exists"}), 409
 
     try:
         new_user = UserCredentials(
-            email=user_data.email,
-            role="admin" if user_data.email == "admin@example.com" else "volunteer"
+            email=email,
+            role="admin" if email == "admin@example.com" else "volunteer"
         )
         new_user.set_password(user_data.password)
         db.session.add(new_user)
+        db.session.flush()
+        log_activity('registration', user=new_user)
         db.session.commit()
 
         # Create a notification for the admin
@@ -267,6 +447,9 @@ def register_user():
 
         return jsonify({"message": "Registration successful", "user": {"email": new_user.email, "role": new_user.role}}), 201
 
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
     except Exception as e:
         db.session.rollback()
         print(f"--- 500 ERROR IN /register ---: {e}", file=sys.stderr)
@@ -276,17 +459,40 @@ def register_user():
 @app.route('/login', methods=['POST'])
 def login_user():
     """Log in a user."""
+    # Throttle before touching the database or the password hash
+    allowed, retry_after = login_ip_limiter.allow(
+        request.remote_addr or 'unknown',
+        app.config['LOGIN_THROTTLE_IP_RATE'],
+        app.config['LOGIN_THROTTLE_IP_BURST']
+    )
+    if not allowed:
+        return too_many_attempts_response(retry_after)
+
     try:
         login_data = UserLogin(**request.json)
     except ValidationError as e:
         return jsonify({"message": "Validation error", "errors": json.loads(e.json())}), 400
 
+    allowed, retry_after = login_email_limiter.allow(
+        normalize_email(login_data.email),
+        app.config['LOGIN_THROTTLE_EMAIL_RATE'],
+        app.config['LOGIN_THROTTLE_EMAIL_BURST']
+    )
+    if not allowed:
+        return too_many_attempts_response(retry_after)
+
     try:
-        user = UserCredentials.query.filter_by(email=login_data.email).first()
+        user = find_user_by_email(login_data.email)
 
         if not user or not user.check_password(login_data.password):
             return jsonify({"message": "Invalid email or password"}), 401
 
+        # Upgrade hashes made with older KDF settings while we have the plaintext
+        if hashing.needs_rehash(user.password_hash):
+            user.set_password(login_data.password)
+            db.session.commit()
+            hashing.record_rehash()
+
         # Check if a profile exists
         profile_complete = db.session.get(UserProfile, user.id) is not None
 
@@ -296,9 +502,15 @@ def login_user():
                 "email": user.email,
                 "role": user.role,
                 "profileComplete": profile_complete
-            }
+            },
+            "token": issue_session_token(user),
+            "token_type": "Bearer",
+            "expires_in": app.config['SESSION_TOKEN_MAX_AGE']
         }), 200
 
+    except HashingBusyError:
+        db.session.rollback()
+        return server_busy_response()
     except Exception as e:
         print(f"--- 500 ERROR IN /login ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
@@ -307,12 +519,17 @@ def login_user():
 @app.route('/profile/<string:email>', methods=['GET', 'PUT'])
 def user_profile(email):
     """Get or Update a user's profile."""
-    user_creds = UserCredentials.query.filter_by(email=email).first()
-    if not user_creds:
+    # Reads can trust the session token; writes confirm the account still exists
+    if request.method == 'GET':
+        user_id = resolve_user_id(email)
+    else:
+        user_creds = find_user_by_email(email)
+        user_id = user_creds.id if user_creds else None
+    if not user_id:
         return jsonify({"message": "User not found"}), 404
 
     if request.method == 'GET':
-        profile = db.session.get(UserProfile, user_creds.id)
+        profile = db.session.get(UserProfile, user_id)
         if not profile:
             return jsonify({}), 200
 
@@ -341,14 +558,14 @@ def user_profile(email):
             return jsonify({"message": "Validation error", "errors": json.loads(e.json())}), 400
 
         try:
-            profile = db.session.get(UserProfile, user_creds.id)
+            profile = db.session.get(UserProfile, user_id)
 
             if not profile:
                 # Creating new profile - full_name required
                 if 'full_name' not in update_data:
                     return jsonify({"message": "Validation error", "errors": {"full_name": "Full name is required to create a profile."}}), 400
 
-                profile = UserProfile(id=user_creds.id)
+                profile = UserProfile(id=user_id)
                 db.session.add(profile)
 
             # Apply all updates
@@ -358,6 +575,7 @@ def user_profile(email):
                 else:
                     setattr(profile, key, value)
 
+            log_activity('profile_updated', user=user_creds)
             db.session.commit()
             return jsonify({"message": "Profile updated successfully"}), 200
 
@@ -427,6 +645,8 @@ def manage_events():
                 status=event_data.status or 'open'
             )
             db.session.add(new_event)
+            db.session.flush()
+            log_activity('event_created', event=new_event)
             db.session.commit()
             return jsonify({"message": "Event created successfully", "event_id": new_event.id}), 201
 
@@ -512,6 +732,7 @@ def manage_event_by_id(event_id):
                 else:
                     setattr(event, key, value)
 
+            log_activity('event_updated', event=event)
             db.session.commit()
             return jsonify({"message": "Event updated successfully"}), 200
 
@@ -527,12 +748,13 @@ def manage_event_by_id(event_id):
                 return jsonify({"message": "Event not found"}), 404
 
             # Delete all associated invites first
-            EventInvite.query.filter_by(event_id=event_id).delete()
+            delete_invites(EventInvite.event_id == event_id)
 
             # Delete all volunteer history records
-            VolunteerHistory.query.filter_by(event_id=event_id).delete()
+            delete_history(VolunteerHistory.event_id == event_id)
 
             # Delete the event
+            log_activity('event_deleted', event=event)
             db.session.delete(event)
             db.session.commit()
 
@@ -590,7 +812,7 @@ def signup():
 
     try:
         # Validate user
-        user = UserCredentials.query.filter_by(email=email).first()
+        user = find_user_by_email(email)
         if not user:
             return jsonify({"message": "User not found"}), 404
 
@@ -615,6 +837,7 @@ def signup():
             type="user_request"
         )
         db.session.add(invite)
+        log_activity('signup_requested', user=user, event=event)
         db.session.commit()
 
         return jsonify({"message": "Signup successful"}), 201
@@ -677,7 +900,7 @@ def manage_invites():
 
             # Find the user (try by email first, then by user_id)
             if email:
-                user_creds = UserCredentials.query.filter_by(email=email).first()
+                user_creds = find_user_by_email(email)
             else:
                 user_creds = db.session.get(UserCredentials, user_id)
 
@@ -713,10 +936,12 @@ def manage_invites():
                 type=invite_type
             )
             db.session.add(new_invite)
+            log_activity('admin_invite' if invite_type == 'admin_invite' else 'signup_requested', user=user_creds, event=event)
 
             # Create a notification
             if invite_type == 'admin_invite':
                 create_notification(f"Admin invited {email} to {event.event_name}", 'info')
+                create_notification(f"You have been invited to {event.event_name}", 'info', recipient=user_creds)
             else:
                 create_notification(f"Volunteer {email} requested to join {event.event_name}", 'info')
 
@@ -745,8 +970,12 @@ def manage_invite(invite_id):
             except ValidationError as e:
                 return jsonify({"message": "Validation error", "errors": json.loads(e.json())}), 400
 
-            # Update status
+            # Expired invites are closed; the volunteer has to ask again
             old_status = invite.status
+            if old_status == 'expired':
+                return jsonify({"message": "Invite has expired"}), 409
+
+            # Update status
             invite.status = invite_data.status
 
             # If changing from pending to accepted, add to volunteer history
@@ -765,6 +994,16 @@ def manage_invite(invite_id):
                     )
                     db.session.add(new_history)
 
+            if old_status != invite_data.status:
+                activity_type = 'event_signup' if invite_data.status == 'accepted' else 'invite_declined'
+                log_activity(activity_type, user=invite.user, event=invite.event)
+                if invite.type == 'user_request':
+                    db.session.add(Notification(
+                        message=f"Your request to join {invite.event.event_name} was {invite_data.status}",
+                        type='success' if invite_data.status == 'accepted' else 'warning',
+                        recipient_id=invite.user_id
+                    ))
+
             db.session.commit()
             return jsonify({"message": "Invite updated successfully"}), 200
 
@@ -780,12 +1019,13 @@ def manage_invite(invite_id):
                 return jsonify({"message": "Invite not found"}), 404
 
             # Remove from volunteer history if exists
-            VolunteerHistory.query.filter_by(
-                user_id=invite.user_id,
-                event_id=invite.event_id
-            ).delete()
+            delete_history(
+                VolunteerHistory.user_id == invite.user_id,
+                VolunteerHistory.event_id == invite.event_id
+            )
 
             # Delete the invite
+            log_activity('invite_deleted', user=invite.user, event=invite.event)
             db.session.delete(invite)
             db.session.commit()
 
@@ -814,9 +1054,11 @@ def update_invite_completion(invite_id):
         if not isinstance(completed, bool):
             return jsonify({"message": "Validation error: 'completed' must be a boolean"}), 400
 
-        # Update completion status
-        invite.completed = completed
-        db.session.commit()
+        # Only a real change is logged; the daily rollups count these log rows
+        if bool(invite.completed) != completed:
+            invite.completed = completed
+            log_activity('invite_completed' if completed else 'invite_uncompleted', user=invite.user, event=invite.event)
+            db.session.commit()
 
         return jsonify({"message": "Completion status updated successfully"}), 200
 
@@ -826,13 +1068,127 @@ def update_invite_completion(invite_id):
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
+#  Invite Expiry Sweeper
+
+def _expire_invite_batches(stale_filter, batch_size):
+    """Flip matching pending invites to 'expired', one small batch per commit."""
+    expired = 0
+    batches = 0
+    while True:
+        # Pick the next batch through the (status, created_at) index
+        ids = [row.id for row in EventInvite.query
+               .with_entities(EventInvite.id)
+               .filter(EventInvite.status == 'pending', stale_filter)
+               .order_by(EventInvite.created_at)
+               .limit(batch_size)
+               .all()]
+        if not ids:
+            break
+
+        # Short transaction per batch so the SQLite write lock is released quickly.
+        # RETURNING gives the /stream subscribers the rows that changed.
+        updated = db.session.execute(
+            db.update(EventInvite).where(EventInvite.id.in_(ids)).values(status='expired').returning(
+                EventInvite.id, EventInvite.event_id, EventInvite.user_id,
+                EventInvite.status, EventInvite.type, EventInvite.completed
+            ).execution_options(synchronize_session=False)
+        ).all()
+        queue_invite_updates(db.session, updated)
+        mark_rows_changed(db.session, "invites", ids)
+        db.session.commit()
+
+        expired += len(ids)
+        batches += 1
+        if len(ids) < batch_size:
+            break
+    return expired, batches
+
+
+def expire_stale_invites(max_age_days=None, batch_size=None):
+    """Expire pending invites that are too old or whose event date has passed.
+
+    Returns a summary dict with the number of rows touched and batches run.
+    """
+    if max_age_days is None:
+        max_age_days = app.config['INVITE_EXPIRY_DAYS']
+    if batch_size is None:
+        batch_size = app.config['INVITE_SWEEP_BATCH_SIZE']
+
+    cutoff = datetime.now(timezone.utc) - timedelta(days=max_age_days)
+    past_events = EventDetails.query.with_entities(EventDetails.id).filter(
+        EventDetails.event_date < date.today()
+    )
+
+    aged_out, age_batches = _expire_invite_batches(EventInvite.created_at < cutoff, batch_size)
+    event_passed, event_batches = _expire_invite_batches(EventInvite.event_id.in_(past_events), batch_size)
+
+    return {
+        "expired": aged_out + event_passed,
+        "expired_by_age": aged_out,
+        "expired_by_event_date": event_passed,
+        "batches": age_batches + event_batches,
+        "max_age_days": max_age_days
+    }
+
+
+def start_invite_sweeper(interval_seconds=None):
+    """Run expire_stale_invites() on a daemon thread every interval_seconds."""
+    if interval_seconds is None:
+        interval_seconds = app.config['INVITE_SWEEP_INTERVAL_SECONDS']
+    stop_event = threading.Event()
+
+    def sweep_forever():
+        while not stop_event.wait(interval_seconds):
+            with app.app_context():
+                try:
+                    result = expire_stale_invites()
+                    print(f"Invite sweep: expired {result['expired']} invites in {result['batches']} batches", file=sys.stderr)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"--- ERROR IN INVITE SWEEP ---: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=sweep_forever, name="invite-sweeper", daemon=True)
+    thread.start()
+    return stop_event
+
+
+@app.route('/invites/expire', methods=['POST'])
+def run_invite_expiry():
+    """Run the invite expiry sweep now (admin). Optional JSON: max_age_days, batch_size."""
+    data = request.get_json(silent=True) or {}
+    max_age_days = data.get('max_age_days')
+    batch_size = data.get('batch_size')
+
+    if max_age_days is not None and (not isinstance(max_age_days, int) or max_age_days < 0):
+        return jsonify({"message": "Validation error: 'max_age_days' must be a non-negative integer"}), 400
+    if batch_size is not None and (not isinstance(batch_size, int) or batch_size < 1):
+        return jsonify({"message": "Validation error: 'batch_size' must be a positive integer"}), 400
+
+    try:
+        result = expire_stale_invites(max_age_days=max_age_days, batch_size=batch_size)
+        return jsonify(result), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"--- 500 ERROR IN POST /invites/expire ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+@app.cli.command('expire-invites')
+def expire_invites_command():
+    """Expire stale pending invites and print how many rows were touched."""
+    result = expire_stale_invites()
+    print(f"Expired {result['expired']} invites "
+          f"({result['expired_by_age']} by age, {result['expired_by_event_date']} past event date) "
+          f"in {result['batches']} batches")
+
+
 @app.route('/invites/user/<string:email>', methods=['GET'])
 def get_user_invites(email):
     """Get all invites for a specific user by email."""
     try:
         # Find the user by email
-        user_creds = UserCredentials.query.filter_by(email=email).first()
-        if not user_creds:
+        user_id = resolve_user_id(email)
+        if not user_id:
             return jsonify({"message": "User not found"}), 404
 
         # Get query parameters for filtering
@@ -840,7 +1196,7 @@ def get_user_invites(email):
         invite_type = request.args.get('type')
 
         # Build query starting with user_id filter
-        query = EventInvite.query.filter_by(user_id=user_creds.id)
+        query = EventInvite.query.filter_by(user_id=user_id)
 
         # Apply optional filters
         if status:
@@ -890,12 +1246,12 @@ def get_user_invites(email):
 def get_user_events(email):
     """Get all accepted events for a user with completion status."""
     try:
-        user_creds = UserCredentials.query.filter_by(email=email).first()
-        if not user_creds:
+        user_id = resolve_user_id(email)
+        if not user_id:
             return jsonify({"message": "User not found"}), 404
 
         accepted_invites = EventInvite.query.filter_by(
-            user_id=user_creds.id,
+            user_id=user_id,
             status='accepted'
         ).all()
 
@@ -921,24 +1277,31 @@ def get_user_events(email):
 
 @app.route('/history/<string:email>', methods=['GET'])
 def get_volunteer_history(email):
-    """Get a specific volunteer's event history."""
+    """Get a specific volunteer's event history.
+
+    With ?stats=true the response is {"history": [...], "stats": {...}} using the
+    precomputed volunteer_stats row (events attended, completed, last participation).
+    """
     try:
-        user_creds = UserCredentials.query.filter_by(email=email).first()
-        if not user_creds:
+        user_id = resolve_user_id(email)
+        if not user_id:
             return jsonify({"message": "User not found"}), 404
 
-        history_records = VolunteerHistory.query.filter_by(user_id=user_creds.id).all()
-
-        event_list = []
-        for record in history_records:
-            event = record.event
-            if event:
-                event_list.append({
-                    "event_id": event.id,
-                    "event_name": event.event_name,
-                    "participation_date": record.participation_date.isoformat()
-                })
-
+        # One join instead of lazy-loading record.event per row
+        rows = VolunteerHistory.query.join(
+            EventDetails, EventDetails.id == VolunteerHistory.event_id
+        ).with_entities(
+            EventDetails.id, EventDetails.event_name, VolunteerHistory.participation_date
+        ).filter(VolunteerHistory.user_id == user_id).order_by(VolunteerHistory.id).all()
+
+        event_list = [{
+            "event_id": event_id,
+            "event_name": event_name,
+            "participation_date": participation_date.isoformat()
+        } for event_id, event_name, participation_date in rows]
+
+        if request.args.get('stats', '').lower() in ('1', 'true', 'yes'):
+            return jsonify({"history": event_list, "stats": stats_for_user(user_id)}), 200
         return jsonify(event_list), 200
     except Exception as e:
         print(f"--- 500 ERROR IN GET /history/{email} ---: {e}", file=sys.stderr)
@@ -983,34 +1346,56 @@ def get_volunteer_matches(event_id):
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 #  NEW: Get all users (for admin) 
+def _prefix_range(column, prefix):
+    """Index-friendly 'starts with' filter: column >= prefix AND column < prefix + max char."""
+    return db.and_(column >= prefix, column < prefix + '\U0010ffff')
+
+
 @app.route('/users', methods=['GET'])
 def get_all_users():
-    """Get a list of all users for the admin panel."""
+    """Get a list of all users for the admin panel.
+
+    Optional query params: role (exact match) and q (name or email prefix).
+    """
     try:
-        users = UserCredentials.query.all()
+        role = request.args.get('role')
+        search = (request.args.get('q') or '').strip()
+
+        # One LEFT JOIN instead of lazy-loading user.profile per row
+        query = UserCredentials.query.outerjoin(
+            UserProfile, UserProfile.id == UserCredentials.id
+        ).with_entities(
+            UserCredentials.id,
+            UserCredentials.email,
+            UserCredentials.role,
+            UserProfile.full_name,
+            UserProfile.address1,
+            UserProfile.city,
+            UserProfile.state,
+            UserProfile.zipcode
+        )
+
+        if role:
+            query = query.filter(UserCredentials.role == role)
+        if search:
+            # UNION of two index range scans; an OR across the join would scan every user
+            matching_ids = db.union(
+                db.select(UserCredentials.id).where(_prefix_range(UserCredentials.email_normalized, normalize_email(search))),
+                db.select(UserProfile.id).where(_prefix_range(UserProfile.full_name.collate('NOCASE'), search))
+            )
+            query = query.filter(UserCredentials.id.in_(matching_ids))
+
         user_list = []
-        for user in users:
-            profile = user.profile
+        for user_id, email, user_role, full_name, address1, city, state, zipcode in query.order_by(UserCredentials.id).all():
             # Construct full address from address1, city, state, zipcode
-            address_parts = []
-            if profile:
-                if profile.address1:
-                    address_parts.append(profile.address1)
-                if profile.city:
-                    address_parts.append(profile.city)
-                if profile.state:
-                    address_parts.append(profile.state)
-                if profile.zipcode:
-                    address_parts.append(profile.zipcode)
-
-            full_address = ", ".join(address_parts) if address_parts else "N/A"
+            address_parts = [part for part in (address1, city, state, zipcode) if part]
 
             user_list.append({
-                "id": user.id,
-                "email": user.email,
-                "role": user.role,
-                "name": profile.full_name if profile else "N/A",  # Changed from "full_name" to "name"
-                "address": full_address  # Added address field
+                "id": user_id,
+                "email": email,
+                "role": user_role,
+                "name": full_name if full_name else "N/A",  # Changed from "full_name" to "name"
+                "address": ", ".join(address_parts) if address_parts else "N/A"  # Added address field
             })
         return jsonify(user_list), 200
     except Exception as e:
@@ -1024,7 +1409,8 @@ def manage_user(email):
 
     if request.method == 'PUT':
         try:
-            user = UserCredentials.query.filter_by(email=email).first()
+            identity = get_identity(email)
+            user = db.session.get(UserCredentials, identity.user_id) if identity else None
             if not user:
                 return jsonify({"message": "User not found"}), 404
 
@@ -1046,6 +1432,7 @@ def manage_user(email):
                     )
                     db.session.add(new_profile)
 
+            log_activity('user_updated', user=user)
             db.session.commit()
             return jsonify({"message": "User updated successfully"}), 200
 
@@ -1056,7 +1443,8 @@ def manage_user(email):
 
     if request.method == 'DELETE':
         try:
-            user = UserCredentials.query.filter_by(email=email).first()
+            identity = get_identity(email)
+            user = db.session.get(UserCredentials, identity.user_id) if identity else None
             if not user:
                 return jsonify({"message": "User not found"}), 404
 
@@ -1070,7 +1458,14 @@ def manage_user(email):
             # Delete invites
             EventInvite.query.filter_by(user_id=user.id).delete()
 
+            # Delete their stats row
+            VolunteerStats.query.filter_by(user_id=user.id).delete()
+
+            # Delete their notifications, read receipts and badge counter
+            delete_user_notifications(user.id)
+
             # Delete the user
+            log_activity('user_deleted', user=user)
             db.session.delete(user)
             db.session.commit()
 
@@ -1081,36 +1476,348 @@ def manage_user(email):
             print(f"--- 500 ERROR IN DELETE /users/{email} ---: {e}", file=sys.stderr)
             return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
+#  Bulk User Import (CSV)
+
+IMPORT_PROFILE_FIELDS = (
+    'full_name', 'address1', 'address2', 'city', 'state', 'zip_code',
+    'skills', 'preferences', 'availability'
+)
+app.config['IMPORT_BATCH_SIZE'] = 500
+app.config['IMPORT_MAX_REPORTED_ERRORS'] = 1000
+
+
+def _parse_import_row(row):
+    """Validate one CSV row. Returns (email, password, password_hash, profile dict or None)."""
+    email = (row.get('email') or '').strip()
+    password = row.get('password') or ''
+    password_hash = (row.get('password_hash') or '').strip()
+
+    if password_hash:
+        # Pre-hashed rows (werkzeug format) skip the KDF; login upgrades them later if needed
+        if not hashing.is_valid_hash(password_hash):
+            raise ValueError("password_hash is not a werkzeug scrypt or pbkdf2 hash")
+        if not EMAIL_PATTERN.match(email):
+            raise ValueError("Email is not valid")
+    else:
+        UserRegistration(email=email, password=password)
+
+    profile_values = {field: row.get(field) for field in IMPORT_PROFILE_FIELDS if row.get(field)}
+    profile = None
+    if profile_values:
+        profile = ProfileUpdate(**profile_values).model_dump(exclude_unset=True)
+        if not profile.get('full_name'):
+            raise ValueError("full_name is required when profile fields are given")
+        profile['zipcode'] = profile.pop('zip_code', None)
+
+    return normalize_email(email), password, password_hash, profile
+
+
+def _import_batch(rows, result, pool):
+    """Validate, hash and insert one batch of (row_number, row) pairs in a single transaction."""
+    parsed = []
+    for row_number, row in rows:
+        try:
+            parsed.append((row_number,) + _parse_import_row(row))
+        except ValidationError as e:
+            message = "; ".join(f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}" for err in e.errors())
+            _record_import_error(result, row_number, row.get('email'), message)
+        except ValueError as e:
+            _record_import_error(result, row_number, row.get('email'), str(e))
+
+    # One IN query for accounts that already exist (also what makes re-runs safe)
+    emails = [item[1] for item in parsed]
+    existing = {row.email_normalized for row in UserCredentials.query
+                .with_entities(UserCredentials.email_normalized)
+                .filter(UserCredentials.email_normalized.in_(emails))} if emails else set()
+
+    fresh = []
+    seen = set()
+    for item in parsed:
+        row_number, email = item[0], item[1]
+        if email in existing or email in seen:
+            result['skipped_existing'] += 1
+            _record_import_error(result, row_number, email, "User with this email already exists")
+            continue
+        seen.add(email)
+        fresh.append(item)
+
+    if fresh:
+        to_hash = [item[2] for item in fresh if not item[3]]
+        hashed = iter(hashing.hash_many(to_hash, pool))
+        credentials = [{
+            "email": email,
+            "email_normalized": email,
+            "password_hash": password_hash or next(hashed),
+            "role": "volunteer"
+        } for _, email, _, password_hash, _ in fresh]
+
+        try:
+            # executemany-style inserts; RETURNING gives the new ids for the profile rows
+            inserted = db.session.execute(
+                db.insert(UserCredentials).returning(UserCredentials.id, UserCredentials.email_normalized),
+                credentials
+            ).all()
+            ids = {email: user_id for user_id, email in inserted}
+            profiles = [dict(profile, id=ids[email]) for _, email, _, _, profile in fresh if profile]
+            if profiles:
+                db.session.execute(db.insert(UserProfile), profiles)
+                add_profiles(db.session.connection(), profiles)
+            db.session.execute(db.insert(ActivityLog), [
+                {"type": "registration", "user_email": email, "user_id": user_id} for user_id, email in inserted
+            ])
+            # Core inserts skip the ORM events that keep the skill analytics cache, daily rollups
+            # and availability counts fresh
+            mark_skills_changed(db.session)
+            add_counts(db.session.connection(), "registrations", datetime.now(timezone.utc).date(), delta=len(inserted))
+            db.session.commit()
+            result['imported'] += len(fresh)
+        except Exception as e:
+            db.session.rollback()
+            for row_number, email, _, _, _ in fresh:
+                _record_import_error(result, row_number, email, f"Batch insert failed: {e}")
+
+    result['last_row'] = rows[-1][0]
+
+
+def _record_import_error(result, row_number, email, message):
+    result['error_count'] += 1
+    if len(result['errors']) < app.config['IMPORT_MAX_REPORTED_ERRORS']:
+        result['errors'].append({"row": row_number, "email": email, "error": message})
+
+
+def import_users_csv(text_stream, start_row=0, batch_size=None, workers=None, progress=None):
+    """Stream a CSV of volunteers into user_credentials/user_profile.
+
+    Columns: email, password_hash (or password), plus optional profile fields.
+    Rows up to start_row are skipped, so an interrupted import can resume from
+    the reported last_row; existing emails are reported, not duplicated.
+    progress(result) is called after each committed batch.
+
+    password_hash is the bulk mode: with werkzeug hashes from the partner's
+    export, one machine does well over 10k users per minute. Plain passwords
+    pay the full KDF per row and go as fast as the hashing pool, roughly
+    CPU count x 5-10 rows per second with scrypt.
+    """
+    batch_size = batch_size or app.config['IMPORT_BATCH_SIZE']
+    result = {
+        "imported": 0,
+        "skipped_existing": 0,
+        "error_count": 0,
+        "errors": [],
+        "start_row": start_row,
+        "last_row": start_row
+    }
+    started = datetime.now(timezone.utc)
+
+    reader = csv.DictReader(text_stream)
+    if not reader.fieldnames or 'email' not in reader.fieldnames:
+        raise ValueError("CSV must have a header row with an 'email' column")
+
+    with hashing.bulk_pool(workers) as pool:
+        batch = []
+        for row_number, row in enumerate(reader, start=1):
+            if row_number <= start_row:
+                continue
+            batch.append((row_number, row))
+            if len(batch) >= batch_size:
+                _import_batch(batch, result, pool)
+                batch = []
+                if progress:
+                    progress(result)
+        if batch:
+            _import_batch(batch, result, pool)
+            if progress:
+                progress(result)
+
+    result["errors"].sort(key=lambda error: error["row"])
+    seconds = (datetime.now(timezone.utc) - started).total_seconds()
+    result["seconds"] = round(seconds, 3)
+    result["users_per_minute"] = round(result["imported"] / seconds * 60) if seconds else result["imported"]
+
+    if result["imported"]:
+        create_notification(f"Bulk import added {result['imported']} users", 'info')
+    return result
+
+
+def _log_import_progress(result):
+    print(f"--- USER IMPORT ---: last_row {result['last_row']}, imported {result['imported']}, "
+          f"{result['error_count']} errors", file=sys.stderr)
+
+
+def require_admin():
+    """None if the caller is an admin, else the error response.
+
+    The caller must send a session token; its role is re-read through
+    get_identity, so a demoted or deleted admin loses access right away.
+    """
+    current = g.get('current_user')
+    if not current:
+        return jsonify({"message": "Authentication required"}), 401
+    identity = get_identity(current['email'])
+    if identity is None or identity.role != 'admin':
+        return jsonify({"message": "Admin access required"}), 403
+    return None
+
+
+@app.route('/users/import', methods=['POST'])
+def import_users():
+    """Bulk-register volunteers from a CSV upload (admin only).
+
+    Send the file as multipart field 'file' or as a text/csv body.
+    Needs an admin's session token (Authorization: Bearer).
+    Query params: start_row (resume point), batch_size. Progress goes to the server log
+    after each batch, so a dropped connection can resume from its last_row.
+    """
+    denied = require_admin()
+    if denied:
+        return denied
+    try:
+        start_row = int(request.args.get('start_row', 0))
+        batch_size = int(request.args.get('batch_size', app.config['IMPORT_BATCH_SIZE']))
+        if start_row < 0 or batch_size < 1:
+            raise ValueError
+    except ValueError:
+        return jsonify({"message": "Validation error: 'start_row' and 'batch_size' must be non-negative integers"}), 400
+
+    upload = request.files.get('file')
+    raw = upload.stream if upload else request.stream
+    text_stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+
+    try:
+        result = import_users_csv(text_stream, start_row=start_row, batch_size=batch_size,
+                                  progress=_log_import_progress)
+        return jsonify(result), 200
+    except ValueError as e:
+        return jsonify({"message": f"Validation error: {e}"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(f"--- 500 ERROR IN POST /users/import ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+@app.cli.command('import-users')
+@click.argument('csv_path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--start-row', default=0, help='Skip rows up to this number (resume point).')
+@click.option('--batch-size', default=None, type=int, help='Rows per insert batch.')
+@click.option('--workers', default=None, type=int, help='Hashing processes (default: CPU count).')
+def import_users_command(csv_path, start_row, batch_size, workers):
+    """Bulk-register volunteers from a CSV file."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        result = import_users_csv(f, start_row=start_row, batch_size=batch_size, workers=workers,
+                                  progress=lambda r: print(f"... row {r['last_row']}: {r['imported']} imported"))
+    for error in result['errors']:
+        print(f"row {error['row']} ({error['email']}): {error['error']}")
+    print(f"Imported {result['imported']} users, {result['error_count']} errors, "
+          f"last row {result['last_row']} ({result['users_per_minute']} users/min)")
+
+
 #  NEW: Notification Endpoints --- need to fix somehow!!!
+# Without ?email= these are the original admin feed: admin broadcasts and
+# their shared read flag (marking one read there also gives every admin a
+# receipt, so the badges agree). With ?email= they are that user's inbox:
+# direct notifications plus broadcasts to their role, read state per user.
+app.config['NOTIFICATIONS_MAX_LIMIT'] = 200
+
+
+def _notification_identity():
+    """(identity, error response) for the optional ?email= on notification endpoints."""
+    email = request.args.get('email')
+    if not email:
+        return None, None
+    identity = get_identity(email)
+    if identity is None:
+        return None, (jsonify({"message": "User not found"}), 404)
+    return identity, None
+
+
+def _notification_json(notif, read):
+    return {
+        "id": notif.id,
+        "message": notif.message,
+        "type": notif.type,
+        "created_at": notif.created_at.isoformat(),
+        "read": read,
+        "direct": notif.recipient_id is not None
+    }
+
+
 @app.route('/notifications', methods=['GET'])
 def get_notifications():
-    """Get all unread notifications."""
+    """Get all unread notifications, or with ?email= that user's notifications (newest first).
+
+    ?unread=true keeps only unread ones; ?limit= caps the list (default 50).
+    """
     try:
-        notifications = Notification.query.filter_by(read=False).order_by(Notification.created_at.desc()).all()
-        notif_list = []
-        for notif in notifications:
-            notif_list.append({
-                "id": notif.id,
-                "message": notif.message,
-                "type": notif.type,
-                "created_at": notif.created_at.isoformat(),
-                "read": notif.read
-            })
-        return jsonify(notif_list), 200
+        identity, error = _notification_identity()
+        if error:
+            return error
+        if identity is None:
+            notifications = Notification.query.filter_by(read=False, recipient_id=None, audience=DEFAULT_AUDIENCE) \
+                .order_by(Notification.created_at.desc()).all()
+            return jsonify([_notification_json(notif, notif.read) for notif in notifications]), 200
+
+        try:
+            limit = int(request.args.get('limit', 50))
+        except ValueError:
+            return jsonify({"message": "Validation error: limit must be an integer"}), 400
+        if not 1 <= limit <= app.config['NOTIFICATIONS_MAX_LIMIT']:
+            return jsonify({"message": f"Validation error: limit must be between 1 and {app.config['NOTIFICATIONS_MAX_LIMIT']}"}), 400
+
+        is_read = db.case(
+            (Notification.recipient_id.isnot(None), Notification.read),
+            else_=NotificationReceipt.user_id.isnot(None)
+        )
+        query = db.session.query(Notification, is_read).outerjoin(NotificationReceipt, db.and_(
+            NotificationReceipt.notification_id == Notification.id,
+            NotificationReceipt.user_id == identity.user_id
+        )).filter(db.or_(
+            Notification.recipient_id == identity.user_id,
+            db.and_(Notification.recipient_id.is_(None), Notification.audience == identity.role)
+        ))
+        if request.args.get('unread', '').lower() in ('1', 'true', 'yes'):
+            query = query.filter(db.not_(is_read))
+        rows = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
+        return jsonify([_notification_json(notif, bool(read)) for notif, read in rows]), 200
     except Exception as e:
         print(f"--- 500 ERROR IN GET /notifications ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
+@app.route('/notifications/unread_count', methods=['GET'])
+def get_unread_count():
+    """The badge count for ?email=, read from the counter tables in one statement."""
+    try:
+        identity, error = _notification_identity()
+        if error:
+            return error
+        if identity is None:
+            return jsonify({"message": "Validation error: 'email' is required"}), 400
+        return jsonify({"unread": unread_count(identity.user_id, identity.role)}), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /notifications/unread_count ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
 @app.route('/notifications/<int:notif_id>/read', methods=['PUT'])
 def mark_notification_read(notif_id):
-    """Mark a notification as read."""
+    """Mark a notification as read (for ?email= only, when given)."""
     try:
+        identity, error = _notification_identity()
+        if error:
+            return error
         notif = db.session.get(Notification, notif_id)
-        if not notif:
+        if identity is None:
+            # The legacy admin feed only has admin broadcasts
+            addressed = notif is not None and notif.recipient_id is None and notif.audience == DEFAULT_AUDIENCE
+        else:
+            addressed = notif is not None and addressed_to(notif, identity.user_id, identity.role)
+        if not addressed:
             return jsonify({"message": "Notification not found"}), 404
 
-        notif.read = True
+        if identity is None:
+            mark_read_for_audience(notif)
+        else:
+            mark_read(notif, identity.user_id, identity.role)
         db.session.commit()
         return jsonify({"message": "Notification marked as read"}), 200
     except Exception as e:
@@ -1119,57 +1826,160 @@ def mark_notification_read(notif_id):
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
-# Activity Endpoint 
-@app.route('/activity', methods=['GET'])
-def get_activity():
-    """Get recent activity for admin dashboard."""
+@app.route('/notifications/read_all', methods=['PUT'])
+def mark_all_notifications_read():
+    """Mark all of ?email='s notifications as read."""
     try:
-        activity_list = []
-
-        # Get recent user registrations (last 50)
-        recent_users = UserCredentials.query.order_by(UserCredentials.id.desc()).limit(50).all()
-        for user in recent_users:
-            # Approximate creation time - using ID as proxy for time since we don't have created_at
-            activity_list.append({
-                "type": "registration",
-                "user": user.email,
-                "event": None,
-                "time": datetime.now(timezone.utc).isoformat()  # Placeholder time
-            })
+        identity, error = _notification_identity()
+        if error:
+            return error
+        if identity is None:
+            return jsonify({"message": "Validation error: 'email' is required"}), 400
+        marked = mark_all_read(identity.user_id, identity.role)
+        db.session.commit()
+        return jsonify({"message": "Notifications marked as read", "marked": marked}), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"--- 500 ERROR IN PUT /notifications/read_all ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
-        # Get recent event signups (accepted invites)
-        recent_signups = EventInvite.query.filter_by(status='accepted').order_by(EventInvite.created_at.desc()).limit(50).all()
-        for invite in recent_signups:
-            event = invite.event
-            user = invite.user
-            activity_list.append({
-                "type": "event_signup",
-                "user": user.email if user else "Unknown",
-                "event": event.event_name if event else "Unknown Event",
-                "time": invite.created_at.isoformat()
-            })
 
-        # Get recent event creations (last 50 events)
-        recent_events = EventDetails.query.order_by(EventDetails.id.desc()).limit(50).all()
-        for event in recent_events:
-            # Approximate creation time - using ID as proxy
-            activity_list.append({
-                "type": "event_created",
-                "user": "admin",  # Placeholder since we don't track who created events
-                "event": event.event_name,
-                "time": datetime.now(timezone.utc).isoformat()  # Placeholder time
-            })
+# Server-Sent Events: committed notifications and invite changes are pushed
+# as they happen (see event_stream.py), so clients don't have to poll.
+app.config['STREAM_HEARTBEAT_SECONDS'] = 15
+app.config['STREAM_MAX_SUBSCRIBERS'] = 500
+
+
+@app.route('/stream', methods=['GET'])
+def event_stream():
+    """Push 'notification' and 'invite' events as text/event-stream.
+
+    Everyone gets the admin notification feed; ?email= adds that user's
+    direct notifications, broadcasts to their role and invite changes
+    (admins get all invite changes). Reconnects resume after the Last-Event-ID
+    header; a 'reset' event means some messages were missed and the client
+    should reload.
+    """
+    try:
+        channels = {"notifications"}
+        email = request.args.get('email')
+        if email:
+            identity = get_identity(email)
+            if identity is None:
+                return jsonify({"message": "User not found"}), 404
+            channels.add(f"user:{identity.user_id}")
+            channels.add(f"notifications:{identity.role}")
+            if identity.role == 'admin':
+                channels.add("invites")
 
-        # Sort by time descending and limit to most recent 20
-        activity_list.sort(key=lambda x: x['time'], reverse=True)
-        activity_list = activity_list[:20]
+        last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+        if last_event_id is not None:
+            try:
+                last_event_id = int(last_event_id)
+            except ValueError:
+                return jsonify({"message": "Validation error: Last-Event-ID must be an integer"}), 400
 
-        return jsonify(activity_list), 200
+        if broker.stats()["subscribers"] >= app.config['STREAM_MAX_SUBSCRIBERS']:
+            return jsonify({"message": "Too many open streams, try again later"}), 503
+        subscription = broker.subscribe(channels, last_event_id)
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /stream ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+    heartbeat = app.config['STREAM_HEARTBEAT_SECONDS']
+
+    # Runs after the request context is gone; it never touches the database
+    def generate():
+        try:
+            yield "retry: 3000\n\n"
+            if subscription.missed:
+                yield "event: reset\ndata: {}\n\n"
+            while True:
+                messages = subscription.wait(heartbeat)
+                for message in messages:
+                    yield format_message(message)
+                if subscription.overflowed:
+                    # Too far behind; the client reconnects and replays from history
+                    yield "event: reset\ndata: {}\n\n"
+                    return
+                if not messages:
+                    yield ": keepalive\n\n"
+        finally:
+            broker.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# Activity Endpoint 
+def _parse_time_id_cursor(cursor):
+    """'<created_at iso>|<id>' -> (datetime, id); raises ValueError on anything else."""
+    created_at, _, row_id = cursor.rpartition('|')
+    return datetime.fromisoformat(created_at), int(row_id)
+
+
+@app.route('/activity', methods=['GET'])
+def get_activity():
+    """Recent activity for the admin dashboard, newest first.
+
+    One range read over the (created_at, id) index. Pass the X-Next-Cursor
+    header of a page back as ?cursor= to get the next one; ?since= (ISO time)
+    stops at that point.
+    """
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        if limit < 1 or limit > 200:
+            return jsonify({"message": "Validation error: 'limit' must be between 1 and 200"}), 400
+
+        query = ActivityLog.query
+        try:
+            if request.args.get('cursor'):
+                cursor_time, cursor_id = _parse_time_id_cursor(request.args['cursor'])
+                query = query.filter(db.tuple_(ActivityLog.created_at, ActivityLog.id) < (cursor_time, cursor_id))
+            if request.args.get('since'):
+                query = query.filter(ActivityLog.created_at > datetime.fromisoformat(request.args['since']))
+        except ValueError:
+            return jsonify({"message": "Validation error: invalid 'cursor' or 'since'"}), 400
+
+        # One extra row tells us whether there is another page
+        rows = query.order_by(ActivityLog.created_at.desc(), ActivityLog.id.desc()).limit(limit + 1).all()
+        page = rows[:limit]
+
+        activity_list = [{
+            "type": row.type,
+            "user": row.user_email,
+            "event": row.event_name,
+            "time": row.created_at.isoformat()
+        } for row in page]
+
+        headers = {}
+        if len(rows) > limit:
+            headers['X-Next-Cursor'] = f"{page[-1].created_at.isoformat()}|{page[-1].id}"
+        return jsonify(activity_list), 200, headers
     except Exception as e:
         print(f"--- 500 ERROR IN GET /activity ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
+#  Metrics Endpoint 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Runtime counters for capacity monitoring."""
+    return jsonify({
+        "password_hashing": hashing.get_metrics(),
+        "login_throttle": {
+            "by_ip": login_ip_limiter.stats(),
+            "by_email": login_email_limiter.stats()
+        },
+        "identity_cache": identity_cache.stats(),
+        "report_jobs": report_jobs.stats(),
+        "skill_gap_cache": skill_gap_cache.stats(),
+        "olap_snapshot": olap_snapshot.stats(),
+        "geo_cache": geo_cache.stats(),
+        "event_stream": broker.stats()
+    }), 200
+
+
 # --- Static Data Endpoints ---
 
 @app.route('/data/states', methods=['GET'])
@@ -1194,55 +2004,522 @@ def get_skills():
     return jsonify(SKILLS_LIST), 200
 
 
-#  Reporting Endpoints (CSV) 
+#  Analytics 
+@app.route('/analytics/skills', methods=['GET'])
+def get_skill_gap():
+    """Demand for each skill across upcoming events against the volunteers who have it.
 
-@app.route('/reports/volunteer_history.csv', methods=['GET'])
-def report_volunteer_history_csv():
-    """Generate a CSV report of all volunteers and their history."""
+    Cached until a commit changes event or volunteer skills (see skill_analytics.py).
+    """
     try:
-        # Use an in-memory string buffer
-        si = io.StringIO()
-        cw = csv.writer(si)
+        return jsonify(skill_gap_cache.get()), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /analytics/skills ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
 
-        # Write Header
-        headers = [
+# Geo counts are cached until a commit touches one of the tables they read
+geo_cache = VersionedCache(maxsize=256)
+GEO_TABLES = ('user_credentials', 'user_profile', 'event_details')
+event.listen(db.metadata, 'after_create', lambda *args, **kwargs: geo_cache.clear())
+
+
+def geo_counts(zip_prefix=None, skill=None, date_from=None, date_to=None):
+    """[{region, volunteers, events}] per state, or per zip prefix when zip_prefix is set.
+
+    skill narrows both sides; the dates only apply to events.
+    """
+    def region(column):
+        return db.func.substr(column, 1, zip_prefix) if zip_prefix else column
+
+    volunteer_region = region(UserProfile.zipcode if zip_prefix else UserProfile.state)
+    # || '' keeps SQLite off the role index so it walks the (state, zipcode) index in group order
+    volunteers = db.select(volunteer_region, db.func.count()) \
+        .join(UserCredentials, UserCredentials.id == UserProfile.id) \
+        .where(UserCredentials.role + '' == 'volunteer', volunteer_region.isnot(None)) \
+        .group_by(volunteer_region)
+    event_region = region(EventDetails.zipcode if zip_prefix else EventDetails.state)
+    events = db.select(event_region, db.func.count()).where(event_region.isnot(None)).group_by(event_region)
+
+    if skill:
+        volunteers = volunteers.where(skill_match(UserProfile.skills, skill))
+        events = events.where(db.or_(skill_match(EventDetails.skills, skill),
+                                     skill_match(EventDetails.required_skills, skill)))
+    if date_from:
+        events = events.where(EventDetails.event_date >= date_from)
+    if date_to:
+        events = events.where(EventDetails.event_date <= date_to)
+
+    regions = {}
+    for name, count in db.session.execute(volunteers):
+        regions.setdefault(name, {"region": name, "volunteers": 0, "events": 0})["volunteers"] = count
+    for name, count in db.session.execute(events):
+        regions.setdefault(name, {"region": name, "volunteers": 0, "events": 0})["events"] = count
+    return [regions[name] for name in sorted(regions)]
+
+
+@app.route('/analytics/geo', methods=['GET'])
+def get_geo_counts():
+    """Volunteers and events per state, or per zip prefix with ?zip_prefix=1..5.
+
+    ?skill= filters both; ?date_from=&date_to= (YYYY-MM-DD) filter events.
+    """
+    try:
+        zip_prefix = request.args.get('zip_prefix', type=int)
+        if 'zip_prefix' in request.args and not (zip_prefix and 1 <= zip_prefix <= 5):
+            return jsonify({"message": "Validation error: 'zip_prefix' must be between 1 and 5"}), 400
+        try:
+            date_from = date.fromisoformat(request.args['date_from']) if request.args.get('date_from') else None
+            date_to = date.fromisoformat(request.args['date_to']) if request.args.get('date_to') else None
+        except ValueError:
+            return jsonify({"message": "Validation error: 'date_from' and 'date_to' must be YYYY-MM-DD"}), 400
+        skill = request.args.get('skill', '').strip() or None
+
+        key = (zip_prefix, skill.lower() if skill else None, date_from, date_to)
+        rows = geo_cache.get(key, GEO_TABLES, lambda: geo_counts(zip_prefix, skill, date_from, date_to))
+        return jsonify(rows), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /analytics/geo ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+app.config['ROLLUP_MAX_DAYS'] = 1000
+
+
+@app.route('/analytics/daily', methods=['GET'])
+def get_daily_rollups():
+    """Per-day counts for ?from=&to= (YYYY-MM-DD, default the last 30 days).
+
+    ?metrics= picks from registrations, signups, approvals, completions;
+    ?event_id= narrows to one event instead of the overall totals.
+    """
+    try:
+        try:
+            end = date.fromisoformat(request.args['to']) if request.args.get('to') else datetime.now(timezone.utc).date()
+            start = date.fromisoformat(request.args['from']) if request.args.get('from') else end - timedelta(days=29)
+        except ValueError:
+            return jsonify({"message": "Validation error: 'from' and 'to' must be YYYY-MM-DD"}), 400
+        if start > end or (end - start).days >= app.config['ROLLUP_MAX_DAYS']:
+            return jsonify({"message": f"Validation error: date range must be 1 to {app.config['ROLLUP_MAX_DAYS']} days"}), 400
+
+        metrics = [name.strip() for name in request.args.get('metrics', '').split(',') if name.strip()] or list(ROLLUP_METRICS)
+        unknown = set(metrics) - set(ROLLUP_METRICS)
+        if unknown:
+            return jsonify({"message": f"Validation error: unknown metrics {sorted(unknown)}"}), 400
+
+        event_id = request.args.get('event_id', 0, type=int)
+        return jsonify(daily_series(start, end, metrics, event_id)), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /analytics/daily ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+app.config['AVAILABILITY_MAX_DAYS'] = 366
+
+
+@app.route('/analytics/availability', methods=['GET'])
+def get_availability():
+    """Volunteers available per day for ?from=&to= (YYYY-MM-DD, default the next 30 days).
+
+    ?skill= counts only volunteers with that skill; ?by_skill=true adds a per-skill breakdown.
+    """
+    try:
+        try:
+            start = date.fromisoformat(request.args['from']) if request.args.get('from') else datetime.now(timezone.utc).date()
+            end = date.fromisoformat(request.args['to']) if request.args.get('to') else start + timedelta(days=29)
+        except ValueError:
+            return jsonify({"message": "Validation error: 'from' and 'to' must be YYYY-MM-DD"}), 400
+        if start > end or (end - start).days >= app.config['AVAILABILITY_MAX_DAYS']:
+            return jsonify({"message": f"Validation error: date range must be 1 to {app.config['AVAILABILITY_MAX_DAYS']} days"}), 400
+
+        by_skill = request.args.get('by_skill', '').lower() in ('1', 'true', 'yes')
+        return jsonify(availability_by_day(start, end, request.args.get('skill'), by_skill)), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /analytics/availability ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+# Pivots run against an in-memory columnar copy of the fact tables (olap_snapshot.py),
+# refreshed every OLAP_REFRESH_SECONDS on a background thread and fully reloaded
+# every OLAP_FULL_REFRESH_SECONDS (the only refresh that notices deleted rows).
+app.config['OLAP_REFRESH_SECONDS'] = 30
+app.config['OLAP_FULL_REFRESH_SECONDS'] = 600
+olap_snapshot = OlapSnapshot(
+    refresh_seconds=app.config['OLAP_REFRESH_SECONDS'],
+    full_refresh_seconds=app.config['OLAP_FULL_REFRESH_SECONDS'],
+)
+event.listen(db.metadata, 'after_create', lambda *args, **kwargs: olap_snapshot.reset())
+
+
+# Background threads (pivot snapshot refresh, invite sweeper) start with the
+# first request a serving process handles, whatever runs it (flask run,
+# gunicorn workers, app.run()); not under tests. Each worker process sweeps;
+# the sweep's batches are idempotent, so that only costs a few extra queries.
+app.config['BACKGROUND_WORKERS'] = True
+_background_lock = threading.Lock()
+_background_started = False
+
+
+@app.before_request
+def start_background_workers():
+    global _background_started
+    if _background_started or app.testing or not app.config['BACKGROUND_WORKERS']:
+        return None
+    with _background_lock:
+        if not _background_started:
+            olap_snapshot.start(app)
+            if app.config['INVITE_SWEEP_INTERVAL_SECONDS'] > 0:
+                start_invite_sweeper()
+            _background_started = True
+    return None
+
+
+@app.route('/analytics/pivot', methods=['GET'])
+def get_pivot():
+    """Row counts for ?fact=events|invites|history grouped by ?group_by=state,month,...
+
+    Any of the fact's dimensions in the query string filters, e.g.
+    ?urgency=High,Critical; other parameters are ignored.
+    """
+    try:
+        fact = request.args.get('fact', 'invites')
+        group_by = [name.strip() for name in request.args.get('group_by', '').split(',') if name.strip()]
+        dimensions = PIVOT_FACTS[fact]["dimensions"] if fact in PIVOT_FACTS else {}
+        filters = {
+            name: [value.strip() for value in values.split(',')]
+            for name, values in request.args.items() if name in dimensions
+        }
+        try:
+            rows = olap_snapshot.pivot(fact, group_by, filters)
+        except PivotError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+        return jsonify(rows), 200
+    except Exception as e:
+        print(f"--- 500 ERROR IN GET /analytics/pivot ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+#  Reporting Endpoints (CSV) 
+# Reports are streamed: rows come off the cursor in yield_per batches and go
+# out in chunks, so memory stays flat however big the history gets.
+app.config['REPORT_YIELD_PER'] = 500
+app.config['REPORT_CHUNK_ROWS'] = 500
+# Upper bound for ?workers= (the parallel builder in parallel_reports.py)
+app.config['REPORT_MAX_WORKERS'] = 8
+
+
+def _csv_chunks(header, rows, chunk_rows):
+    """Encode rows as CSV, yielding the text every chunk_rows rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    try:
+        for count, row in enumerate(rows, 1):
+            writer.writerow(row)
+            if count % chunk_rows == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    except Exception as e:
+        # Headers are already sent, so all we can do is log and cut the stream short
+        print(f"--- ERROR WHILE STREAMING CSV REPORT ---: {e}", file=sys.stderr)
+        raise
+
+
+def csv_stream_response(filename_prefix, header, rows):
+    """Streamed text/csv attachment; rows is any iterable of lists."""
+    return _csv_attachment(filename_prefix, _csv_chunks(header, rows, app.config['REPORT_CHUNK_ROWS']))
+
+
+def _csv_attachment(filename_prefix, chunks):
+    output = Response(stream_with_context(chunks), mimetype='text/csv')
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    output.headers["Content-Disposition"] = f"attachment; filename={filename_prefix}_{today_str}.csv"
+    return output
+
+
+VOLUNTEER_HISTORY_REPORT_COLUMNS = (
+    UserCredentials.email,
+    UserCredentials.role,
+    UserProfile.full_name,
+    UserProfile.city,
+    UserProfile.state,
+    UserProfile.skills,
+    VolunteerHistory.id,
+    VolunteerHistory.participation_date,
+    EventDetails.event_name,
+    EventDetails.event_date
+)
+
+EVENT_ASSIGNMENTS_REPORT_COLUMNS = (
+    EventDetails.id,
+    EventDetails.event_name,
+    EventDetails.event_date,
+    EventDetails.location,
+    VolunteerHistory.id,
+    UserCredentials.email,
+    UserProfile.full_name,
+    UserProfile.skills
+)
+
+
+def _history_range(query, since, upto):
+    """Limit a history-driven query to since < (participation_date, id) <= upto, in that order."""
+    position = db.tuple_(VolunteerHistory.participation_date, VolunteerHistory.id)
+    return query.filter(position > tuple(since), position <= tuple(upto)) \
+                .order_by(VolunteerHistory.participation_date, VolunteerHistory.id)
+
+
+def volunteer_history_report_query(since=None, upto=None):
+    """Volunteers x their history x events as flat rows, one LEFT JOIN.
+
+    A volunteer with no history comes back once with NULL history columns.
+    With since/upto, only history rows in that watermark range, read from
+    volunteer_history first so the range is an index scan.
+    """
+    if since is not None:
+        return _history_range(
+            VolunteerHistory.query.with_entities(*VOLUNTEER_HISTORY_REPORT_COLUMNS)
+            .join(UserCredentials, UserCredentials.id == VolunteerHistory.user_id)
+            .outerjoin(UserProfile, UserProfile.id == UserCredentials.id)
+            .outerjoin(EventDetails, EventDetails.id == VolunteerHistory.event_id)
+            # || '' keeps SQLite off the role index so it scans the history range first
+            .filter(UserCredentials.role + '' == 'volunteer'),
+            since, upto
+        )
+    return UserCredentials.query.with_entities(*VOLUNTEER_HISTORY_REPORT_COLUMNS) \
+        .outerjoin(UserProfile, UserProfile.id == UserCredentials.id) \
+        .outerjoin(VolunteerHistory, VolunteerHistory.user_id == UserCredentials.id) \
+        .outerjoin(EventDetails, EventDetails.id == VolunteerHistory.event_id) \
+        .filter(UserCredentials.role == 'volunteer') \
+        .order_by(UserCredentials.id, VolunteerHistory.id)
+
+
+def event_assignments_report_query(since=None, upto=None):
+    """Events x assigned volunteers x profiles as flat rows, one LEFT JOIN.
+
+    An event with no volunteers comes back once with NULL volunteer columns.
+    since/upto work as in volunteer_history_report_query().
+    """
+    if since is not None:
+        return _history_range(
+            VolunteerHistory.query.with_entities(*EVENT_ASSIGNMENTS_REPORT_COLUMNS)
+            .join(EventDetails, EventDetails.id == VolunteerHistory.event_id)
+            .outerjoin(UserCredentials, UserCredentials.id == VolunteerHistory.user_id)
+            .outerjoin(UserProfile, UserProfile.id == UserCredentials.id),
+            since, upto
+        )
+    return EventDetails.query.with_entities(*EVENT_ASSIGNMENTS_REPORT_COLUMNS) \
+        .outerjoin(VolunteerHistory, VolunteerHistory.event_id == EventDetails.id) \
+        .outerjoin(UserCredentials, UserCredentials.id == VolunteerHistory.user_id) \
+        .outerjoin(UserProfile, UserProfile.id == UserCredentials.id) \
+        .order_by(EventDetails.id, VolunteerHistory.id)
+
+
+def _format_date(value, missing="N/A"):
+    return value.strftime('%Y-%m-%d') if value else missing
+
+
+# CSV rows leave missing values as empty cells, so spreadsheets and imports
+# see a blank rather than the text "N/A"; the JSON reports keep "N/A" for display.
+def _volunteer_history_rows(rows):
+    for email, role, full_name, city, state, skills, history_id, participation_date, event_name, event_date in rows:
+        base_info = [email, role, full_name or "", city or "", state or "", skills or ""]
+        if history_id is None:
+            yield base_info + ["No History", "", ""]
+        else:
+            yield base_info + [
+                event_name or "Unknown Event",
+                _format_date(event_date, missing=""),
+                participation_date.isoformat()
+            ]
+
+
+def _event_assignment_rows(rows):
+    for event_id, event_name, event_date, location, history_id, email, full_name, skills in rows:
+        base_info = [event_id, event_name, _format_date(event_date, missing=""), location or ""]
+        if history_id is None:
+            yield base_info + ["No Volunteers", "", ""]
+        else:
+            yield base_info + [email or "", full_name or "", skills or ""]
+
+
+CSV_REPORTS = {
+    "volunteer_history": {
+        "filename": "volunteer_history_report",
+        "header": [
             "Volunteer Email", "Role", "Full Name", "City", "State",
             "Skills", "Event Name", "Event Date", "Participation Date"
-        ]
-        cw.writerow(headers)
+        ],
+        "query": volunteer_history_report_query,
+        "rows": _volunteer_history_rows,
+        "partition_column": UserCredentials.id
+    },
+    "event_assignments": {
+        "filename": "event_assignments_report",
+        "header": [
+            "Event ID", "Event Name", "Event Date", "Event Location",
+            "Assigned Volunteer Email", "Volunteer Full Name", "Volunteer Skills"
+        ],
+        "query": event_assignments_report_query,
+        "rows": _event_assignment_rows,
+        "partition_column": EventDetails.id
+    }
+}
 
-        # Get all volunteers
-        volunteers = UserCredentials.query.filter_by(role='volunteer').all()
 
-        for user in volunteers:
-            profile = user.profile
-            base_info = [
-                user.email, user.role,
-                profile.full_name if profile else "N/A",
-                profile.city if profile else "N/A",
-                profile.state if profile else "N/A",
-                profile.skills if profile else "N/A"
-            ]
+def history_watermark():
+    """Newest (participation_date, id) in volunteer_history, or None if it is empty."""
+    return VolunteerHistory.query.with_entities(
+        VolunteerHistory.participation_date, VolunteerHistory.id
+    ).order_by(VolunteerHistory.participation_date.desc(), VolunteerHistory.id.desc()).first()
 
-            history = user.volunteer_history
-            if not history:
-                cw.writerow(base_info + ["No History", "", ""])
-            else:
-                for record in history:
-                    event = record.event
-                    row = base_info + [
-                        event.event_name if event else "Unknown Event",
-                        event.event_date.strftime('%Y-%m-%d') if event and event.event_date else "N/A",
-                        record.participation_date.isoformat()
-                    ]
-                    cw.writerow(row)
-
-        # Prepare response
-        output = make_response(si.getvalue())
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        output.headers["Content-Disposition"] = f"attachment; filename=volunteer_history_report_{today_str}.csv"
-        output.headers["Content-type"] = "text/csv"
-        return output
+
+def format_watermark(watermark):
+    return f"{watermark[0].isoformat()}|{watermark[1]}" if watermark else ""
+
+
+def _sqlite_file():
+    """Path of the SQLite database file, or None for an in-memory database."""
+    path = db.engine.url.database
+    return path if path and path != ':memory:' else None
+
+
+def _column_converters(statement):
+    """parallel_reports.CONVERTERS key per selected column: SQLite hands dates back as text."""
+    converters = []
+    for column in statement.selected_columns:
+        if isinstance(column.type, db.DateTime):
+            converters.append("datetime")
+        elif isinstance(column.type, db.Date):
+            converters.append("date")
+        else:
+            converters.append(None)
+    return tuple(converters)
+
+
+def partitioned_report_sql(name, filters=()):
+    """The report query limited to :lo <= partition column < :hi, as (raw SQL, params, converters)."""
+    report = CSV_REPORTS[name]
+    column = report["partition_column"]
+    statement = report["query"]().filter(*filters, column >= db.bindparam('lo'), column < db.bindparam('hi')).statement
+    compiled = statement.compile(dialect=sqlite.dialect(paramstyle='named'))
+    params = {key: value for key, value in compiled.params.items() if key not in ('lo', 'hi')}
+    return str(compiled), params, _column_converters(statement)
+
+
+def parallel_report_chunks(name, workers, filters=()):
+    """CSV text chunks for a full report, formatted by `workers` processes.
+
+    The report query is split on its partition column into workers * 4 id
+    ranges (small ranges keep the stream moving and the workers evenly loaded).
+    """
+    report = CSV_REPORTS[name]
+    column = report["partition_column"]
+    low, high = db.session.query(db.func.min(column), db.func.max(column)).one()
+    ranges = parallel_reports.id_ranges(low, high, workers * 4)
+    sql, params, converters = partitioned_report_sql(name, filters)
+
+    header = io.StringIO()
+    csv.writer(header).writerow(report["header"])
+    yield header.getvalue()
+    try:
+        yield from parallel_reports.build_csv_chunks(
+            _sqlite_file(), sql, params, report["rows"], ranges, workers, converters
+        )
+    except Exception as e:
+        print(f"--- ERROR WHILE STREAMING CSV REPORT ---: {e}", file=sys.stderr)
+        raise
+
+
+def stream_csv_report(name, since=None, workers=1, filters=()):
+    """Stream a report; with since, only history rows after that watermark.
+
+    The X-Next-Watermark header is read before the rows, and a delta stops
+    at it, so passing it back as ?since= next time neither skips nor repeats
+    rows. A delta only carries new history rows. Deletes and profile/event
+    edits need a full download.
+
+    workers > 1 formats a full report in a process pool (see
+    parallel_reports.py); it needs a file database and is ignored otherwise.
+    Each id range is read in its own snapshot there, so a write committed
+    mid-report can land in some ranges and not others; use workers=1 when
+    the file has to be one consistent snapshot.
+    filters are extra WHERE clauses (see _report_filters()).
+    """
+    report = CSV_REPORTS[name]
+    watermark = history_watermark()
+    if since is None and workers > 1 and _sqlite_file():
+        response = _csv_attachment(report["filename"], parallel_report_chunks(name, workers, filters))
+        response.headers['X-Next-Watermark'] = format_watermark(watermark)
+        return response
+
+    query = report["query"]() if since is None else report["query"](since, watermark or since)
+    query = query.filter(*filters)
+    # iter() runs the query now, so a database error is still a clean 500
+    rows = iter(query.yield_per(app.config['REPORT_YIELD_PER']))
+    response = csv_stream_response(report["filename"], report["header"], report["rows"](rows))
+    response.headers['X-Next-Watermark'] = format_watermark(watermark) or request.args.get('since', '')
+    return response
+
+
+def _report_since():
+    """Parse ?since=<participation_date iso>|<history id>; raises ValueError if malformed."""
+    since = request.args.get('since')
+    return _parse_time_id_cursor(since) if since else None
+
+
+def _report_workers():
+    """?workers= for the parallel builder, 1..REPORT_MAX_WORKERS; None if invalid."""
+    workers = request.args.get('workers', 1, type=int)
+    return workers if 1 <= workers <= app.config['REPORT_MAX_WORKERS'] else None
+
+
+# Query-string filters shared by the built-in reports (CSV and JSON)
+REPORT_FILTER_PARAMS = {
+    "date_from": (EventDetails.event_date, "gte"),
+    "date_to": (EventDetails.event_date, "lte"),
+    "city": (UserProfile.city, "ieq"),
+    "state": (UserProfile.state, "ieq"),
+    "skill": (UserProfile.skills, "has_skill"),
+}
+
+
+def _report_filters():
+    """WHERE clauses for ?date_from=&date_to=&city=&state=&skill=; raises ReportDefinitionError."""
+    return [
+        filter_clause(column, op, request.args[name], name)
+        for name, (column, op) in REPORT_FILTER_PARAMS.items()
+        if request.args.get(name)
+    ]
+
+
+def _csv_report_args():
+    """(since, workers, filters) for the CSV report endpoints; raises ValueError."""
+    try:
+        since = _report_since()
+    except ValueError:
+        raise ValueError("'since' must be '<participation_date>|<id>'")
+    workers = _report_workers()
+    if workers is None:
+        raise ValueError(f"'workers' must be between 1 and {app.config['REPORT_MAX_WORKERS']}")
+    return since, workers, _report_filters()
+
+
+@app.route('/reports/volunteer_history.csv', methods=['GET'])
+def report_volunteer_history_csv():
+    """Stream a CSV report of all volunteers and their history.
+
+    ?since=<watermark> for a delta, ?workers= to build in parallel,
+    ?date_from=&date_to=&city=&state=&skill= to filter.
+    """
+    try:
+        try:
+            since, workers, filters = _csv_report_args()
+        except ValueError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+        return stream_csv_report("volunteer_history", since, workers, filters)
     except Exception as e:
         print(f"--- 500 ERROR IN CSV REPORT (Volunteers) ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
@@ -1250,133 +2527,455 @@ def report_volunteer_history_csv():
 
 @app.route('/reports/event_assignments.csv', methods=['GET'])
 def report_event_assignments_csv():
-    """Generate a CSV report of all events and their assigned volunteers."""
+    """Stream a CSV report of all events and their assigned volunteers (same options as volunteer_history.csv)."""
     try:
-        si = io.StringIO()
-        cw = csv.writer(si)
+        try:
+            since, workers, filters = _csv_report_args()
+        except ValueError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+        return stream_csv_report("event_assignments", since, workers, filters)
+    except Exception as e:
+        print(f"--- 500 ERROR IN CSV REPORT (Events) ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
-        # Write Header
-        headers = [
-            "Event ID", "Event Name", "Event Date", "Event Location",
-            "Assigned Volunteer Email", "Volunteer Full Name", "Volunteer Skills"
-        ]
-        cw.writerow(headers)
 
-        events = EventDetails.query.all()
+#  Report Jobs 
+# Build a report in the background, poll for it, then download the file.
+# Files are cached on disk per data version, so an unchanged report is built once.
+app.config['REPORT_ARTIFACT_DIR'] = os.environ.get('REPORT_ARTIFACT_DIR', os.path.join(BASE_DIR, 'report_artifacts'))
+app.config['REPORT_ARTIFACT_MAX_AGE_SECONDS'] = 24 * 60 * 60
+app.config['REPORT_ARTIFACT_MAX_BYTES'] = 512 * 1024 * 1024
+app.config['REPORT_JOB_WORKERS'] = 2
 
-        for event in events:
-            base_info = [
-                event.id,
-                event.event_name,
-                event.event_date.strftime('%Y-%m-%d') if event.event_date else "N/A",
-                event.location if event.location else "N/A"
-            ]
+report_jobs = ReportJobManager(
+    app.config['REPORT_ARTIFACT_DIR'],
+    max_age_seconds=app.config['REPORT_ARTIFACT_MAX_AGE_SECONDS'],
+    max_bytes=app.config['REPORT_ARTIFACT_MAX_BYTES'],
+    workers=app.config['REPORT_JOB_WORKERS']
+)
 
-            # Get approved volunteers
-            history = event.volunteers
-            if not history:
-                cw.writerow(base_info + ["No Volunteers", "", ""])
-            else:
-                for record in history:
-                    user = record.user
-                    profile = user.profile
-                    row = base_info + [
-                        user.email,
-                        profile.full_name if profile else "N/A",
-                        profile.skills if profile else "N/A"
-                    ]
-                    cw.writerow(row)
-
-        # Prepare response
-        output = make_response(si.getvalue())
-        today_str = datetime.now().strftime('%Y-%m-%d')
-        output.headers["Content-Disposition"] = f"attachment; filename=event_assignments_report_{today_str}.csv"
-        output.headers["Content-type"] = "text/csv"
-        return output
+
+def report_data_version():
+    """Token that changes whenever report data may have changed.
+
+    Every mutating endpoint writes activity_log, and the max ids catch rows
+    inserted some other way. Each part is a single primary-key index lookup.
+    """
+    parts = db.session.execute(db.select(
+        db.select(db.func.max(ActivityLog.id)).scalar_subquery(),
+        db.select(db.func.max(VolunteerHistory.id)).scalar_subquery(),
+        db.select(db.func.max(UserCredentials.id)).scalar_subquery(),
+        db.select(db.func.max(EventDetails.id)).scalar_subquery()
+    )).one()
+    return "-".join(str(part or 0) for part in parts)
+
+
+def _report_builder(name):
+    report = CSV_REPORTS[name]
+
+    def build(f):
+        with app.app_context():
+            rows = report["query"]().yield_per(app.config['REPORT_YIELD_PER'])
+            for chunk in _csv_chunks(report["header"], report["rows"](rows), app.config['REPORT_CHUNK_ROWS']):
+                f.write(chunk)
+
+    return build
+
+
+def _job_response(job):
+    job["status_url"] = url_for('report_job_status', job_id=job["job_id"])
+    if job["status"] == DONE:
+        job["download_url"] = url_for('report_job_download', job_id=job["job_id"])
+    return job
+
+
+@app.route('/reports/jobs', methods=['POST'])
+def submit_report_job():
+    """Start building a report. JSON: {"report": "volunteer_history" | "event_assignments"}."""
+    data = request.get_json(silent=True) or {}
+    name = data.get('report')
+    if name not in CSV_REPORTS:
+        return jsonify({"message": f"Validation error: 'report' must be one of {sorted(CSV_REPORTS)}"}), 400
+
+    try:
+        job = report_jobs.submit(name, report_data_version(), _report_builder(name))
+        return jsonify(_job_response(job)), 202
     except Exception as e:
-        print(f"--- 500 ERROR IN CSV REPORT (Events) ---: {e}", file=sys.stderr)
+        print(f"--- 500 ERROR IN POST /reports/jobs ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
+@app.route('/reports/jobs/<string:job_id>', methods=['GET'])
+def report_job_status(job_id):
+    """Status of a report job: queued, running, done or failed."""
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({"message": "Report job not found"}), 404
+    return jsonify(_job_response(job)), 200
+
+
+@app.route('/reports/jobs/<string:job_id>/download', methods=['GET'])
+def report_job_download(job_id):
+    """Send a finished report file. send_file hands the open file to the
+    server's wsgi.file_wrapper, so servers with sendfile() copy it zero-copy."""
+    job = report_jobs.get(job_id)
+    if not job:
+        return jsonify({"message": "Report job not found"}), 404
+    if job["status"] != DONE:
+        return jsonify({"message": f"Report is not ready (status: {job['status']})"}), 409
+
+    path = report_jobs.artifact_path(job["report"], job["data_version"])
+    if not os.path.exists(path):
+        return jsonify({"message": "Report file has expired, submit the job again"}), 410
+
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    return send_file(
+        path,
+        mimetype='text/csv',
+        as_attachment=True,
+        download_name=f"{CSV_REPORTS[job['report']]['filename']}_{today_str}.csv",
+        conditional=True
+    )
+
+
 # Reporting Endpoints (JSON for Preview) 
 
+# Previews: ?limit= and ?cursor= page in SQL (keyset on the report's sort key),
+# so the first page costs the same however long the report is. ?count=true adds
+# X-Total-Count, which is a full count and only run when asked for.
+app.config['REPORT_PREVIEW_DEFAULT_LIMIT'] = 50
+app.config['REPORT_PREVIEW_MAX_LIMIT'] = 1000
+
+
+def _report_page_args():
+    """(limit, cursor, count) from the query string; limit is None for the whole report.
+
+    Raises ValueError on a bad limit or cursor.
+    """
+    limit = request.args.get('limit')
+    cursor = request.args.get('cursor')
+    count = request.args.get('count', 'false').lower() == 'true'
+    if limit is None and cursor is None:
+        return None, None, count
+
+    limit = int(limit) if limit is not None else app.config['REPORT_PREVIEW_DEFAULT_LIMIT']
+    if not 1 <= limit <= app.config['REPORT_PREVIEW_MAX_LIMIT']:
+        raise ValueError(f"'limit' must be between 1 and {app.config['REPORT_PREVIEW_MAX_LIMIT']}")
+    if cursor is not None:
+        parent_id, _, child_id = cursor.partition('|')
+        cursor = (int(parent_id), int(child_id))
+    return limit, cursor, count
+
+
+def paged_report_rows(query, parent_id, child_id, limit=None, cursor=None, count=False):
+    """Run a report query ordered by (parent_id, child_id), one page at a time.
+
+    child_id is NULL on the "No History"/"No Volunteers" rows and sorts first,
+    so the cursor treats it as 0. Returns (rows, response headers).
+    """
+    headers = {}
+    if count:
+        headers['X-Total-Count'] = str(query.order_by(None).count())
+    if limit is None:
+        return query.all(), headers
+
+    query = query.add_columns(parent_id, child_id)
+    if cursor is not None:
+        # The plain >= lets SQLite start the scan at the cursor's parent row
+        query = query.filter(parent_id >= cursor[0], db.tuple_(parent_id, db.func.coalesce(child_id, 0)) > cursor)
+    rows = query.limit(limit + 1).all()
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        headers['X-Next-Cursor'] = f"{last[-2]}|{last[-1] or 0}"
+    return [row[:-2] for row in rows[:limit]], headers
+
+
 @app.route('/reports/json/volunteer_history', methods=['GET'])
 def report_volunteer_history_json():
-    """Generate a JSON report of all volunteers and their history."""
+    """Generate a JSON report of all volunteers and their history (?limit=&cursor=&count= to page)."""
     try:
-        volunteers = UserCredentials.query.filter_by(role='volunteer').all()
-        report_data = []
+        try:
+            page = _report_page_args()
+            filters = _report_filters()
+        except ValueError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
 
-        for user in volunteers:
-            profile = user.profile
-            history = user.volunteer_history
-
-            if not history:
-                report_data.append({
-                    "Email": user.email,
-                    "Full Name": profile.full_name if profile else "N/A",
-                    "Skills": profile.skills if profile else "N/A",
-                    "Event Name": "No History",
-                    "Event Date": "N/A"
-                })
-            else:
-                for record in history:
-                    event = record.event
-                    report_data.append({
-                        "Email": user.email,
-                        "Full Name": profile.full_name if profile else "N/A",
-                        "Skills": profile.skills if profile else "N/A",
-                        "Event Name": event.event_name if event else "Unknown Event",
-                        "Event Date": event.event_date.strftime('%Y-%m-%d') if event and event.event_date else "N/A"
-                    })
+        query = volunteer_history_report_query().filter(*filters)
+        rows, headers = paged_report_rows(query, UserCredentials.id, VolunteerHistory.id, *page)
+        report_data = []
+        for email, _, full_name, _, _, skills, history_id, _, event_name, event_date in rows:
+            report_data.append({
+                "Email": email,
+                "Full Name": full_name or "N/A",
+                "Skills": skills or "N/A",
+                "Event Name": "No History" if history_id is None else event_name or "Unknown Event",
+                "Event Date": _format_date(event_date)
+            })
 
-        return jsonify(report_data), 200
+        return jsonify(report_data), 200, headers
     except Exception as e:
         print(f"--- 500 ERROR IN JSON REPORT (Volunteers) ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 @app.route('/reports/json/event_assignments', methods=['GET'])
 def report_event_assignments_json():
-    """Generate a JSON report of all events and their assigned volunteers."""
+    """Generate a JSON report of all events and their assigned volunteers (?limit=&cursor=&count= to page)."""
     try:
-        events = EventDetails.query.all()
+        try:
+            page = _report_page_args()
+            filters = _report_filters()
+        except ValueError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+
+        query = event_assignments_report_query().filter(*filters)
+        rows, headers = paged_report_rows(query, EventDetails.id, VolunteerHistory.id, *page)
         report_data = []
+        for _, event_name, event_date, location, history_id, email, _, skills in rows:
+            report_data.append({
+                "Event Name": event_name,
+                "Event Date": _format_date(event_date),
+                "Location": location or "N/A",
+                "Volunteer": "None" if history_id is None else email or "N/A",
+                "Volunteer Skills": skills or "N/A"
+            })
 
-        for event in events:
-            history = event.volunteers
+        return jsonify(report_data), 200, headers
+    except Exception as e:
+        print(f"--- 500 ERROR IN JSON REPORT (Events) ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
-            if not history:
-                report_data.append({
-                    "Event Name": event.event_name,
-                    "Event Date": event.event_date.strftime('%Y-%m-%d') if event.event_date else "N/A",
-                    "Location": event.location if event.location else "N/A",
-                    "Volunteer": "None",
-                    "Volunteer Skills": "N/A"
-                })
-            else:
-                for record in history:
-                    user = record.user
-                    profile = user.profile
-                    report_data.append({
-                        "Event Name": event.event_name,
-                        "Event Date": event.event_date.strftime('%Y-%m-%d') if event.event_date else "N/A",
-                        "Location": event.location if event.location else "N/A",
-                        "Volunteer": user.email,
-                        "Volunteer Skills": profile.skills if profile else "N/A"
-                    })
 
+# Custom reports: a report definition (JSON body, see report_definitions.py)
+# compiled to one SELECT, returned as CSV or JSON. The CSV is streamed; the
+# JSON response is built in memory, so it gets a much lower row cap.
+app.config['CUSTOM_REPORT_MAX_ROWS'] = 100000
+app.config['CUSTOM_REPORT_JSON_MAX_ROWS'] = 5000
+
+
+@app.route('/reports/custom.csv', methods=['POST'])
+def report_custom_csv():
+    """Run a report definition and stream the result as CSV."""
+    try:
+        try:
+            statement, labels = compile_definition(request.get_json(silent=True), app.config['CUSTOM_REPORT_MAX_ROWS'])
+        except ReportDefinitionError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+
+        rows = iter(db.session.execute(statement.execution_options(yield_per=app.config['REPORT_YIELD_PER'])))
+        return csv_stream_response("custom_report", labels, ([_export_value(value) for value in row] for row in rows))
+    except Exception as e:
+        print(f"--- 500 ERROR IN CSV REPORT (Custom) ---: {e}", file=sys.stderr)
+        return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
+
+
+@app.route('/reports/json/custom', methods=['POST'])
+def report_custom_json():
+    """Run a report definition and return the rows as JSON objects keyed by column name.
+
+    Capped at CUSTOM_REPORT_JSON_MAX_ROWS; use /reports/custom.csv for bigger results.
+    """
+    try:
+        try:
+            statement, labels = compile_definition(request.get_json(silent=True), app.config['CUSTOM_REPORT_JSON_MAX_ROWS'])
+        except ReportDefinitionError as e:
+            return jsonify({"message": f"Validation error: {e}"}), 400
+
+        report_data = [
+            {label: _export_value(value) for label, value in zip(labels, row)}
+            for row in db.session.execute(statement)
+        ]
         return jsonify(report_data), 200
     except Exception as e:
-        print(f"--- 500 ERROR IN JSON REPORT (Events) ---: {e}", file=sys.stderr)
+        print(f"--- 500 ERROR IN JSON REPORT (Custom) ---: {e}", file=sys.stderr)
         return jsonify({"message": "An internal error occurred", "error": str(e)}), 500
 
 
+#  Bulk Export 
+# Newline-delimited JSON, one {"table": ..., "row": {...}} object per line, keyed by
+# column name. Each table is read in primary-key keyset batches and every batch
+# is compressed and sent before the next is read, so memory stays bounded.
+app.config['EXPORT_BATCH_SIZE'] = 1000
+
+EXPORT_TABLES = {
+    "users": UserCredentials,
+    "profiles": UserProfile,
+    "events": EventDetails,
+    "invites": EventInvite,
+    "history": VolunteerHistory,
+}
+# Never leaves the database
+EXPORT_EXCLUDED_COLUMNS = {"password_hash"}
+
+
+def _export_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def export_rows(name, batch_size):
+    """Yield one table's rows as dicts, batch_size rows per query (WHERE pk > last)."""
+    model = EXPORT_TABLES[name]
+    columns = [column for column in model.__table__.columns if column.name not in EXPORT_EXCLUDED_COLUMNS]
+    last_id = None
+    while True:
+        query = model.query.with_entities(*columns).order_by(model.id)
+        if last_id is not None:
+            query = query.filter(model.id > last_id)
+        batch = query.limit(batch_size).all()
+        for row in batch:
+            yield {column.name: _export_value(value) for column, value in zip(columns, row)}
+        if len(batch) < batch_size:
+            return
+        last_id = batch[-1].id
+
+
+def _gzip_ndjson(tables, batch_size):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 = gzip container
+    try:
+        for name in tables:
+            lines = []
+            for row in export_rows(name, batch_size):
+                lines.append(json.dumps({"table": name, "row": row}, separators=(',', ':')))
+                if len(lines) == batch_size:
+                    yield compressor.compress(('\n'.join(lines) + '\n').encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    lines = []
+            if lines:
+                yield compressor.compress(('\n'.join(lines) + '\n').encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    except Exception as e:
+        print(f"--- ERROR WHILE STREAMING /export ---: {e}", file=sys.stderr)
+        raise
+
+
+@app.route('/export', methods=['GET'])
+def export_data():
+    """Stream core tables as a gzip-compressed NDJSON file (export_<date>.ndjson.gz).
+
+    The body is the .gz file itself, not a gzip Content-Encoding of NDJSON,
+    so clients and proxies that decode transfer encodings don't unpack it
+    behind the filename's back.
+    ?tables=users,events picks tables (default: all, in dependency order);
+    ?batch_size= rows per query and per compressed chunk.
+    """
+    tables = [t for t in request.args.get('tables', ','.join(EXPORT_TABLES)).split(',') if t]
+    unknown = [t for t in tables if t not in EXPORT_TABLES]
+    if not tables or unknown:
+        return jsonify({"message": f"Validation error: 'tables' must be a subset of {list(EXPORT_TABLES)}"}), 400
+
+    batch_size = request.args.get('batch_size', app.config['EXPORT_BATCH_SIZE'], type=int)
+    if batch_size is None or batch_size < 1:
+        return jsonify({"message": "Validation error: 'batch_size' must be a positive integer"}), 400
+
+    output = Response(stream_with_context(_gzip_ndjson(tables, batch_size)), mimetype='application/gzip')
+    today_str = datetime.now().strftime('%Y-%m-%d')
+    output.headers["Content-Disposition"] = f"attachment; filename=export_{today_str}.ndjson.gz"
+    return output
+
+
 #  Database Initializer (Seeder) 
 
+def normalize_existing_emails():
+    """Fill email_normalized for users created before the column existed.
+
+    Accounts whose emails only differ by case cannot share the unique index:
+    the oldest account keeps the address, the others are left unset and
+    returned so an admin can merge or delete them.
+    """
+    pending = UserCredentials.query.filter(
+        UserCredentials.email_normalized.is_(None)
+    ).order_by(UserCredentials.id).all()
+    if not pending:
+        return []
+
+    taken = {row.email_normalized for row in UserCredentials.query
+             .with_entities(UserCredentials.email_normalized)
+             .filter(UserCredentials.email_normalized.isnot(None))}
+
+    collisions = []
+    for user in pending:
+        normalized = normalize_email(user.email)
+        if normalized in taken:
+            collisions.append(user.email)
+            continue
+        taken.add(normalized)
+        user.email_normalized = normalized
+    db.session.commit()
+
+    for email in collisions:
+        print(f"WARNING: {email} collides with an existing account ignoring case; it cannot log in until resolved", file=sys.stderr)
+    return collisions
+
+
+def upgrade_schema():
+    """Add anything create_all() skips on an existing volunteer.db (it never touches existing tables)."""
+    # New nullable columns on existing tables
+    inspector = db.inspect(db.engine)
+    for table in db.metadata.sorted_tables:
+        existing = {col['name'] for col in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing:
+                col_type = column.type.compile(dialect=db.engine.dialect)
+                db.session.execute(db.text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {col_type}'))
+    db.session.commit()
+
+    # Backfill before the unique index goes on
+    normalize_existing_emails()
+
+    for table in db.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=db.engine, checkfirst=True)
+
+    # volunteer_stats is new on older databases; fill it from existing history once
+    if VolunteerStats.query.first() is None and VolunteerHistory.query.first() is not None:
+        rebuild_volunteer_stats()
+
+    # Same for daily_rollup and activity_log
+    if DailyRollup.query.first() is None and ActivityLog.query.first() is not None:
+        rebuild_daily_rollups()
+
+    # And availability_day from the profiles
+    if AvailabilityDay.query.first() is None and UserProfile.query.filter(UserProfile.availability.isnot(None)).first():
+        rebuild_availability()
+
+    # Notifications from before recipient/audience existed are the admin broadcasts,
+    # and the ones already marked read stay read for every admin
+    if BroadcastCounter.query.first() is None and Notification.query.first() is not None:
+        Notification.query.filter(Notification.recipient_id.is_(None), Notification.audience.is_(None)) \
+            .update({Notification.audience: 'admin'}, synchronize_session=False)
+        import_legacy_read_flags()
+        rebuild_notification_counters()
+
+
+@app.cli.command('rebuild-stats')
+def rebuild_stats_command():
+    """Recompute volunteer_stats from history and invites."""
+    print(f"Rebuilt stats for {rebuild_volunteer_stats()} volunteers")
+
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute daily_rollup from activity_log."""
+    print(f"Rebuilt {rebuild_daily_rollups()} daily rollup rows")
+
+
+@app.cli.command('rebuild-availability')
+def rebuild_availability_command():
+    """Recompute availability_day from volunteer profiles."""
+    print(f"Rebuilt {rebuild_availability()} availability rows")
+
+
+@app.cli.command('rebuild-notification-counters')
+def rebuild_notification_counters_command():
+    """Recompute notification_counter and broadcast_counter."""
+    print(f"Rebuilt notification counters for {rebuild_notification_counters()} users")
+
+
 def init_db():
     """Create all tables and populate static/seed data."""
     print("Checking database...")
     db.create_all()
+    upgrade_schema()
 
     # Populate States
     if States.query.count() == 0:
@@ -1413,7 +3012,7 @@ def init_db():
         db.session.commit()
 
     # Populate default Admin user
-    if not UserCredentials.query.filter_by(email="admin@example.com").first():
+    if not find_user_by_email("admin@example.com"):
         print("Creating admin user...")
         admin = UserCredentials(email="admin@example.com", role="admin")
         admin.set_password("AdminPassword1")
@@ -1435,7 +3034,7 @@ def init_db():
         db.session.commit()
 
     # Populate default Volunteer user
-    if not UserCredentials.query.filter_by(email="volunteer@example.com").first():
+    if not find_user_by_email("volunteer@example.com"):
         print("Creating volunteer user...")
         vol = UserCredentials(email="volunteer@example.com", role="volunteer")
         vol.set_password("Password1")
@@ -1482,7 +3081,7 @@ def init_db():
         db.session.commit()
         # Ensure at least one volunteer history entry exists (tests require >= 1)
     if VolunteerHistory.query.count() == 0:
-        volunteer = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+        volunteer = find_user_by_email("volunteer@example.com")
         event = EventDetails.query.first()
         if volunteer and event:
             vh = VolunteerHistory(user_id=volunteer.id, event_id=event.id)
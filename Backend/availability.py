@@ -0,0 +1,165 @@
+"""
+Incremental upkeep of the availability_day table.
+
+UserProfile.availability is a comma-separated list of YYYY-MM-DD dates. Each
+volunteer profile adds 1 to every day it lists, once overall (skill '') and
+once per skill on the profile. Profile inserts, updates and deletes and role
+changes adjust the counts inside the same transaction (ORM mapper events).
+Bulk Core inserts call add_profiles() instead; rebuild_availability()
+recomputes everything.
+"""
+import datetime
+
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, UserCredentials, UserProfile, AvailabilityDay
+
+availability_table = AvailabilityDay.__table__
+profile_table = UserProfile.__table__
+credentials_table = UserCredentials.__table__
+ALL_SKILLS = ''
+
+
+def parse_days(availability):
+    """The valid dates in an availability string; anything else is ignored."""
+    days = set()
+    for item in (availability or '').split(','):
+        try:
+            days.add(datetime.date.fromisoformat(item.strip()))
+        except ValueError:
+            continue
+    return days
+
+
+def parse_skills(skills):
+    return {item.strip().lower() for item in (skills or '').split(',') if item.strip()}
+
+
+def _deltas(availability, skills, delta, counts=None):
+    """Add delta for every (day, skill) a profile counts towards."""
+    counts = {} if counts is None else counts
+    skill_keys = {ALL_SKILLS} | parse_skills(skills)
+    for day in parse_days(availability):
+        for skill in skill_keys:
+            counts[(day, skill)] = counts.get((day, skill), 0) + delta
+    return counts
+
+
+def apply_deltas(connection, counts):
+    """Upsert the (day, skill) -> delta map into availability_day."""
+    rows = [{"day": day, "skill": skill, "count": delta} for (day, skill), delta in counts.items() if delta]
+    if not rows:
+        return
+    statement = sqlite_insert(availability_table)
+    connection.execute(
+        statement.on_conflict_do_update(
+            index_elements=[availability_table.c.day, availability_table.c.skill],
+            set_={"count": availability_table.c.count + statement.excluded.count},
+        ),
+        rows,
+    )
+
+
+def add_profiles(connection, profiles):
+    """Count new volunteer profiles (dicts with availability/skills) inserted with Core."""
+    counts = {}
+    for profile in profiles:
+        _deltas(profile.get("availability"), profile.get("skills"), 1, counts)
+    apply_deltas(connection, counts)
+
+
+def _stored_profile(connection, user_id):
+    """(availability, skills, role) as currently in the database, or None."""
+    return connection.execute(
+        db.select(profile_table.c.availability, profile_table.c.skills, credentials_table.c.role)
+        .select_from(profile_table.outerjoin(credentials_table, credentials_table.c.id == profile_table.c.id))
+        .where(profile_table.c.id == user_id)
+    ).first()
+
+
+def _role(connection, user_id):
+    return connection.execute(
+        db.select(credentials_table.c.role).where(credentials_table.c.id == user_id)
+    ).scalar()
+
+
+@event.listens_for(UserProfile, 'after_insert')
+def _profile_inserted(mapper, connection, target):
+    if _role(connection, target.id) == 'volunteer':
+        apply_deltas(connection, _deltas(target.availability, target.skills, 1))
+
+
+@event.listens_for(UserProfile, 'before_update')
+def _profile_updating(mapper, connection, target):
+    state = db.inspect(target)
+    if not (state.attrs.availability.history.has_changes() or state.attrs.skills.history.has_changes()):
+        return
+    # The old values come from the row itself; the attribute history may not have them loaded
+    stored = _stored_profile(connection, target.id)
+    if stored is None or stored.role != 'volunteer':
+        return
+    counts = _deltas(stored.availability, stored.skills, -1)
+    apply_deltas(connection, _deltas(target.availability, target.skills, 1, counts))
+
+
+@event.listens_for(UserProfile, 'before_delete')
+def _profile_deleting(mapper, connection, target):
+    stored = _stored_profile(connection, target.id)
+    if stored is not None and stored.role == 'volunteer':
+        apply_deltas(connection, _deltas(stored.availability, stored.skills, -1))
+
+
+@event.listens_for(UserCredentials, 'before_update')
+def _role_changing(mapper, connection, target):
+    if not db.inspect(target).attrs.role.history.has_changes():
+        return
+    stored = _stored_profile(connection, target.id)
+    if stored is None or (stored.role == 'volunteer') == (target.role == 'volunteer'):
+        return
+    delta = 1 if target.role == 'volunteer' else -1
+    apply_deltas(connection, _deltas(stored.availability, stored.skills, delta))
+
+
+def rebuild_availability():
+    """Recompute availability_day from every volunteer profile."""
+    counts = {}
+    rows = db.session.execute(
+        db.select(UserProfile.availability, UserProfile.skills)
+        .join(UserCredentials, UserCredentials.id == UserProfile.id)
+        .where(UserCredentials.role == 'volunteer', UserProfile.availability.isnot(None))
+    )
+    for availability, skills in rows:
+        _deltas(availability, skills, 1, counts)
+
+    AvailabilityDay.query.delete()
+    if counts:
+        db.session.execute(db.insert(AvailabilityDay), [
+            {"day": day, "skill": skill, "count": count} for (day, skill), count in counts.items()
+        ])
+    db.session.commit()
+    return len(counts)
+
+
+def availability_by_day(start, end, skill=None, by_skill=False):
+    """One dict per day from start to end: {"day", "available"} plus "skills" when by_skill.
+
+    skill counts only volunteers with that skill. One primary-key range read.
+    """
+    series = {}
+    day = start
+    while day <= end:
+        series[day] = {"available": 0, "skills": {}} if by_skill else {"available": 0}
+        day += datetime.timedelta(days=1)
+
+    query = AvailabilityDay.query.with_entities(AvailabilityDay.day, AvailabilityDay.skill, AvailabilityDay.count) \
+        .filter(AvailabilityDay.day.between(start, end))
+    total_key = skill.strip().lower() if skill else ALL_SKILLS
+    if not by_skill:
+        query = query.filter(AvailabilityDay.skill == total_key)
+    for day, row_skill, count in query:
+        if row_skill == total_key:
+            series[day]["available"] = count
+        if by_skill and row_skill != ALL_SKILLS and count:
+            series[day]["skills"][row_skill] = count
+    return [dict(values, day=day.isoformat()) for day, values in series.items()]
@@ -0,0 +1,88 @@
+"""
+Benchmark the parallel event assignments report builder.
+
+Builds a throwaway SQLite database with synthetic events, volunteers and
+history, then times parallel_reports.build_csv_chunks() at each worker count.
+
+    python bench_reports.py --events 2000 --per-event 50 --workers 1,2,4,8
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, insert
+
+import parallel_reports
+from app import app, CSV_REPORTS, partitioned_report_sql
+from models import db, UserCredentials, UserProfile, EventDetails, VolunteerHistory
+
+
+def populate(path, events, per_event, volunteers):
+    engine = create_engine(f"sqlite:///{path}")
+    db.metadata.create_all(engine)
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        conn.execute(insert(UserCredentials), [
+            {"id": i, "email": f"v{i}@example.com", "email_normalized": f"v{i}@example.com",
+             "password_hash": "x", "role": "volunteer"}
+            for i in range(1, volunteers + 1)
+        ])
+        conn.execute(insert(UserProfile), [
+            {"id": i, "full_name": f"Volunteer {i}", "city": "Houston", "state": "TX",
+             "skills": "First Aid,Logistics"}
+            for i in range(1, volunteers + 1)
+        ])
+        conn.execute(insert(EventDetails), [
+            {"id": i, "event_name": f"Event {i}", "location": "Houston",
+             "event_date": date(2030, 1, 1) + timedelta(days=i % 365)}
+            for i in range(1, events + 1)
+        ])
+        start = datetime(2024, 1, 1)
+        rows = [
+            {"user_id": rng.randint(1, volunteers), "event_id": event_id,
+             "participation_date": start + timedelta(minutes=n)}
+            for n, event_id in enumerate(e for e in range(1, events + 1) for _ in range(per_event))
+        ]
+        for i in range(0, len(rows), 50000):
+            conn.execute(insert(VolunteerHistory), rows[i:i + 50000])
+    engine.dispose()
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--per-event", type=int, default=50)
+    parser.add_argument("--volunteers", type=int, default=5000)
+    parser.add_argument("--workers", default="1,2,4,8")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.db")
+        history_rows = populate(path, args.events, args.per_event, args.volunteers)
+        with app.app_context():
+            sql, params, converters = partitioned_report_sql("event_assignments")
+        format_rows = CSV_REPORTS["event_assignments"]["rows"]
+        print(f"{args.events} events, {history_rows} history rows, {os.cpu_count()} CPUs")
+
+        baseline = None
+        for workers in (int(w) for w in args.workers.split(",")):
+            ranges = parallel_reports.id_ranges(1, args.events, workers * 4)
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                size = sum(len(chunk) for chunk in parallel_reports.build_csv_chunks(
+                    path, sql, params, format_rows, ranges, workers, converters))
+                timings.append(time.perf_counter() - started)
+            best = min(timings)
+            baseline = baseline or best
+            print(f"workers={workers:<2} best={best:.3f}s  {history_rows / best:,.0f} rows/s  "
+                  f"speedup={baseline / best:.2f}x  ({size:,} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Work that has to wait until a transaction commits.
+
+Caches, version counters and pushed messages are derived from the database,
+so they may only change once the change they describe is committed: doing it
+at flush lets a concurrent request re-read pre-commit data and keep it, and a
+rollback would leave them describing something that never happened.
+
+Mapper events and bulk-statement code call queue(session, key, *items); once
+the session commits, the handler registered for key with @on_commit(key) gets
+everything queued under it in that transaction. A rollback drops it all.
+"""
+import sys
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_handlers = {}  # key -> (order, handler)
+
+
+def on_commit(key, order=0):
+    """Register handler(items) to run after each commit that queued something under key.
+
+    Handlers run by ascending order: caches and counters use the default,
+    anything that tells clients about the change uses a higher one so they
+    never refetch into a stale cache.
+    """
+    def register(handler):
+        _handlers[key] = (order, handler)
+        return handler
+    return register
+
+
+def queue(session, key, *items):
+    """Hold items for key's handler until session commits. With no items, just flag key."""
+    session.info.setdefault("after_commit", {}).setdefault(key, []).extend(items)
+
+
+@event.listens_for(Session, 'after_commit')
+def _run_handlers(session):
+    pending = session.info.pop("after_commit", None)
+    if not pending:
+        return
+    for key, (_, handler) in sorted(_handlers.items(), key=lambda item: item[1][0]):
+        if key in pending:
+            try:
+                handler(pending[key])
+            except Exception as e:
+                # The commit already happened; one failing handler mustn't stop the others
+                print(f"--- ERROR IN AFTER-COMMIT HANDLER {key} ---: {e}", file=sys.stderr)
+
+
+# after_soft_rollback also fires when no connection was opened yet, where after_rollback doesn't
+@event.listens_for(Session, 'after_soft_rollback')
+def _drop_pending(session, previous_transaction):
+    # A rolled-back savepoint leaves the outer transaction (and what it queued) alive
+    if not previous_transaction.nested:
+        session.info.pop("after_commit", None)
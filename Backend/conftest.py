@@ -1,5 +1,5 @@
 import pytest
-from app import app
+from app import app, upgrade_schema
 from models import db
 
 @pytest.fixture
@@ -9,6 +9,7 @@ def client():
 
     with app.app_context():
         db.create_all()
+        upgrade_schema()
         yield app.test_client()
 
         db.session.remove()
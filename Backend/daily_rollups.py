@@ -0,0 +1,97 @@
+"""
+Per-day rollups of registrations, signups, approvals and completions.
+
+Every countable activity_log insert bumps its day's row in daily_rollup,
+both for its event and for the all-events total (event_id 0), inside the
+same transaction. The dashboard then reads a date range straight off the
+(metric, event_id, day) primary key. Bulk Core inserts into activity_log skip
+mapper events and call add_counts() themselves; rebuild_daily_rollups()
+recomputes everything from activity_log.
+"""
+import datetime
+from datetime import timezone
+
+from sqlalchemy import event, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, ActivityLog, DailyRollup
+
+rollup_table = DailyRollup.__table__
+
+# activity_log type -> (metric, delta)
+ACTIVITY_METRICS = {
+    "registration": ("registrations", 1),
+    "signup_requested": ("signups", 1),
+    "event_signup": ("approvals", 1),
+    "invite_completed": ("completions", 1),
+    "invite_uncompleted": ("completions", -1),
+}
+METRICS = ("registrations", "signups", "approvals", "completions")
+ALL_EVENTS = 0
+
+
+def add_counts(connection, metric, day, event_id=None, delta=1):
+    """Add delta to the day's total, and to the event's row when there is one (SQLite upsert)."""
+    keys = [ALL_EVENTS] if not event_id else [ALL_EVENTS, event_id]
+    statement = sqlite_insert(rollup_table).values([
+        {"metric": metric, "event_id": key, "day": day, "count": delta} for key in keys
+    ])
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[rollup_table.c.metric, rollup_table.c.event_id, rollup_table.c.day],
+        set_={"count": rollup_table.c.count + statement.excluded.count},
+    ))
+
+
+@event.listens_for(ActivityLog, 'after_insert')
+def _activity_inserted(mapper, connection, target):
+    if target.type in ACTIVITY_METRICS:
+        metric, delta = ACTIVITY_METRICS[target.type]
+        created_at = target.created_at or datetime.datetime.now(timezone.utc)
+        add_counts(connection, metric, created_at.date(), target.event_id, delta)
+
+
+def rebuild_daily_rollups():
+    """Recompute daily_rollup from activity_log."""
+    day = func.date(ActivityLog.created_at)
+    delta = db.case(
+        *((ActivityLog.type == activity_type, value) for activity_type, (_, value) in ACTIVITY_METRICS.items())
+    )
+    rows = db.session.execute(
+        db.select(ActivityLog.type, func.coalesce(ActivityLog.event_id, ALL_EVENTS), day, func.sum(delta))
+        .where(ActivityLog.type.in_(ACTIVITY_METRICS))
+        .group_by(ActivityLog.type, ActivityLog.event_id, day)
+    )
+
+    counts = {}
+    for activity_type, event_id, day_text, total in rows:
+        metric = ACTIVITY_METRICS[activity_type][0]
+        day_value = datetime.date.fromisoformat(day_text)
+        for key in {ALL_EVENTS, event_id}:
+            counts[(metric, key, day_value)] = counts.get((metric, key, day_value), 0) + total
+
+    DailyRollup.query.delete()
+    if counts:
+        db.session.execute(db.insert(DailyRollup), [
+            {"metric": metric, "event_id": event_id, "day": day_value, "count": count}
+            for (metric, event_id, day_value), count in counts.items()
+        ])
+    db.session.commit()
+    return len(counts)
+
+
+def daily_series(start, end, metrics=METRICS, event_id=ALL_EVENTS):
+    """One dict per day from start to end inclusive, with a count for each metric (0 if none)."""
+    series = {}
+    day = start
+    while day <= end:
+        series[day] = dict.fromkeys(metrics, 0)
+        day += datetime.timedelta(days=1)
+
+    rows = DailyRollup.query.with_entities(DailyRollup.metric, DailyRollup.day, DailyRollup.count).filter(
+        DailyRollup.metric.in_(metrics),
+        DailyRollup.event_id == event_id,
+        DailyRollup.day.between(start, end),
+    )
+    for metric, day, count in rows:
+        series[day][metric] = count
+    return [dict(counts, day=day.isoformat()) for day, counts in series.items()]
@@ -0,0 +1,188 @@
+"""
+In-process pub/sub behind the Server-Sent Events endpoint.
+
+Committed changes are published once: mapper events queue them on the
+session and they go out in after_commit, so a rolled-back write is never
+pushed. Every message gets an increasing id and is kept in a short history,
+so a client that reconnects with Last-Event-ID gets what it missed.
+
+Each subscriber has a bounded buffer and a threading.Event. An idle
+connection is one thread blocked in Event.wait(); publishing touches only the
+subscribers whose channels match. A subscriber whose buffer fills up is cut
+off (it gets a "reset" and resumes from history on reconnect) rather than
+letting it hold memory or slow down publishers.
+"""
+import json
+import threading
+from collections import deque
+
+from sqlalchemy import event as sa_event, inspect
+
+from commit_hooks import on_commit, queue
+from models import Notification, EventInvite
+
+
+class Subscription:
+
+    def __init__(self, channels, buffer_size):
+        self.channels = frozenset(channels)
+        self.buffer = deque()
+        self.buffer_size = buffer_size
+        self.overflowed = False
+        self.missed = False
+        self._ready = threading.Event()
+
+    def _push(self, message):
+        if len(self.buffer) >= self.buffer_size:
+            self.overflowed = True
+        else:
+            self.buffer.append(message)
+        self._ready.set()
+
+    def wait(self, timeout):
+        """Messages buffered so far, waiting up to timeout seconds for the first one."""
+        if not self.buffer and not self.overflowed:
+            self._ready.wait(timeout)
+        self._ready.clear()
+        messages = []
+        while self.buffer:
+            messages.append(self.buffer.popleft())
+        return messages
+
+
+class EventBroker:
+
+    def __init__(self, history_size=1000, buffer_size=100):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+        self._last_id = 0
+        self.published = 0
+        self.overflows = 0
+
+    def publish(self, event_type, data, channels):
+        """Send data to every subscriber listening on any of channels; returns the message id."""
+        with self._lock:
+            self._last_id += 1
+            message = (self._last_id, event_type, json.dumps(data), frozenset(channels))
+            self._history.append(message)
+            self.published += 1
+            for subscription in self._subscribers:
+                if not subscription.overflowed and subscription.channels & message[3]:
+                    subscription._push(message)
+                    if subscription.overflowed:
+                        self.overflows += 1
+            return self._last_id
+
+    def subscribe(self, channels, last_event_id=None):
+        """Register a subscriber; with last_event_id, replay newer messages from history first.
+
+        missed is set when history no longer reaches back to last_event_id,
+        so the client knows to reload instead of trusting the replay.
+        """
+        subscription = Subscription(channels, self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                oldest = self._history[0][0] if self._history else self._last_id + 1
+                subscription.missed = last_event_id < oldest - 1 or last_event_id > self._last_id
+                for message in self._history:
+                    if message[0] > last_event_id and subscription.channels & message[3]:
+                        subscription.buffer.append(message)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "published": self.published,
+                "overflows": self.overflows,
+                "last_id": self._last_id,
+            }
+
+
+broker = EventBroker()
+
+
+def format_message(message):
+    """One SSE frame."""
+    message_id, event_type, data, _ = message
+    return f"id: {message_id}\nevent: {event_type}\ndata: {data}\n\n"
+
+
+def notification_channels(notification):
+    """Direct notifications go to their recipient; broadcasts to their audience.
+
+    Admin broadcasts also stay on the original "notifications" channel.
+    """
+    if notification.recipient_id is not None:
+        return {f"user:{notification.recipient_id}"}
+    channels = {f"notifications:{notification.audience}"}
+    if notification.audience == 'admin':
+        channels.add("notifications")
+    return channels
+
+
+def invite_channels(invite):
+    return {"invites", f"user:{invite.user_id}"}
+
+
+def _queue(session, event_type, data, channels):
+    queue(session, "event_stream", (event_type, data, channels))
+
+
+@sa_event.listens_for(Notification, 'after_insert')
+def _notification_inserted(mapper, connection, target):
+    _queue(inspect(target).session, "notification", {
+        "id": target.id,
+        "message": target.message,
+        "type": target.type,
+        "created_at": target.created_at.isoformat() if target.created_at else None,
+        "direct": target.recipient_id is not None,
+    }, notification_channels(target))
+
+
+def _invite_message(target):
+    return {
+        "invite_id": target.id,
+        "event_id": target.event_id,
+        "user_id": target.user_id,
+        "status": target.status,
+        "type": target.type,
+        "completed": target.completed,
+    }
+
+
+def queue_invite_updates(session, invites):
+    """Queue invite messages for rows changed by a bulk UPDATE (no mapper events fire for those)."""
+    for invite in invites:
+        _queue(session, "invite", _invite_message(invite), invite_channels(invite))
+
+
+@sa_event.listens_for(EventInvite, 'after_insert')
+def _invite_inserted(mapper, connection, target):
+    _queue(inspect(target).session, "invite", _invite_message(target), invite_channels(target))
+
+
+@sa_event.listens_for(EventInvite, 'after_update')
+def _invite_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.status.history.has_changes() or state.attrs.completed.history.has_changes():
+        _queue(state.session, "invite", _invite_message(target), invite_channels(target))
+
+
+@sa_event.listens_for(EventInvite, 'after_delete')
+def _invite_deleted(mapper, connection, target):
+    _queue(inspect(target).session, "invite_deleted", _invite_message(target), invite_channels(target))
+
+
+# After the caches have dropped what the message is about
+@on_commit("event_stream", order=100)
+def _publish_committed(messages):
+    for event_type, data, channels in messages:
+        broker.publish(event_type, data, channels)
@@ -0,0 +1,213 @@
+"""
+Password hashing off the request thread.
+
+Hashes run in a small process pool so a burst of logins/registrations can't pin
+the Flask worker threads. The number of hashes in flight is capped; callers that
+can't get a slot in time get HashingBusyError (the endpoints turn that into a 503).
+"""
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, generate_password_hash, check_password_hash
+
+# werkzeug's own default, written out in full
+DEFAULT_METHOD = "scrypt:32768:8:1"
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full."""
+
+
+def normalize_method(method):
+    """The method string werkzeug stores in the hash, with its defaults filled in.
+
+    "pbkdf2:sha256" becomes "pbkdf2:sha256:1000000", "scrypt" becomes
+    "scrypt:32768:8:1", so needs_rehash() can compare it with stored prefixes.
+    Raises ValueError for anything werkzeug can't hash or check with.
+    """
+    name, *args = method.split(":")
+    if name == "scrypt" and len(args) in (0, 3):
+        n, r, p = map(int, args) if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    if name == "pbkdf2" and len(args) <= 2:
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        hashlib.new(hash_name)  # ValueError if this OpenSSL doesn't have the digest
+        return f"pbkdf2:{hash_name}:{iterations}"
+    raise ValueError(f"Unsupported password hash method {method!r}")
+
+
+def is_valid_hash(pwhash):
+    """True if pwhash looks like a werkzeug hash ("method$salt$hash") with a usable method."""
+    parts = pwhash.split("$")
+    if len(parts) != 3 or not all(parts):
+        return False
+    try:
+        normalize_method(parts[0])
+    except ValueError:
+        return False
+    return True
+
+
+_config = {
+    "method": normalize_method(os.environ.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD)),
+    "workers": int(os.environ.get("PASSWORD_HASH_WORKERS", min(4, os.cpu_count() or 1))),
+    "queue_size": int(os.environ.get("PASSWORD_HASH_QUEUE_SIZE", 64)),
+    "queue_timeout": float(os.environ.get("PASSWORD_HASH_QUEUE_TIMEOUT", 5)),
+}
+
+_lock = threading.Lock()
+_executor = None
+_slots = threading.BoundedSemaphore(_config["queue_size"])
+
+_metrics = {
+    "hashes_total": 0,
+    "verifications_total": 0,
+    "rehashes_total": 0,
+    "rejected_total": 0,
+    "seconds_total": 0.0,
+    "queue_depth": 0,
+    "max_queue_depth": 0,
+}
+_started_at = time.monotonic()
+
+
+def configure(method=None, workers=None, queue_size=None, queue_timeout=None):
+    """Change hashing settings. Restarts the pool if it was already running.
+
+    method is a werkzeug method string, e.g. "scrypt:16384:8:1" or
+    "pbkdf2:sha256:600000"; left-out parameters get werkzeug's defaults.
+    workers=0 hashes inline on the calling thread.
+    """
+    global _executor, _slots
+    with _lock:
+        if method is not None:
+            _config["method"] = normalize_method(method)
+        if workers is not None:
+            _config["workers"] = workers
+        if queue_size is not None:
+            _config["queue_size"] = queue_size
+            _slots = threading.BoundedSemaphore(queue_size)
+        if queue_timeout is not None:
+            _config["queue_timeout"] = queue_timeout
+        if _executor is not None:
+            _executor.shutdown(wait=False)
+            _executor = None
+
+
+def get_method():
+    return _config["method"]
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None and _config["workers"] > 0:
+            _executor = ProcessPoolExecutor(max_workers=_config["workers"])
+        return _executor
+
+
+def _run(func, *args):
+    """Run func(*args) in the pool (or inline), holding one queue slot while it runs."""
+    slots = _slots
+    if not slots.acquire(timeout=_config["queue_timeout"]):
+        with _lock:
+            _metrics["rejected_total"] += 1
+        raise HashingBusyError("Password hashing queue is full")
+
+    with _lock:
+        _metrics["queue_depth"] += 1
+        _metrics["max_queue_depth"] = max(_metrics["max_queue_depth"], _metrics["queue_depth"])
+
+    start = time.perf_counter()
+    try:
+        executor = _get_executor()
+        if executor is None:
+            return func(*args)
+        return executor.submit(func, *args).result()
+    finally:
+        elapsed = time.perf_counter() - start
+        with _lock:
+            _metrics["queue_depth"] -= 1
+            _metrics["seconds_total"] += elapsed
+        slots.release()
+
+
+def hash_password(password):
+    """Hash a password with the configured method."""
+    result = _run(generate_password_hash, password, _config["method"])
+    with _lock:
+        _metrics["hashes_total"] += 1
+    return result
+
+
+def verify_password(pwhash, password):
+    """Check a password against a stored hash (whatever method it was made with).
+
+    A stored hash werkzeug can't parse (e.g. a bad import) never matches.
+    """
+    if not is_valid_hash(pwhash or ""):
+        return False
+    result = _run(check_password_hash, pwhash, password)
+    with _lock:
+        _metrics["verifications_total"] += 1
+    return result
+
+
+@contextmanager
+def bulk_pool(workers=None):
+    """Separate pool for bulk jobs so an import can't eat the login/register slots."""
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 0:
+        yield None
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield pool
+
+
+def hash_many(passwords, pool=None):
+    """Hash a list of passwords, in parallel when given a bulk_pool()."""
+    method = _config["method"]
+    start = time.perf_counter()
+    if pool is None:
+        results = [generate_password_hash(password, method) for password in passwords]
+    else:
+        results = list(pool.map(generate_password_hash, passwords, [method] * len(passwords), chunksize=16))
+    elapsed = time.perf_counter() - start
+    with _lock:
+        _metrics["hashes_total"] += len(results)
+        _metrics["seconds_total"] += elapsed
+    return results
+
+
+def needs_rehash(pwhash):
+    """True if the stored hash was made with different parameters than configured (or is unusable)."""
+    try:
+        return normalize_method(pwhash.split("$", 1)[0]) != _config["method"]
+    except ValueError:
+        return True
+
+
+def record_rehash():
+    with _lock:
+        _metrics["rehashes_total"] += 1
+
+
+def get_metrics():
+    """Snapshot of hashing counters for the /metrics endpoint."""
+    with _lock:
+        snapshot = dict(_metrics)
+    completed = snapshot["hashes_total"] + snapshot["verifications_total"]
+    uptime = time.monotonic() - _started_at
+    snapshot.update({
+        "method": _config["method"],
+        "workers": _config["workers"],
+        "queue_capacity": _config["queue_size"],
+        "avg_seconds": snapshot["seconds_total"] / completed if completed else 0.0,
+        "throughput_per_second": completed / uptime if uptime else 0.0,
+    })
+    return snapshot
@@ -0,0 +1,82 @@
+"""
+Bounded LRU cache of email -> identity for the per-user endpoints.
+
+Saves the email lookup at the start of /profile, /history, /invites/user, etc.
+Only users that exist are cached, so a new account never has a stale "not found"
+entry. The cache is per process; app.py evicts a user after any commit that
+changed their user or profile row. A lookup that read the row before such a
+commit must not put its result back afterwards, so put() takes the
+generation() seen before the query and drops the entry if anything was
+invalidated since.
+"""
+import threading
+from collections import OrderedDict, namedtuple
+
+# full_name is None when the user has no profile yet
+Identity = namedtuple("Identity", ["user_id", "role", "full_name"])
+
+
+class IdentityCache:
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._emails_by_id = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._generation = 0
+
+    def generation(self):
+        with self._lock:
+            return self._generation
+
+    def get(self, email):
+        with self._lock:
+            identity = self._entries.get(email)
+            if identity is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(email)
+            self.hits += 1
+            return identity
+
+    def put(self, email, identity, generation=None):
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[email] = identity
+            self._entries.move_to_end(email)
+            self._emails_by_id[identity.user_id] = email
+            while len(self._entries) > self.maxsize:
+                _, evicted = self._entries.popitem(last=False)
+                self._emails_by_id.pop(evicted.user_id, None)
+                self.evictions += 1
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            self._generation += 1
+            email = self._emails_by_id.pop(user_id, None)
+            if email is not None:
+                self._entries.pop(email, None)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._emails_by_id.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -1,19 +1,28 @@
 from flask_sqlalchemy import SQLAlchemy
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
+from hashing import hash_password, verify_password
 import datetime
 from datetime import timezone
 import os
 
 db = SQLAlchemy()
 
+
+def normalize_email(email):
+    """Canonical form used for lookups, so Foo@x.com and foo@x.com are one account."""
+    return email.strip().lower() if email else email
+
+
 # USER CREDENTIALS MODEL
 class UserCredentials(db.Model):
     __tablename__ = 'user_credentials'
 
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(255), nullable=False, unique=True)
+    # Lowercased copy of email; every lookup goes through this index
+    email_normalized = db.Column(db.String(255), unique=True, index=True)
     password_hash = db.Column(db.String(255), nullable=False)
-    role = db.Column(db.String(20), default='volunteer')
+    role = db.Column(db.String(20), default='volunteer', index=True)
 
     # Correct 1→1 mapping using ONLY back_populates
     profile = db.relationship(
@@ -37,11 +46,17 @@ class UserCredentials(db.Model):
         cascade="all, delete-orphan"
     )
 
+    @validates('email')
+    def _sync_email_normalized(self, key, value):
+        self.email_normalized = normalize_email(value)
+        return value
+
+    # Both run in the hashing process pool, see hashing.py
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
 
 
@@ -66,6 +81,12 @@ class UserProfile(db.Model):
     # CORRECT — single relationship matching parent
     user = db.relationship("UserCredentials", back_populates="profile")
 
+    # Case-insensitive name prefix search on GET /users; state/zip grouping on /analytics/geo
+    __table_args__ = (
+        db.Index('ix_user_profile_full_name_nocase', db.text('full_name COLLATE NOCASE')),
+        db.Index('ix_user_profile_state_zipcode', 'state', 'zipcode'),
+    )
+
 
 # EVENT DETAILS MODEL
 class EventDetails(db.Model):
@@ -92,6 +113,10 @@ class EventDetails(db.Model):
     volunteers = db.relationship("VolunteerHistory", back_populates="event", cascade="all, delete-orphan")
     invites = db.relationship("EventInvite", back_populates="event", cascade="all, delete-orphan")
 
+    # State/zip grouping on /analytics/geo
+    __table_args__ = (
+        db.Index('ix_event_details_state_zipcode', 'state', 'zipcode'),
+    )
 
 
 # VOLUNTEER HISTORY MODEL
@@ -109,6 +134,26 @@ class VolunteerHistory(db.Model):
     user = db.relationship("UserCredentials", back_populates="volunteer_history")
     event = db.relationship("EventDetails", back_populates="volunteers")
 
+    # Per-user history page and MAX(participation_date) for volunteer_stats;
+    # (participation_date, id) is the watermark range for delta reports
+    __table_args__ = (
+        db.Index('ix_volunteer_history_user_date', 'user_id', 'participation_date'),
+        db.Index('ix_volunteer_history_date_id', 'participation_date', 'id'),
+        # Event -> volunteers joins; rowid order within an event matches the report sort
+        db.Index('ix_volunteer_history_event_id', 'event_id'),
+    )
+
+
+# VOLUNTEER STATS MODEL
+# One row per volunteer, kept up to date on history/invite writes (see volunteer_stats.py)
+class VolunteerStats(db.Model):
+    __tablename__ = 'volunteer_stats'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user_credentials.id'), primary_key=True)
+    events_attended = db.Column(db.Integer, nullable=False, default=0)
+    completed_count = db.Column(db.Integer, nullable=False, default=0)
+    last_participation = db.Column(db.DateTime)
+
 
 # STATES MODEL
 class States(db.Model):
@@ -133,8 +178,16 @@ class EventInvite(db.Model):
     user = db.relationship("UserCredentials", back_populates="invites")
     event = db.relationship("EventDetails", back_populates="invites")
 
+    # The expiry sweeper walks pending invites oldest-first
+    __table_args__ = (
+        db.Index('ix_event_invite_status_created_at', 'status', 'created_at'),
+    )
+
 
 # NOTIFICATIONS MODEL
+# recipient_id set: a direct notification, read is the recipient's flag.
+# recipient_id NULL: a broadcast to every user whose role is `audience`; each
+# user's read state is a NotificationReceipt row (see notification_counters.py).
 class Notification(db.Model):
     __tablename__ = 'notification'
 
@@ -143,4 +196,78 @@ class Notification(db.Model):
     type = db.Column(db.String(50), default="info")
     created_at = db.Column(db.DateTime, default=lambda: datetime.datetime.now(timezone.utc))
     read = db.Column(db.Boolean, default=False, nullable=False)
+    recipient_id = db.Column(db.Integer, db.ForeignKey('user_credentials.id'))
+    audience = db.Column(db.String(20))
+
+    __table_args__ = (
+        db.Index('ix_notification_recipient_read_created_at', 'recipient_id', 'read', 'created_at'),
+    )
+
+
+# Per-user read receipts for broadcast notifications
+class NotificationReceipt(db.Model):
+    __tablename__ = 'notification_receipt'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user_credentials.id'), primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notification.id'), primary_key=True)
+
+
+# Unread badge counts, kept up to date on notification writes (see notification_counters.py).
+# unread counts direct notifications; broadcasts_read counts receipts for the user's audience.
+class NotificationCounter(db.Model):
+    __tablename__ = 'notification_counter'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('user_credentials.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+    broadcasts_read = db.Column(db.Integer, nullable=False, default=0)
+
+
+# Number of broadcasts sent to each audience
+class BroadcastCounter(db.Model):
+    __tablename__ = 'broadcast_counter'
+
+    audience = db.Column(db.String(20), primary_key=True)
+    total = db.Column(db.Integer, nullable=False, default=0)
+
+
+
+# ACTIVITY LOG MODEL
+# Append-only; each mutating endpoint adds a row in the same transaction as its change
+class ActivityLog(db.Model):
+    __tablename__ = 'activity_log'
+
+    id = db.Column(db.Integer, primary_key=True)
+    type = db.Column(db.String(50), nullable=False)
+    # Copied at write time so the feed still reads right after a user/event is deleted
+    user_email = db.Column(db.String(255))
+    event_name = db.Column(db.String(255))
+    user_id = db.Column(db.Integer)
+    event_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.datetime.now(timezone.utc), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_activity_log_created_at_id', 'created_at', 'id'),
+    )
+
+
+# DAILY ROLLUP MODEL
+# Activity counts per day, kept up to date from activity_log inserts (see daily_rollups.py).
+# event_id 0 holds the totals across all events.
+class DailyRollup(db.Model):
+    __tablename__ = 'daily_rollup'
+
+    metric = db.Column(db.String(30), primary_key=True)
+    event_id = db.Column(db.Integer, primary_key=True, default=0)
+    day = db.Column(db.Date, primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# AVAILABILITY MODEL
+# Volunteers available per calendar day, kept up to date on profile writes (see availability.py).
+# skill '' is everyone; other rows count the volunteers with that skill (lowercased).
+class AvailabilityDay(db.Model):
+    __tablename__ = 'availability_day'
 
+    day = db.Column(db.Date, primary_key=True)
+    skill = db.Column(db.String(100), primary_key=True, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
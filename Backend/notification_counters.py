@@ -0,0 +1,243 @@
+"""
+Per-user notifications and O(1) unread badge counts.
+
+Direct notifications (recipient_id set) bump the recipient's
+notification_counter.unread on insert and drop it when marked read.
+Broadcasts are stored once (fan-out on read): broadcast_counter.total counts
+them per audience, and a user's read receipts are counted in
+notification_counter.broadcasts_read. The badge is then
+
+    unread + total[role] - broadcasts_read
+
+which unread_count() reads with one statement over two primary keys.
+Mapper events keep the counters right inside the same transaction; the bulk
+helpers here adjust them themselves, and rebuild_notification_counters()
+recomputes everything.
+"""
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, UserCredentials, Notification, NotificationReceipt, NotificationCounter, BroadcastCounter
+
+counter_table = NotificationCounter.__table__
+broadcast_table = BroadcastCounter.__table__
+receipt_table = NotificationReceipt.__table__
+notification_table = Notification.__table__
+credentials_table = UserCredentials.__table__
+
+# Broadcasts without an audience are the admin notices (registrations, invites, imports)
+DEFAULT_AUDIENCE = 'admin'
+
+
+def adjust_counter(connection, user_id, unread=0, broadcasts_read=0):
+    """Add deltas to a user's counter row, creating it if needed (SQLite upsert)."""
+    statement = sqlite_insert(counter_table).values(
+        user_id=user_id, unread=max(unread, 0), broadcasts_read=max(broadcasts_read, 0)
+    )
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[counter_table.c.user_id],
+        set_={
+            "unread": counter_table.c.unread + unread,
+            "broadcasts_read": counter_table.c.broadcasts_read + broadcasts_read,
+        },
+    ))
+
+
+def adjust_broadcasts(connection, audience, delta):
+    statement = sqlite_insert(broadcast_table).values(audience=audience, total=max(delta, 0))
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=[broadcast_table.c.audience],
+        set_={"total": broadcast_table.c.total + delta},
+    ))
+
+
+def _receipts_for_audience(user_id, audience):
+    """Scalar subquery: how many of the user's receipts are for broadcasts to audience."""
+    return db.select(func.count()).select_from(
+        receipt_table.join(notification_table, notification_table.c.id == receipt_table.c.notification_id)
+    ).where(
+        receipt_table.c.user_id == user_id, notification_table.c.audience == audience
+    ).scalar_subquery()
+
+
+@event.listens_for(Notification, 'before_insert')
+def _default_audience(mapper, connection, target):
+    if target.recipient_id is None and target.audience is None:
+        target.audience = DEFAULT_AUDIENCE
+
+
+@event.listens_for(Notification, 'after_insert')
+def _notification_inserted(mapper, connection, target):
+    if target.recipient_id is not None:
+        if not target.read:
+            adjust_counter(connection, target.recipient_id, unread=1)
+    else:
+        adjust_broadcasts(connection, target.audience, 1)
+
+
+@event.listens_for(Notification, 'after_update')
+def _notification_updated(mapper, connection, target):
+    # The legacy global read flag on broadcasts doesn't touch anyone's badge
+    if target.recipient_id is None:
+        return
+    history = inspect(target).attrs.read.history
+    if not history.has_changes():
+        return
+    was_read = bool(history.deleted and history.deleted[0])
+    if bool(target.read) != was_read:
+        adjust_counter(connection, target.recipient_id, unread=-1 if target.read else 1)
+
+
+@event.listens_for(Notification, 'before_delete')
+def _notification_deleting(mapper, connection, target):
+    if target.recipient_id is not None:
+        if not target.read:
+            adjust_counter(connection, target.recipient_id, unread=-1)
+        return
+    adjust_broadcasts(connection, target.audience, -1)
+    # Only receipts for the reader's current audience are in broadcasts_read
+    readers = db.select(receipt_table.c.user_id).select_from(
+        receipt_table.join(credentials_table, credentials_table.c.id == receipt_table.c.user_id)
+    ).where(receipt_table.c.notification_id == target.id, credentials_table.c.role == target.audience)
+    connection.execute(counter_table.update().where(counter_table.c.user_id.in_(readers)).values(
+        broadcasts_read=counter_table.c.broadcasts_read - 1
+    ))
+    connection.execute(receipt_table.delete().where(receipt_table.c.notification_id == target.id))
+
+
+@event.listens_for(NotificationReceipt, 'after_insert')
+def _receipt_inserted(mapper, connection, target):
+    adjust_counter(connection, target.user_id, broadcasts_read=1)
+
+
+@event.listens_for(UserCredentials, 'after_update')
+def _role_changed(mapper, connection, target):
+    # broadcasts_read only counts receipts for the current audience
+    if not inspect(target).attrs.role.history.has_changes():
+        return
+    adjust_counter(connection, target.id)
+    connection.execute(counter_table.update().where(counter_table.c.user_id == target.id).values(
+        broadcasts_read=_receipts_for_audience(target.id, target.role)
+    ))
+
+
+def unread_count(user_id, role):
+    """The user's badge count: one statement, two primary-key lookups."""
+    unread = db.select(counter_table.c.unread - counter_table.c.broadcasts_read) \
+        .where(counter_table.c.user_id == user_id).scalar_subquery()
+    total = db.select(broadcast_table.c.total).where(broadcast_table.c.audience == role).scalar_subquery()
+    return db.session.execute(db.select(func.coalesce(unread, 0) + func.coalesce(total, 0))).scalar()
+
+
+def addressed_to(notification, user_id, role):
+    if notification.recipient_id is not None:
+        return notification.recipient_id == user_id
+    return notification.audience == role
+
+
+def mark_read(notification, user_id, role):
+    """Mark one notification read for the user. False if it isn't addressed to them."""
+    if not addressed_to(notification, user_id, role):
+        return False
+    if notification.recipient_id is not None:
+        notification.read = True
+        return True
+    _add_receipt(db.session.connection(), user_id, notification.id)
+    return True
+
+
+def _add_receipt(connection, user_id, notification_id):
+    # A double click can race here; the second insert is a no-op instead of an IntegrityError
+    inserted = connection.execute(
+        sqlite_insert(receipt_table).values(user_id=user_id, notification_id=notification_id).on_conflict_do_nothing()
+    ).rowcount
+    if inserted == 1:
+        adjust_counter(connection, user_id, broadcasts_read=1)
+
+
+def mark_read_for_audience(notification):
+    """The legacy shared mark-read: set the broadcast's read flag and give everyone in its audience a receipt.
+
+    The old admin feed hides flagged broadcasts, so every admin's badge has
+    to stop counting it too.
+    """
+    notification.read = True
+    connection = db.session.connection()
+    readers = db.session.execute(
+        db.select(UserCredentials.id).where(UserCredentials.role == notification.audience)
+    ).scalars().all()
+    for user_id in readers:
+        _add_receipt(connection, user_id, notification.id)
+
+
+def mark_all_read(user_id, role):
+    """Mark every direct notification and audience broadcast read for the user (bulk statements)."""
+    direct = Notification.query.filter(
+        Notification.recipient_id == user_id, Notification.read.is_(False)
+    ).update({Notification.read: True}, synchronize_session=False)
+
+    unseen = db.select(db.literal(user_id), Notification.id).where(
+        Notification.recipient_id.is_(None), Notification.audience == role,
+        ~db.exists().where(NotificationReceipt.user_id == user_id, NotificationReceipt.notification_id == Notification.id)
+    )
+    broadcasts = db.session.execute(
+        sqlite_insert(receipt_table).from_select(['user_id', 'notification_id'], unseen).on_conflict_do_nothing()
+    ).rowcount
+
+    adjust_counter(db.session.connection(), user_id, unread=-direct, broadcasts_read=broadcasts)
+    return direct + broadcasts
+
+
+def delete_user_notifications(user_id):
+    """Remove a user's direct notifications, receipts and counter (before deleting the user)."""
+    Notification.query.filter(Notification.recipient_id == user_id).delete(synchronize_session=False)
+    NotificationReceipt.query.filter(NotificationReceipt.user_id == user_id).delete(synchronize_session=False)
+    NotificationCounter.query.filter(NotificationCounter.user_id == user_id).delete(synchronize_session=False)
+
+
+def import_legacy_read_flags():
+    """Turn the shared read flag on admin broadcasts into a receipt for every admin.
+
+    Before per-user read state, marking a notification read hid it for all
+    admins; this keeps those as read for each of them after the upgrade.
+    Run rebuild_notification_counters() afterwards.
+    """
+    admins_x_read = db.select(UserCredentials.id, Notification.id).join(Notification, db.true()).where(
+        UserCredentials.role == DEFAULT_AUDIENCE,
+        Notification.recipient_id.is_(None), Notification.audience == DEFAULT_AUDIENCE, Notification.read.is_(True)
+    )
+    return db.session.execute(
+        sqlite_insert(receipt_table).from_select(['user_id', 'notification_id'], admins_x_read).on_conflict_do_nothing()
+    ).rowcount
+
+
+def rebuild_notification_counters():
+    """Recompute notification_counter and broadcast_counter from the notifications and receipts."""
+    unread = dict(db.session.execute(
+        db.select(Notification.recipient_id, func.count())
+        .where(Notification.recipient_id.isnot(None), Notification.read.is_(False))
+        .group_by(Notification.recipient_id)
+    ).all())
+    receipts = dict(db.session.execute(
+        db.select(NotificationReceipt.user_id, func.count())
+        .join(Notification, Notification.id == NotificationReceipt.notification_id)
+        .join(UserCredentials, UserCredentials.id == NotificationReceipt.user_id)
+        .where(Notification.audience == UserCredentials.role)
+        .group_by(NotificationReceipt.user_id)
+    ).all())
+    totals = db.session.execute(
+        db.select(Notification.audience, func.count())
+        .where(Notification.recipient_id.is_(None))
+        .group_by(Notification.audience)
+    ).all()
+
+    NotificationCounter.query.delete()
+    BroadcastCounter.query.delete()
+    rows = [{"user_id": user_id, "unread": unread.get(user_id, 0), "broadcasts_read": receipts.get(user_id, 0)}
+            for user_id in set(unread) | set(receipts)]
+    if rows:
+        db.session.execute(db.insert(NotificationCounter), rows)
+    if totals:
+        db.session.execute(db.insert(BroadcastCounter), [{"audience": a, "total": n} for a, n in totals])
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,362 @@
+"""
+In-memory columnar snapshot of the fact tables for dashboard pivots.
+
+Each fact (events, invites, history) is held as parallel arrays: the row ids
+plus one dictionary-encoded column per dimension (state, city, month, ...).
+A pivot is then a group-by over small integer codes that runs entirely in
+C iterators (map/compress/zip feeding a Counter) instead of a table scan in
+SQLite.
+
+Refreshes run on a background thread (start()), never on a request.
+They are incremental: rows with id above the snapshot's watermark are
+appended (a range scan on the primary key), and rows whose dimensions were
+updated since the last refresh are re-read by id and overwritten in place.
+ORM updates of invites and events are tracked through mapper events; bulk
+UPDATEs must call mark_changed(). A full reload every full_refresh_seconds
+is built off to the side and swapped in, and is the only thing that picks up
+deleted rows, so pivots can count a deleted row for up to that long.
+"""
+import bisect
+import operator
+import sys
+import threading
+import time
+import weakref
+from array import array
+from collections import Counter
+from itertools import compress, repeat
+
+from sqlalchemy import event, inspect
+
+from commit_hooks import on_commit, queue
+from models import db, EventDetails, EventInvite, VolunteerHistory
+
+
+def _month(value):
+    return value.strftime("%Y-%m") if value else None
+
+
+# Per fact: its id and event id columns, {dimension: (column, transform)} and how to add the joins
+FACTS = {
+    "events": {
+        "id": EventDetails.id,
+        "event_id": EventDetails.id,
+        "dimensions": {
+            "state": (EventDetails.state, None),
+            "city": (EventDetails.city, None),
+            "month": (EventDetails.event_date, _month),
+            "urgency": (EventDetails.urgency, None),
+            "status": (EventDetails.status, None),
+        },
+        "join": lambda select: select,
+    },
+    "invites": {
+        "id": EventInvite.id,
+        "event_id": EventInvite.event_id,
+        "dimensions": {
+            "state": (EventDetails.state, None),
+            "city": (EventDetails.city, None),
+            "month": (EventInvite.created_at, _month),
+            "urgency": (EventDetails.urgency, None),
+            "status": (EventInvite.status, None),
+            "type": (EventInvite.type, None),
+        },
+        "join": lambda select: select.select_from(EventInvite).outerjoin(
+            EventDetails, EventDetails.id == EventInvite.event_id),
+    },
+    "history": {
+        "id": VolunteerHistory.id,
+        "event_id": VolunteerHistory.event_id,
+        "dimensions": {
+            "state": (EventDetails.state, None),
+            "city": (EventDetails.city, None),
+            "month": (VolunteerHistory.participation_date, _month),
+            "urgency": (EventDetails.urgency, None),
+            "status": (EventDetails.status, None),
+        },
+        "join": lambda select: select.select_from(VolunteerHistory).outerjoin(
+            EventDetails, EventDetails.id == VolunteerHistory.event_id),
+    },
+}
+
+
+# Updates to these columns change a dimension of an existing row
+TRACKED_UPDATES = {
+    EventDetails: ("events", ("state", "city", "event_date", "urgency", "status")),
+    EventInvite: ("invites", ("status", "type", "event_id", "created_at")),
+}
+
+
+class PivotError(ValueError):
+    """Unknown fact or dimension in a pivot request."""
+
+
+class Dictionary:
+    """Value <-> small int code for one dimension."""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class FactColumns:
+    """Row ids plus one code array and dictionary per dimension."""
+
+    def __init__(self, dimensions):
+        self.ids = array('q')
+        self.columns = {name: array('l') for name in dimensions}
+        self.dictionaries = {name: Dictionary() for name in dimensions}
+
+    @property
+    def watermark(self):
+        return self.ids[-1] if self.ids else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+
+_snapshots = weakref.WeakSet()
+
+
+class OlapSnapshot:
+
+    def __init__(self, refresh_seconds=30, full_refresh_seconds=600, batch_size=5000):
+        self.refresh_seconds = refresh_seconds
+        self.full_refresh_seconds = full_refresh_seconds
+        self.batch_size = batch_size
+        self._lock = threading.Lock()  # guards _facts and _changed; held by queries
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+        self._facts = {}
+        self._changed = {"events": set(), "invites": set()}
+        self._loaded_at = 0.0
+        self._thread = None
+        self.incremental_refreshes = 0
+        self.full_refreshes = 0
+        self.updated_rows = 0
+        self.queries = 0
+        _snapshots.add(self)
+
+    def reset(self):
+        """Forget everything; the next query or refresh reloads from scratch."""
+        with self._lock:
+            self._facts = {}
+            self._changed = {"events": set(), "invites": set()}
+            self._loaded_at = 0.0
+
+    def mark_changed(self, fact, ids):
+        """Re-read these events/invites on the next refresh (their dimensions changed)."""
+        with self._lock:
+            self._changed[fact].update(ids)
+
+    def _select(self, name):
+        spec = FACTS[name]
+        return spec["join"](db.select(spec["id"], *(column for column, _ in spec["dimensions"].values())))
+
+    def _encode(self, target, name, rows):
+        """Encode rows of (id, *dimension values) into codes using target's dictionaries."""
+        encoders = [
+            (target.dictionaries[dim].encode, transform)
+            for dim, (_, transform) in FACTS[name]["dimensions"].items()
+        ]
+        return [
+            (row[0], [encode(transform(value) if transform else value) for (encode, transform), value in zip(encoders, row[1:])])
+            for row in rows
+        ]
+
+    def _load(self, name, target):
+        """Append every row with id > target.watermark to target."""
+        spec = FACTS[name]
+        statement = self._select(name).where(spec["id"] > target.watermark).order_by(spec["id"])
+        columns = [target.columns[dim] for dim in spec["dimensions"]]
+        rows = db.session.execute(statement.execution_options(yield_per=self.batch_size))
+        for row_id, codes in self._encode(target, name, rows):
+            target.ids.append(row_id)
+            for column, code in zip(columns, codes):
+                column.append(code)
+        return target
+
+    def _changed_rows(self, name, changed):
+        """Current dimension values of the rows that changed events/invites affect."""
+        spec = FACTS[name]
+        conditions = []
+        if changed["events"]:
+            conditions.append(spec["event_id"].in_(changed["events"]))
+        if name == "invites" and changed["invites"]:
+            conditions.append(spec["id"].in_(changed["invites"]))
+        if not conditions:
+            return []
+        return db.session.execute(self._select(name).where(db.or_(*conditions))).all()
+
+    def _apply(self, name, target, new_rows, changed_rows):
+        """Append new rows and overwrite changed ones (called with _lock held)."""
+        columns = [target.columns[dim] for dim in FACTS[name]["dimensions"]]
+        for row_id, codes in self._encode(target, name, changed_rows):
+            position = bisect.bisect_left(target.ids, row_id)
+            # Rows past the watermark arrive with new_rows instead
+            if position < len(target.ids) and target.ids[position] == row_id:
+                for column, code in zip(columns, codes):
+                    column[position] = code
+                self.updated_rows += 1
+        for row_id, codes in self._encode(target, name, new_rows):
+            target.ids.append(row_id)
+            for column, code in zip(columns, codes):
+                column.append(code)
+
+    def refresh(self, full=False, only_if_empty=False):
+        """Bring the snapshot up to date (everything again if full).
+
+        Database reads happen without holding the query lock: a full reload
+        builds new columns and swaps them in, an incremental one applies its
+        (small) batch of new and changed rows under the lock at the end.
+        """
+        with self._refresh_lock:
+            if only_if_empty and self._facts:
+                # Someone else loaded it while we waited
+                return
+            with self._lock:
+                facts = self._facts
+                full = full or not facts
+                changed, self._changed = self._changed, {"events": set(), "invites": set()}
+            if full:
+                loaded = {name: self._load(name, FactColumns(spec["dimensions"])) for name, spec in FACTS.items()}
+                with self._lock:
+                    self._facts = loaded
+                    self._loaded_at = time.monotonic()
+                    self.full_refreshes += 1
+                return
+            batches = {}
+            try:
+                for name, target in facts.items():
+                    spec = FACTS[name]
+                    new_rows = db.session.execute(
+                        self._select(name).where(spec["id"] > target.watermark).order_by(spec["id"])
+                    ).all()
+                    batches[name] = (new_rows, self._changed_rows(name, changed))
+            except Exception:
+                # Keep the changed ids for the next attempt
+                for fact, ids in changed.items():
+                    self.mark_changed(fact, ids)
+                raise
+            with self._lock:
+                # A reset() while we were reading wins
+                if self._facts is facts:
+                    for name, (new_rows, changed_rows) in batches.items():
+                        self._apply(name, facts[name], new_rows, changed_rows)
+                    self.incremental_refreshes += 1
+
+    def refresh_due(self):
+        """The periodic refresh: full when the last full reload is old enough, incremental otherwise."""
+        self.refresh(full=time.monotonic() - self._loaded_at >= self.full_refresh_seconds)
+
+    def start(self, app):
+        """Refresh every refresh_seconds on a daemon thread (once per process)."""
+        with self._refresh_lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._refresh_forever, args=(app,), name="olap-refresh", daemon=True)
+        self._thread.start()
+
+    def _refresh_forever(self, app):
+        while True:
+            with app.app_context():
+                try:
+                    self.refresh_due()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"--- ERROR IN OLAP REFRESH ---: {e}", file=sys.stderr)
+            time.sleep(self.refresh_seconds)
+
+    def _ensure_loaded(self):
+        # Only the very first query (before the background thread's first load) waits for a load
+        if not self._facts:
+            self.refresh(full=True, only_if_empty=True)
+
+    def pivot(self, fact, group_by=(), filters=None):
+        """Counts of fact rows per combination of group_by dimensions.
+
+        filters maps a dimension to the values to keep. Returns a list of
+        {dimension: value, ..., "count": n}, largest count first.
+        """
+        if fact not in FACTS:
+            raise PivotError(f"'fact' must be one of {sorted(FACTS)}")
+        dimensions = FACTS[fact]["dimensions"]
+        filters = filters or {}
+        for name in list(group_by) + list(filters):
+            if name not in dimensions:
+                raise PivotError(f"Unknown dimension '{name}' for '{fact}'; use one of {sorted(dimensions)}")
+
+        self._ensure_loaded()
+        with self._lock:
+            self.queries += 1
+            data = self._facts[fact]
+            size = len(data)
+
+            # One 0/1 mask per filter from a code lookup table, ANDed together
+            mask = None
+            for name, values in filters.items():
+                dictionary = data.dictionaries[name]
+                keep = bytearray(len(dictionary.values))
+                for value in values:
+                    code = dictionary.codes.get(value)
+                    if code is not None:
+                        keep[code] = 1
+                column_mask = map(keep.__getitem__, data.columns[name])
+                mask = column_mask if mask is None else map(operator.and_, mask, column_mask)
+
+            if group_by:
+                keys = zip(*(data.columns[name] for name in group_by))
+            else:
+                keys = repeat((), size)
+            counts = Counter(compress(keys, mask) if mask is not None else keys)
+
+            decoders = [data.dictionaries[name].values for name in group_by]
+            result = [
+                dict(zip(group_by, (values[code] for values, code in zip(decoders, key))), count=count)
+                for key, count in counts.items()
+            ]
+        result.sort(key=lambda item: -item["count"])
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rows": {name: len(columns) for name, columns in self._facts.items()},
+                "incremental_refreshes": self.incremental_refreshes,
+                "full_refreshes": self.full_refreshes,
+                "updated_rows": self.updated_rows,
+                "background": self._thread is not None,
+                "queries": self.queries,
+            }
+
+
+def mark_rows_changed(session, fact, ids):
+    """Re-read these events/invites in every snapshot once session commits (bulk UPDATEs call this)."""
+    queue(session, "olap_changes", *((fact, row_id) for row_id in ids))
+
+
+def _row_updated(mapper, connection, target):
+    fact, columns = TRACKED_UPDATES[mapper.class_]
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in columns):
+        mark_rows_changed(state.session, fact, [target.id])
+
+
+for _model in TRACKED_UPDATES:
+    event.listen(_model, 'after_update', _row_updated)
+
+
+@on_commit("olap_changes")
+def _mark_committed(changes):
+    by_fact = {}
+    for fact, row_id in changes:
+        by_fact.setdefault(fact, set()).add(row_id)
+    for snapshot in list(_snapshots):
+        for fact, ids in by_fact.items():
+            snapshot.mark_changed(fact, ids)
@@ -0,0 +1,158 @@
+"""
+Build a CSV report across a process pool, partitioned by id range.
+
+Row formatting dominates large reports and is CPU-bound Python, so it
+doesn't scale on threads. Each worker opens its own read-only sqlite3
+connection, runs the report SQL for one id range and returns that range
+already encoded as CSV text. Results are collected in range order, so the
+chunks can be written out as they arrive.
+
+Consistency: SQLite can't share one read transaction between processes, so
+each range is read in its own snapshot. A write that commits while a
+parallel report runs shows up in the ranges read after it and not in the
+ones read before. workers <= 1 reads every range in one transaction.
+
+The pool is created on first use and kept for the life of the process, so a
+report doesn't pay for starting its workers.
+"""
+import csv
+import datetime
+import io
+import sqlite3
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# SQLAlchemy stores Date/DateTime columns as ISO text; the report SQL names
+# which columns hold them so the app's row formatters get real objects back.
+CONVERTERS = {
+    "date": datetime.date.fromisoformat,
+    "datetime": datetime.datetime.fromisoformat,
+}
+
+_pool = None
+_pool_size = 0
+_pool_lock = threading.Lock()
+
+
+def id_ranges(min_id, max_id, partitions):
+    """Split [min_id, max_id] into up to `partitions` half-open (lo, hi) ranges."""
+    if min_id is None or max_id is None:
+        return []
+    span = max_id - min_id + 1
+    partitions = max(1, min(partitions, span))
+    step = -(-span // partitions)
+    return [(lo, min(lo + step, max_id + 1)) for lo in range(min_id, max_id + 1, step)]
+
+
+def _convert(rows, converters):
+    """Apply CONVERTERS by column position; converters is a kind name or None per column."""
+    functions = [(i, CONVERTERS[kind]) for i, kind in enumerate(converters) if kind]
+    if not functions:
+        yield from rows
+        return
+    for row in rows:
+        row = list(row)
+        for i, convert in functions:
+            if row[i] is not None:
+                row[i] = convert(row[i])
+        yield row
+
+
+def _range_csv(connection, sql, params, format_rows, converters, lo, hi):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    rows = connection.execute(sql, dict(params, lo=lo, hi=hi))
+    writer.writerows(format_rows(_convert(rows, converters)))
+    return buffer.getvalue()
+
+
+def _connect(db_path):
+    return sqlite3.connect(f"file:{db_path}?mode=ro", uri=True, isolation_level=None)
+
+
+def format_range(task):
+    """Worker: run sql for one (lo, hi) range and return the rows as CSV text."""
+    db_path, sql, params, format_rows, converters, lo, hi = task
+    connection = _connect(db_path)
+    try:
+        return _range_csv(connection, sql, params, format_rows, converters, lo, hi)
+    finally:
+        connection.close()
+
+
+def _submit(workers, task):
+    """Queue format_range(task) on the shared pool, growing it to `workers` processes if needed.
+
+    Returns (pool, future). The lock keeps a concurrent report from shutting
+    the pool down between picking it and submitting to it.
+    """
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is None or _pool_size < workers:
+            if _pool is not None:
+                # Work already submitted to the old pool still finishes
+                _pool.shutdown(wait=False)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_size = workers
+        return _pool, _pool.submit(format_range, task)
+
+
+def _discard_pool(pool):
+    global _pool, _pool_size
+    with _pool_lock:
+        if _pool is pool:
+            _pool, _pool_size = None, 0
+
+
+def shutdown():
+    """Stop the shared pool (tests, or a clean exit)."""
+    with _pool_lock:
+        pool = _pool
+    if pool is not None:
+        _discard_pool(pool)
+        pool.shutdown()
+
+
+def build_csv_chunks(db_path, sql, params, format_rows, ranges, workers, converters=()):
+    """Yield CSV text for each range, in range order.
+
+    sql uses named parameters: params plus :lo and :hi, returning the rows for
+    lo <= id < hi in report order. format_rows must be a module-level function
+    (it is pickled by name). converters gives a CONVERTERS key (or None) per
+    result column. workers <= 1 formats the ranges in this process; otherwise
+    at most `workers` ranges are in the shared pool at once.
+    """
+    if workers <= 1:
+        connection = _connect(db_path)
+        try:
+            connection.execute("BEGIN")
+            for lo, hi in ranges:
+                yield _range_csv(connection, sql, params, format_rows, converters, lo, hi)
+        finally:
+            connection.close()
+        return
+
+    pending = deque()
+    try:
+        for lo, hi in ranges:
+            pending.append(_submit(workers, (db_path, sql, params, format_rows, converters, lo, hi)))
+            if len(pending) >= workers:
+                yield _result(pending.popleft())
+        while pending:
+            yield _result(pending.popleft())
+    finally:
+        # The client went away (or a range failed): don't format what nobody will read
+        for _, future in pending:
+            future.cancel()
+
+
+def _result(submitted):
+    pool, future = submitted
+    try:
+        return future.result()
+    except BrokenProcessPool:
+        # A worker died; the next report starts a fresh pool
+        _discard_pool(pool)
+        raise
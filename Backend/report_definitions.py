@@ -0,0 +1,234 @@
+"""
+Report definitions: pick columns, filters, grouping and sort from a fixed set
+of fields, and compile the whole thing into one SELECT that SQLite runs.
+
+A definition is a plain dict (it arrives as JSON):
+
+    {
+        "source": "history",                       # or "invites"
+        "columns": ["volunteer_state"],
+        "aggregates": [{"func": "count", "field": "volunteer_id", "distinct": true, "as": "volunteers"}],
+        "filters": [{"field": "event_date", "op": "gte", "value": "2025-01-01"},
+                    {"field": "volunteer_skills", "op": "has_skill", "value": "First Aid"}],
+        "group_by": ["volunteer_state"],           # defaults to columns when aggregating
+        "sort": [{"field": "volunteers", "dir": "desc"}],
+        "limit": 100
+    }
+
+Only names from FIELDS can appear, aggregate aliases must be plain
+identifiers, and sorting goes through the labeled expressions, so nothing from
+the request reaches the SQL text; values are always bound parameters.
+"""
+import re
+from datetime import date, datetime
+
+from models import db, UserCredentials, UserProfile, EventDetails, VolunteerHistory, EventInvite
+
+
+class ReportDefinitionError(ValueError):
+    """The definition names an unknown field/op or has a malformed value."""
+
+
+LABEL_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]{0,63}$')
+
+
+_PERSON_AND_EVENT_FIELDS = {
+    "volunteer_id": UserCredentials.id,
+    "volunteer_email": UserCredentials.email,
+    "volunteer_name": UserProfile.full_name,
+    "volunteer_city": UserProfile.city,
+    "volunteer_state": UserProfile.state,
+    "volunteer_zipcode": UserProfile.zipcode,
+    "volunteer_skills": UserProfile.skills,
+    "event_id": EventDetails.id,
+    "event_name": EventDetails.event_name,
+    "event_date": EventDetails.event_date,
+    "event_location": EventDetails.location,
+    "event_city": EventDetails.city,
+    "event_state": EventDetails.state,
+    "event_skills": EventDetails.required_skills,
+    "event_urgency": EventDetails.urgency,
+    "event_status": EventDetails.status,
+}
+
+FIELDS = {
+    "history": dict(_PERSON_AND_EVENT_FIELDS, participation_date=VolunteerHistory.participation_date),
+    "invites": dict(
+        _PERSON_AND_EVENT_FIELDS,
+        invite_status=EventInvite.status,
+        invite_type=EventInvite.type,
+        invite_created_at=EventInvite.created_at,
+        invite_completed=EventInvite.completed,
+    ),
+}
+
+AGGREGATES = {
+    "count": db.func.count,
+    "min": db.func.min,
+    "max": db.func.max,
+    "sum": db.func.sum,
+    "avg": db.func.avg,
+}
+
+
+def _source_select(source, columns):
+    """SELECT columns FROM the source's fact table joined to its user, profile and event."""
+    fact = VolunteerHistory if source == "history" else EventInvite
+    return db.select(*columns).select_from(fact) \
+        .join(UserCredentials, UserCredentials.id == fact.user_id) \
+        .outerjoin(UserProfile, UserProfile.id == UserCredentials.id) \
+        .join(EventDetails, EventDetails.id == fact.event_id)
+
+
+def skill_match(column, skill):
+    """Whole-item match in a comma-separated skills string ("First Aid, Logistics")."""
+    padded = ',' + db.func.replace(db.func.coalesce(column, ''), ', ', ',') + ','
+    return padded.ilike(f"%,{skill.strip()},%")
+
+
+def _coerce(column, value, field):
+    """Turn a JSON value into the column's Python type."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if value is None or isinstance(value, python_type) and not (python_type is int and isinstance(value, bool)):
+        return value
+    try:
+        if python_type is datetime:
+            return datetime.fromisoformat(value)
+        if python_type is date:
+            return date.fromisoformat(value)
+        if python_type is bool:
+            if isinstance(value, str) and value.lower() in ("true", "false"):
+                return value.lower() == "true"
+            raise ValueError(value)
+        return python_type(value)
+    except (TypeError, ValueError):
+        raise ReportDefinitionError(f"Bad value {value!r} for '{field}'")
+
+
+def filter_clause(column, op, value, field):
+    """One WHERE condition for column <op> value."""
+    if not isinstance(op, str):
+        raise ReportDefinitionError(f"Filter 'op' on '{field}' must be a string")
+    if op == "has_skill":
+        if not isinstance(value, str) or not value.strip():
+            raise ReportDefinitionError(f"'has_skill' on '{field}' needs a skill name")
+        return skill_match(column, value)
+    if op == "contains":
+        if not isinstance(value, str):
+            raise ReportDefinitionError(f"'contains' on '{field}' needs a string")
+        # % and _ in the value are literal characters, not wildcards
+        return column.icontains(value, autoescape=True)
+    if op == "ieq":
+        if not isinstance(value, str):
+            raise ReportDefinitionError(f"'ieq' on '{field}' needs a string")
+        return db.func.lower(column) == value.lower()
+    if op == "is_null":
+        return column.is_(None) if value else column.isnot(None)
+    if op == "in":
+        if not isinstance(value, list) or not value:
+            raise ReportDefinitionError(f"'in' on '{field}' needs a non-empty list")
+        return column.in_([_coerce(column, item, field) for item in value])
+
+    comparisons = {
+        "eq": column.__eq__, "ne": column.__ne__,
+        "lt": column.__lt__, "lte": column.__le__,
+        "gt": column.__gt__, "gte": column.__ge__,
+    }
+    if op not in comparisons:
+        raise ReportDefinitionError(f"Unknown filter op '{op}'")
+    return comparisons[op](_coerce(column, value, field))
+
+
+def _field(fields, name, source):
+    if not isinstance(name, str) or name not in fields:
+        raise ReportDefinitionError(f"Unknown field '{name}' for source '{source}'")
+    return fields[name]
+
+
+def _name_list(definition, key):
+    """definition[key] as a list of field names ([] if absent)."""
+    value = definition.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        raise ReportDefinitionError(f"'{key}' must be a list of field names")
+    return value
+
+
+def _spec_list(definition, key):
+    """definition[key] as a list of objects ([] if absent)."""
+    value = definition.get(key) or []
+    if not isinstance(value, list) or not all(isinstance(spec, dict) for spec in value):
+        raise ReportDefinitionError(f"'{key}' must be a list of objects")
+    return value
+
+
+def compile_definition(definition, max_limit=10000):
+    """Compile a definition dict into (select statement, output column names)."""
+    if not isinstance(definition, dict):
+        raise ReportDefinitionError("Report definition must be a JSON object")
+
+    source = definition.get("source", "history")
+    if not isinstance(source, str) or source not in FIELDS:
+        raise ReportDefinitionError(f"'source' must be one of {sorted(FIELDS)}")
+    fields = FIELDS[source]
+
+    column_names = _name_list(definition, "columns")
+    aggregate_specs = _spec_list(definition, "aggregates")
+    if not column_names and not aggregate_specs:
+        raise ReportDefinitionError("Pick at least one column or aggregate")
+
+    selected = [_field(fields, name, source).label(name) for name in column_names]
+    labeled = {name: expression for name, expression in zip(column_names, selected)}
+    for spec in aggregate_specs:
+        func_name = spec.get("func")
+        if func_name not in AGGREGATES:
+            raise ReportDefinitionError(f"Aggregate 'func' must be one of {sorted(AGGREGATES)}")
+        field = spec.get("field")
+        if field is None and func_name == "count":
+            expression = db.func.count()
+        else:
+            target = _field(fields, field, source)
+            expression = AGGREGATES[func_name](target.distinct() if spec.get("distinct") else target)
+        label = spec.get("as") or f"{func_name}_{field or 'rows'}"
+        if not isinstance(label, str) or not LABEL_PATTERN.match(label):
+            raise ReportDefinitionError(f"Aggregate 'as' must be a plain identifier, got {label!r}")
+        if label in labeled:
+            raise ReportDefinitionError(f"Duplicate output column '{label}'")
+        selected.append(expression.label(label))
+        labeled[label] = selected[-1]
+
+    statement = _source_select(source, selected)
+
+    for spec in _spec_list(definition, "filters"):
+        field = spec.get("field")
+        statement = statement.where(
+            filter_clause(_field(fields, field, source), spec.get("op", "eq"), spec.get("value"), field)
+        )
+
+    group_by = _name_list(definition, "group_by") if definition.get("group_by") is not None else None
+    if group_by is None and aggregate_specs:
+        group_by = column_names
+    if group_by:
+        missing = set(column_names) - set(group_by)
+        if aggregate_specs and missing:
+            raise ReportDefinitionError(f"Columns {sorted(missing)} must be in 'group_by' or aggregated")
+        statement = statement.group_by(*(_field(fields, name, source) for name in group_by))
+
+    for spec in _spec_list(definition, "sort"):
+        name = spec.get("field")
+        if isinstance(name, str) and name in labeled:
+            # Renders as a reference to the output column
+            key = labeled[name]
+        else:
+            key = _field(fields, name, source)
+        direction = spec.get("dir", "asc")
+        if direction not in ("asc", "desc"):
+            raise ReportDefinitionError("Sort 'dir' must be 'asc' or 'desc'")
+        statement = statement.order_by(key.desc() if direction == "desc" else key.asc())
+
+    limit = definition.get("limit", max_limit)
+    if not isinstance(limit, int) or isinstance(limit, bool) or not 1 <= limit <= max_limit:
+        raise ReportDefinitionError(f"'limit' must be between 1 and {max_limit}")
+    return statement.limit(limit), list(labeled)
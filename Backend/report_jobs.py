@@ -0,0 +1,149 @@
+"""
+Background report generation with artifacts cached on disk.
+
+A job writes its report to <artifact_dir>/<report>-<data_version>.csv. While
+the data version stays the same, later requests for that report reuse the
+file instead of building it again. Jobs run on a small thread pool so the
+request that submits them returns at once. Old artifacts are evicted by age
+and then by total size (oldest first) whenever a job finishes.
+"""
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class ReportJobManager:
+
+    def __init__(self, artifact_dir, max_age_seconds=24 * 3600, max_bytes=512 * 1024 * 1024,
+                 workers=2, max_jobs=1000):
+        self.artifact_dir = artifact_dir
+        self.max_age_seconds = max_age_seconds
+        self.max_bytes = max_bytes
+        self.max_jobs = max_jobs
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="report-job")
+        self._jobs = OrderedDict()
+        # One job per (report, version) at a time; later submits join it
+        self._building = {}
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.evicted_total = 0
+
+    def artifact_path(self, report, data_version):
+        return os.path.join(self.artifact_dir, f"{report}-{data_version}.csv")
+
+    def submit(self, report, data_version, build):
+        """Queue build(fileobj) for report at data_version and return the job dict.
+
+        build gets a text file opened for writing. If the artifact already
+        exists, or is being built by another job, no new work is queued.
+        """
+        path = self.artifact_path(report, data_version)
+        with self._lock:
+            job = {
+                "job_id": uuid.uuid4().hex,
+                "report": report,
+                "data_version": data_version,
+                "status": QUEUED,
+                "created_at": time.time(),
+                "finished_at": None,
+                "size": None,
+                "error": None,
+                "cached": False,
+            }
+            self._remember(job)
+
+            if os.path.exists(path):
+                self.cache_hits += 1
+                job.update(status=DONE, cached=True, finished_at=time.time(), size=os.path.getsize(path))
+                os.utime(path)
+                return dict(job)
+
+            key = (report, data_version)
+            self.cache_misses += 1
+            if key in self._building:
+                self._building[key].append(job)
+                return dict(job)
+            self._building[key] = [job]
+
+        self._executor.submit(self._run, key, path, build)
+        return dict(job)
+
+    def _remember(self, job):
+        self._jobs[job["job_id"]] = job
+        while len(self._jobs) > self.max_jobs:
+            self._jobs.popitem(last=False)
+
+    def _run(self, key, path, build):
+        with self._lock:
+            for job in self._building[key]:
+                job["status"] = RUNNING
+
+        os.makedirs(self.artifact_dir, exist_ok=True)
+        # Write under a temp name and rename, so a half-written file is never served
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        update = {}
+        try:
+            with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+                build(f)
+            os.replace(tmp_path, path)
+            update = {"status": DONE, "size": os.path.getsize(path)}
+        except Exception as e:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            update = {"status": FAILED, "error": str(e)}
+        finally:
+            with self._lock:
+                for job in self._building.pop(key, []):
+                    job.update(update, finished_at=time.time())
+            self.evict()
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def evict(self):
+        """Drop artifacts older than max_age_seconds, then the oldest until under max_bytes."""
+        if not os.path.isdir(self.artifact_dir):
+            return 0
+        now = time.time()
+        artifacts = []
+        for entry in os.scandir(self.artifact_dir):
+            if entry.is_file() and entry.name.endswith(".csv"):
+                stat = entry.stat()
+                artifacts.append((stat.st_mtime, stat.st_size, entry.path))
+        artifacts.sort()
+
+        total = sum(size for _, size, _ in artifacts)
+        evicted = 0
+        for mtime, size, path in artifacts:
+            if now - mtime <= self.max_age_seconds and total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        self.evicted_total += evicted
+        return evicted
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "jobs_tracked": len(statuses),
+            "jobs_active": sum(status in (QUEUED, RUNNING) for status in statuses),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "evicted_total": self.evicted_total,
+        }
@@ -0,0 +1,165 @@
+"""
+Skill supply vs. demand across upcoming events.
+
+Demand comes from the skills/required_skills of upcoming open events,
+weighted by volunteer_limit and urgency. Supply is the number of volunteers
+whose profile lists the skill. Both sides are one GROUP BY over the raw
+skills strings, so Python only splits each distinct string once.
+
+The result is cached per day (what counts as "upcoming" moves at midnight)
+and dropped whenever a commit touches skills-related columns of events,
+profiles or user roles.
+"""
+import threading
+from datetime import date
+
+from sqlalchemy import event, func, inspect
+
+from commit_hooks import on_commit, queue
+from models import db, UserCredentials, UserProfile, EventDetails
+
+URGENCY_WEIGHTS = {"Low": 1, "Medium": 2, "High": 3, "Critical": 4}
+CLOSED_EVENT_STATUSES = ("closed", "cancelled", "completed")
+
+# Columns whose changes can move the numbers; other updates keep the cache
+WATCHED_COLUMNS = {
+    EventDetails: ("skills", "required_skills", "volunteer_limit", "urgency", "event_date", "status"),
+    UserProfile: ("skills",),
+    UserCredentials: ("role",),
+}
+
+
+def split_skills(*values):
+    """{lowercased skill: display name} from comma-separated skills strings."""
+    skills = {}
+    for value in values:
+        for skill in (value or "").split(","):
+            skill = skill.strip()
+            if skill:
+                skills.setdefault(skill.lower(), skill)
+    return skills
+
+
+def compute_skill_gap(today=None):
+    """Per-skill demand (upcoming events) and supply (volunteers), highest pressure first."""
+    today = today or date.today()
+    weight = db.case(URGENCY_WEIGHTS, value=EventDetails.urgency, else_=URGENCY_WEIGHTS["Medium"])
+    slots = func.coalesce(EventDetails.volunteer_limit, 1)
+    demand_rows = db.session.execute(
+        db.select(
+            EventDetails.skills, EventDetails.required_skills,
+            func.count(), func.sum(slots), func.sum(slots * weight),
+        ).where(
+            EventDetails.event_date >= today,
+            func.coalesce(EventDetails.status, "open").notin_(CLOSED_EVENT_STATUSES),
+        ).group_by(EventDetails.skills, EventDetails.required_skills)
+    )
+    supply_rows = db.session.execute(
+        db.select(UserProfile.skills, func.count())
+        .join(UserCredentials, UserCredentials.id == UserProfile.id)
+        .where(UserCredentials.role == "volunteer", UserProfile.skills.isnot(None))
+        .group_by(UserProfile.skills)
+    )
+
+    names = {}
+    stats = {}
+
+    def entry(key, name):
+        names.setdefault(key, name)
+        return stats.setdefault(key, {"events": 0, "volunteer_slots": 0, "weighted_demand": 0, "volunteers": 0})
+
+    for skills, required_skills, events, event_slots, weighted in demand_rows:
+        for key, name in split_skills(skills, required_skills).items():
+            item = entry(key, name)
+            item["events"] += events
+            item["volunteer_slots"] += event_slots or 0
+            item["weighted_demand"] += weighted or 0
+    for skills, volunteers in supply_rows:
+        for key, name in split_skills(skills).items():
+            entry(key, name)["volunteers"] += volunteers
+
+    result = []
+    for key, item in stats.items():
+        slots_needed, volunteers = item["volunteer_slots"], item["volunteers"]
+        result.append(dict(
+            item,
+            skill=names[key],
+            shortfall=max(slots_needed - volunteers, 0),
+            coverage=round(volunteers / slots_needed, 3) if slots_needed else None,
+            pressure=round(item["weighted_demand"] / max(volunteers, 1), 3),
+        ))
+    result.sort(key=lambda item: (-item["pressure"], -item["weighted_demand"], item["skill"].lower()))
+    return result
+
+
+class SkillGapCache:
+    """The latest compute_skill_gap() result, valid for one day and one data version."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entry = None  # (version, day, result)
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, today=None):
+        today = today or date.today()
+        with self._lock:
+            version = self._version
+            if self._entry and self._entry[:2] == (version, today):
+                self.hits += 1
+                return self._entry[2]
+            self.misses += 1
+        result = compute_skill_gap(today)
+        with self._lock:
+            # A commit that landed while we were computing wins; don't store stale data
+            if self._version == version:
+                self._entry = (version, today, result)
+        return result
+
+    def invalidate(self):
+        with self._lock:
+            self._version += 1
+            self._entry = None
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached": self._entry is not None,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+
+skill_gap_cache = SkillGapCache()
+
+
+def mark_skills_changed(session):
+    """Drop the cache when session commits (bulk Core inserts call this themselves)."""
+    queue(session, "skill_gap")
+
+
+def _row_changed(mapper, connection, target):
+    session = inspect(target).session
+    if session is not None:
+        mark_skills_changed(session)
+
+
+def _row_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in WATCHED_COLUMNS[mapper.class_]):
+        _row_changed(mapper, connection, target)
+
+
+for _model in WATCHED_COLUMNS:
+    event.listen(_model, 'after_insert', _row_changed)
+    event.listen(_model, 'after_update', _row_updated)
+    event.listen(_model, 'after_delete', _row_changed)
+
+
+@on_commit("skill_gap")
+def _invalidate_committed(_):
+    skill_gap_cache.invalidate()
@@ -0,0 +1,96 @@
+"""
+Per-table version counters, bumped when a commit writes to the table.
+
+Any change made through the session counts: ORM flushes as well as bulk
+insert/update/delete statements run through session.execute(). Versions only
+move after the commit, so a result computed from pre-commit data is never
+cached under the new version. Writes that bypass the session (raw engine
+connections) are not seen.
+
+VersionedCache memoizes results under the versions of the tables they read.
+"""
+import threading
+from collections import OrderedDict
+from itertools import chain
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from commit_hooks import on_commit, queue
+
+
+class TableVersions:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions = {}
+
+    def bump(self, tables):
+        with self._lock:
+            for name in tables:
+                self._versions[name] = self._versions.get(name, 0) + 1
+
+    def get(self, tables):
+        with self._lock:
+            return tuple(self._versions.get(name, 0) for name in tables)
+
+
+table_versions = TableVersions()
+
+
+def _mark(session, tables):
+    queue(session, "table_versions", *tables)
+
+
+@event.listens_for(Session, 'after_flush')
+def _after_flush(session, flush_context):
+    # Still the pre-flush view here: everything this flush wrote
+    _mark(session, {obj.__table__.name for obj in chain(session.new, session.dirty, session.deleted)})
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bulk_statement(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = orm_execute_state.statement.table
+        _mark(orm_execute_state.session, {getattr(table, "name", None) or str(table)})
+
+
+@on_commit("table_versions")
+def _bump_committed(tables):
+    table_versions.bump(set(tables))
+
+
+class VersionedCache:
+    """Bounded LRU of results keyed by (key, versions of the tables they depend on)."""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, tables, compute):
+        versions = table_versions.get(tables)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        result = compute()
+        with self._lock:
+            self._entries[key] = (versions, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -4,6 +4,8 @@ Full-coverage test suite for app.py (100% coverage)
 
 import unittest
 import json
+import csv
+import io
 import sys
 import os
 from unittest.mock import patch, MagicMock
@@ -28,6 +30,14 @@ except Exception as e:
     sys.exit(1)
 
 
+def admin_auth():
+    """Authorization header with a session token for the seeded admin."""
+    from app import issue_session_token, find_user_by_email
+    with app.app_context():
+        token = issue_session_token(find_user_by_email("admin@example.com"))
+    return {"Authorization": f"Bearer {token}"}
+
+
 #                            BASE TEST CLASS
 
 class BaseTestCase(unittest.TestCase):
@@ -2511,5 +2521,2548 @@ class TestSpecificMissingLines(BaseTestCase):
             self.assertEqual(inv_count, 0)
 
 
+#                      INVITE EXPIRY TESTS
+
+class TestInviteExpiry(BaseTestCase):
+
+    def add_invite(self, event_id=1, status="pending", age_days=0):
+        from datetime import timedelta, timezone
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            invite = EventInvite(
+                user_id=user.id,
+                event_id=event_id,
+                status=status,
+                created_at=datetime.now(timezone.utc) - timedelta(days=age_days)
+            )
+            db.session.add(invite)
+            db.session.commit()
+            return invite.id
+
+    def test_expire_old_pending_invites(self):
+        old_id = self.add_invite(age_days=45)
+        new_id = self.add_invite(age_days=1)
+
+        r = self.client.post("/invites/expire", json={"max_age_days": 30})
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.data)
+        self.assertEqual(data["expired"], 1)
+        self.assertEqual(data["expired_by_age"], 1)
+
+        with app.app_context():
+            self.assertEqual(db.session.get(EventInvite, old_id).status, "expired")
+            self.assertEqual(db.session.get(EventInvite, new_id).status, "pending")
+
+    def test_expire_invites_for_past_events(self):
+        from datetime import date
+        with app.app_context():
+            event = EventDetails(event_name="Already Happened", event_date=date(2020, 1, 1))
+            db.session.add(event)
+            db.session.commit()
+            event_id = event.id
+        invite_id = self.add_invite(event_id=event_id)
+
+        r = self.client.post("/invites/expire")
+        data = json.loads(r.data)
+        self.assertEqual(data["expired_by_event_date"], 1)
+        with app.app_context():
+            self.assertEqual(db.session.get(EventInvite, invite_id).status, "expired")
+
+    def test_expire_skips_non_pending(self):
+        accepted_id = self.add_invite(status="accepted", age_days=90)
+        r = self.client.post("/invites/expire", json={"max_age_days": 30})
+        self.assertEqual(json.loads(r.data)["expired"], 0)
+        with app.app_context():
+            self.assertEqual(db.session.get(EventInvite, accepted_id).status, "accepted")
+
+    def test_expire_runs_in_batches(self):
+        for _ in range(5):
+            self.add_invite(age_days=60)
+        r = self.client.post("/invites/expire", json={"max_age_days": 30, "batch_size": 2})
+        data = json.loads(r.data)
+        self.assertEqual(data["expired"], 5)
+        self.assertEqual(data["batches"], 3)
+
+    def test_expire_invalid_params(self):
+        r = self.client.post("/invites/expire", json={"max_age_days": -1})
+        self.assertEqual(r.status_code, 400)
+        r = self.client.post("/invites/expire", json={"batch_size": 0})
+        self.assertEqual(r.status_code, 400)
+
+    def test_expire_internal_error(self):
+        with patch("app.expire_stale_invites", side_effect=Exception("fail")):
+            r = self.client.post("/invites/expire")
+        self.assertEqual(r.status_code, 500)
+
+    def test_expire_cli_command(self):
+        self.add_invite(age_days=60)
+        runner = app.test_cli_runner()
+        result = runner.invoke(args=["expire-invites"])
+        self.assertIn("Expired 1 invites", result.output)
+
+    def test_expired_invite_cannot_be_accepted(self):
+        invite_id = self.add_invite(status="expired", age_days=60)
+        r = self.client.put(f"/invites/{invite_id}", json={"status": "accepted"})
+        self.assertEqual(r.status_code, 409)
+        with app.app_context():
+            self.assertEqual(db.session.get(EventInvite, invite_id).status, "expired")
+
+    def test_sweeper_starts_with_first_request(self):
+        import app as app_module
+        with patch.object(app_module, "_background_started", False), \
+                patch.object(app_module.olap_snapshot, "start") as olap_start, \
+                patch("app.start_invite_sweeper") as sweeper, patch.dict(app.config, {"TESTING": False}):
+            self.client.get("/events")
+            self.client.get("/events")
+        sweeper.assert_called_once_with()
+        olap_start.assert_called_once_with(app)
+
+    def test_status_created_at_index_exists(self):
+        with app.app_context():
+            names = [row[1] for row in db.session.execute(db.text("PRAGMA index_list('event_invite')"))]
+        self.assertIn("ix_event_invite_status_created_at", names)
+
+
+#                      USER LIST SEARCH TESTS
+
+class TestUserListSearch(BaseTestCase):
+
+    def add_user(self, email, full_name=None, role="volunteer"):
+        with app.app_context():
+            user = UserCredentials(email=email, role=role)
+            user.set_password("Password1")
+            db.session.add(user)
+            db.session.commit()
+            if full_name:
+                db.session.add(UserProfile(id=user.id, full_name=full_name, city="Austin"))
+                db.session.commit()
+
+    def test_users_filter_by_role(self):
+        r = self.client.get("/users?role=admin")
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.data)
+        self.assertEqual([u["email"] for u in data], ["admin@example.com"])
+
+    def test_users_search_by_email_prefix(self):
+        self.add_user("zelda@example.com", "Zelda Hyrule")
+        r = self.client.get("/users?q=zel")
+        data = json.loads(r.data)
+        self.assertEqual([u["email"] for u in data], ["zelda@example.com"])
+
+    def test_users_search_by_name_prefix_case_insensitive(self):
+        self.add_user("link@example.com", "Link Hero")
+        r = self.client.get("/users?q=LINK h")
+        data = json.loads(r.data)
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data[0]["name"], "Link Hero")
+        self.assertEqual(data[0]["address"], "Austin")
+
+    def test_users_search_no_match(self):
+        r = self.client.get("/users?q=nobody")
+        self.assertEqual(json.loads(r.data), [])
+
+    def test_users_search_combined_with_role(self):
+        self.add_user("adminlike@example.com", "Admin Like")
+        r = self.client.get("/users?q=admin&role=admin")
+        data = json.loads(r.data)
+        self.assertEqual([u["email"] for u in data], ["admin@example.com"])
+
+    def test_users_without_profile_in_join(self):
+        self.add_user("bare@example.com")
+        r = self.client.get("/users?q=bare")
+        data = json.loads(r.data)
+        self.assertEqual(data[0]["name"], "N/A")
+        self.assertEqual(data[0]["address"], "N/A")
+
+    def test_users_single_query(self):
+        from sqlalchemy import event as sa_event
+        for i in range(3):
+            self.add_user(f"many{i}@example.com", f"Many {i}")
+
+        statements = []
+        with app.app_context():
+            engine = db.engine
+            listener = lambda *args: statements.append(args[2])
+            sa_event.listen(engine, "before_cursor_execute", listener)
+            try:
+                r = self.client.get("/users")
+            finally:
+                sa_event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(len([s for s in statements if s.lstrip().upper().startswith("SELECT")]), 1)
+
+
+#                      EMAIL NORMALIZATION TESTS
+
+class TestEmailNormalization(BaseTestCase):
+
+    def lookup(self, email):
+        from app import find_user_by_email
+        user = find_user_by_email(email)
+        return user.email if user else None
+
+    def test_register_stores_lowercase_email(self):
+        r = self.client.post("/register", json={"email": "  MiXeD@Example.com ", "password": "Password123"})
+        self.assertEqual(r.status_code, 201)
+        self.assertEqual(json.loads(r.data)["user"]["email"], "mixed@example.com")
+
+    def test_register_duplicate_ignoring_case(self):
+        r = self.client.post("/register", json={"email": "Volunteer@Example.com", "password": "Password123"})
+        self.assertEqual(r.status_code, 409)
+
+    def test_login_ignoring_case(self):
+        r = self.client.post("/login", json={"email": "VOLUNTEER@example.com", "password": "Password1"})
+        self.assertEqual(r.status_code, 200)
+
+    def test_profile_lookup_ignoring_case(self):
+        r = self.client.get("/profile/Volunteer@Example.COM")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)["full_name"], "John Doe")
+
+    def test_model_sets_normalized_email(self):
+        with app.app_context():
+            user = UserCredentials(email="Direct@Example.com")
+            user.set_password("Password1")
+            db.session.add(user)
+            db.session.commit()
+            self.assertEqual(user.email_normalized, "direct@example.com")
+
+    def test_backfill_existing_rows(self):
+        from app import normalize_existing_emails
+        with app.app_context():
+            db.session.execute(db.text(
+                "UPDATE user_credentials SET email_normalized = NULL WHERE email = 'volunteer@example.com'"
+            ))
+            db.session.commit()
+            self.assertEqual(normalize_existing_emails(), [])
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            self.assertEqual(user.email_normalized, "volunteer@example.com")
+
+    def test_backfill_flags_collisions(self):
+        from app import normalize_existing_emails
+        with app.app_context():
+            db.session.execute(db.text(
+                "INSERT INTO user_credentials (email, password_hash, role) "
+                "VALUES ('Volunteer@Example.com', 'x', 'volunteer')"
+            ))
+            db.session.commit()
+            collisions = normalize_existing_emails()
+            self.assertEqual(collisions, ["Volunteer@Example.com"])
+            # The original account still owns the address
+            self.assertEqual(self.lookup("VOLUNTEER@example.com"), "volunteer@example.com")
+
+    def test_upgrade_schema_adds_missing_column(self):
+        from app import upgrade_schema
+        with app.app_context():
+            db.session.execute(db.text("DROP INDEX ix_user_credentials_email_normalized"))
+            db.session.execute(db.text("ALTER TABLE user_credentials DROP COLUMN email_normalized"))
+            db.session.commit()
+            upgrade_schema()
+            db.session.expire_all()
+            self.assertEqual(self.lookup("Admin@Example.com"), "admin@example.com")
+
+
+#                      PASSWORD HASHING TESTS
+
+class TestPasswordHashing(BaseTestCase):
+
+    def setUp(self):
+        import hashing
+        self.hashing = hashing
+        self.saved_method = hashing.get_method()
+        super().setUp()
+
+    def tearDown(self):
+        self.hashing.configure(method=self.saved_method)
+        super().tearDown()
+
+    def test_metrics_endpoint(self):
+        self.client.post("/login", json={"email": "admin@example.com", "password": "AdminPassword1"})
+        r = self.client.get("/metrics")
+        self.assertEqual(r.status_code, 200)
+        stats = json.loads(r.data)["password_hashing"]
+        self.assertGreaterEqual(stats["verifications_total"], 1)
+        self.assertIn("queue_depth", stats)
+        self.assertIn("throughput_per_second", stats)
+
+    def test_login_rehashes_outdated_hash(self):
+        self.hashing.configure(method="pbkdf2:sha256:1000")
+        r = self.client.post("/login", json={"email": "volunteer@example.com", "password": "Password1"})
+        self.assertEqual(r.status_code, 200)
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            self.assertTrue(user.password_hash.startswith("pbkdf2:sha256:1000$"))
+            self.assertTrue(user.check_password("Password1"))
+
+    def test_method_without_parameters_rehashes_once(self):
+        self.hashing.configure(method="pbkdf2:sha256")
+        self.assertEqual(self.hashing.get_method(), "pbkdf2:sha256:1000000")
+        before = self.hashing.get_metrics()["rehashes_total"]
+        for _ in range(2):
+            r = self.client.post("/login", json={"email": "volunteer@example.com", "password": "Password1"})
+            self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.hashing.get_metrics()["rehashes_total"], before + 1)
+        self.hashing.configure(method="scrypt")
+        self.assertFalse(self.hashing.needs_rehash("scrypt:32768:8:1$salt$hash"))
+
+    def test_unusable_hashes(self):
+        for pwhash in ("foo$bar$baz", "scrypt:x$a$b", "scrypt:1:2$a$b", "pbkdf2:nosuch:10$a$b", "pbkdf2:sha256:10$a", ""):
+            self.assertFalse(self.hashing.is_valid_hash(pwhash), pwhash)
+            self.assertFalse(self.hashing.verify_password(pwhash, "Password1"), pwhash)
+        self.assertTrue(self.hashing.needs_rehash("scrypt:x$a$b"))
+        self.assertTrue(self.hashing.is_valid_hash("pbkdf2:sha256:10$salt$hash"))
+        with self.assertRaises(ValueError):
+            self.hashing.configure(method="md5")
+
+    def test_failed_login_does_not_rehash(self):
+        self.hashing.configure(method="pbkdf2:sha256:1000")
+        self.client.post("/login", json={"email": "volunteer@example.com", "password": "Wrong"})
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            self.assertFalse(user.password_hash.startswith("pbkdf2"))
+
+    def test_inline_hashing_without_pool(self):
+        self.hashing.configure(workers=0)
+        try:
+            pwhash = self.hashing.hash_password("Inline123")
+            self.assertTrue(self.hashing.verify_password(pwhash, "Inline123"))
+        finally:
+            self.hashing.configure(workers=2)
+
+    def test_queue_full_rejects(self):
+        from hashing import HashingBusyError
+        self.hashing.configure(queue_size=1, queue_timeout=0)
+        try:
+            self.hashing._slots.acquire()
+            with self.assertRaises(HashingBusyError):
+                self.hashing.hash_password("Password1")
+            self.hashing._slots.release()
+        finally:
+            self.hashing.configure(queue_size=64, queue_timeout=5)
+
+    def test_login_busy_returns_503(self):
+        from hashing import HashingBusyError
+        with patch("models.verify_password", side_effect=HashingBusyError("full")):
+            r = self.client.post("/login", json={"email": "admin@example.com", "password": "AdminPassword1"})
+        self.assertEqual(r.status_code, 503)
+        self.assertEqual(r.headers.get("Retry-After"), "1")
+
+    def test_register_busy_returns_503(self):
+        from hashing import HashingBusyError
+        with patch("models.hash_password", side_effect=HashingBusyError("full")):
+            r = self.client.post("/register", json={"email": "busy@example.com", "password": "Password123"})
+        self.assertEqual(r.status_code, 503)
+
+
+#                      BULK IMPORT TESTS
+
+class TestBulkImport(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from werkzeug.security import generate_password_hash
+        # Cheap pre-hashed password so the tests don't pay for scrypt per row
+        self.fast_hash = generate_password_hash("Imported1", "pbkdf2:sha256:1000")
+
+    def post_csv(self, text, query=""):
+        return self.client.post("/users/import" + query, data=text.encode(), content_type="text/csv",
+                                headers=admin_auth())
+
+    def test_import_creates_users_and_profiles(self):
+        csv_text = (
+            "email,password_hash,full_name,city,state,zip_code,skills\n"
+            f"One@Example.com,{self.fast_hash},User One,Houston,TX,77001,First Aid\n"
+            f"two@example.com,{self.fast_hash},,,,,\n"
+        )
+        r = self.post_csv(csv_text)
+        self.assertEqual(r.status_code, 200)
+        data = json.loads(r.data)
+        self.assertEqual(data["imported"], 2)
+        self.assertEqual(data["error_count"], 0)
+        self.assertEqual(data["last_row"], 2)
+
+        with app.app_context():
+            one = UserCredentials.query.filter_by(email_normalized="one@example.com").first()
+            self.assertEqual(one.role, "volunteer")
+            self.assertEqual(one.profile.full_name, "User One")
+            self.assertEqual(one.profile.zipcode, "77001")
+            self.assertTrue(one.check_password("Imported1"))
+            two = UserCredentials.query.filter_by(email_normalized="two@example.com").first()
+            self.assertIsNone(two.profile)
+
+    def test_import_hashes_plain_passwords(self):
+        r = self.post_csv("email,password\nplain@example.com,Password123\n")
+        self.assertEqual(json.loads(r.data)["imported"], 1)
+        r = self.client.post("/login", json={"email": "plain@example.com", "password": "Password123"})
+        self.assertEqual(r.status_code, 200)
+
+    def test_import_reports_row_errors(self):
+        csv_text = (
+            "email,password,password_hash,full_name,zip_code\n"
+            "bad-email,Password123,,,\n"
+            "short@example.com,123,,,\n"
+            f"volunteer@example.com,,{self.fast_hash},,\n"
+            f"noname@example.com,,{self.fast_hash},,77001\n"
+            f"good@example.com,,{self.fast_hash},Good,\n"
+        )
+        data = json.loads(self.post_csv(csv_text).data)
+        self.assertEqual(data["imported"], 1)
+        self.assertEqual(data["error_count"], 4)
+        self.assertEqual(data["skipped_existing"], 1)
+        self.assertEqual([e["row"] for e in data["errors"]], [1, 2, 3, 4])
+
+    def test_import_duplicate_within_file(self):
+        csv_text = f"email,password_hash\ndup@example.com,{self.fast_hash}\nDUP@example.com,{self.fast_hash}\n"
+        data = json.loads(self.post_csv(csv_text).data)
+        self.assertEqual(data["imported"], 1)
+        self.assertEqual(data["skipped_existing"], 1)
+
+    def test_import_resume_from_start_row(self):
+        rows = "".join(f"resume{i}@example.com,{self.fast_hash}\n" for i in range(5))
+        data = json.loads(self.post_csv("email,password_hash\n" + rows, "?start_row=3&batch_size=2").data)
+        self.assertEqual(data["imported"], 2)
+        self.assertEqual(data["last_row"], 5)
+        with app.app_context():
+            self.assertIsNone(UserCredentials.query.filter_by(email_normalized="resume0@example.com").first())
+
+    def test_import_rerun_is_safe(self):
+        csv_text = f"email,password_hash\nagain@example.com,{self.fast_hash}\n"
+        self.post_csv(csv_text)
+        data = json.loads(self.post_csv(csv_text).data)
+        self.assertEqual(data["imported"], 0)
+        self.assertEqual(data["skipped_existing"], 1)
+
+    def test_import_multipart_upload(self):
+        import io as _io
+        csv_bytes = f"email,password_hash\nupload@example.com,{self.fast_hash}\n".encode()
+        r = self.client.post("/users/import", data={"file": (_io.BytesIO(csv_bytes), "users.csv")},
+                             content_type="multipart/form-data", headers=admin_auth())
+        self.assertEqual(json.loads(r.data)["imported"], 1)
+
+    def test_import_missing_email_header(self):
+        r = self.post_csv("name,password\nx,y\n")
+        self.assertEqual(r.status_code, 400)
+
+    def test_import_bad_params(self):
+        r = self.post_csv("email,password\n", "?start_row=-1")
+        self.assertEqual(r.status_code, 400)
+
+    def test_import_requires_admin(self):
+        from app import issue_session_token, find_user_by_email
+        csv_text = f"email,password_hash\nsneaky@example.com,{self.fast_hash}\n".encode()
+        r = self.client.post("/users/import", data=csv_text, content_type="text/csv")
+        self.assertEqual(r.status_code, 401)
+        # The email parameter is not an identity
+        r = self.client.post("/users/import?email=admin@example.com", data=csv_text, content_type="text/csv")
+        self.assertEqual(r.status_code, 401)
+        with app.app_context():
+            token = issue_session_token(find_user_by_email("volunteer@example.com"))
+        r = self.client.post("/users/import", data=csv_text, content_type="text/csv",
+                             headers={"Authorization": f"Bearer {token}"})
+        self.assertEqual(r.status_code, 403)
+        with app.app_context():
+            self.assertIsNone(UserCredentials.query.filter_by(email_normalized="sneaky@example.com").first())
+
+    def test_import_rechecks_admin_role(self):
+        headers = admin_auth()
+        with app.app_context():
+            UserCredentials.query.filter_by(email="admin@example.com").first().role = "volunteer"
+            db.session.commit()
+        r = self.client.post("/users/import", data=b"email,password\n", content_type="text/csv", headers=headers)
+        self.assertEqual(r.status_code, 403)
+
+    def test_import_rejects_unusable_hashes(self):
+        csv_text = (
+            "email,password_hash\n"
+            "foo@example.com,foo$bar$baz\n"
+            "scrypt@example.com,scrypt:x$a$b\n"
+            "digest@example.com,pbkdf2:nosuch:10$a$b\n"
+            f"ok@example.com,{self.fast_hash}\n"
+        )
+        data = json.loads(self.post_csv(csv_text).data)
+        self.assertEqual(data["imported"], 1)
+        self.assertEqual([e["row"] for e in data["errors"]], [1, 2, 3])
+
+    def test_login_with_unusable_stored_hash(self):
+        with app.app_context():
+            db.session.add(UserCredentials(email="broken@example.com", role="volunteer", password_hash="scrypt:x$a$b"))
+            db.session.commit()
+        r = self.client.post("/login", json={"email": "broken@example.com", "password": "Password123"})
+        self.assertEqual(r.status_code, 401)
+
+    def test_import_reports_progress_per_batch(self):
+        rows = "".join(f"progress{i}@example.com,{self.fast_hash}\n" for i in range(5))
+        seen = []
+        from app import import_users_csv
+        with app.app_context():
+            import_users_csv(io.StringIO("email,password_hash\n" + rows), batch_size=2, workers=1,
+                             progress=lambda result: seen.append(result["last_row"]))
+        self.assertEqual(seen, [2, 4, 5])
+
+    def test_import_cli_command(self):
+        import tempfile
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as f:
+            f.write(f"email,password_hash\ncli@example.com,{self.fast_hash}\n")
+        try:
+            result = app.test_cli_runner().invoke(args=["import-users", f.name, "--workers", "0"])
+        finally:
+            os.unlink(f.name)
+        self.assertIn("Imported 1 users", result.output)
+
+
+#                      LOGIN THROTTLE TESTS
+
+class TestLoginThrottle(BaseTestCase):
+
+    def setUp(self):
+        from app import login_ip_limiter, login_email_limiter
+        self.limiters = (login_ip_limiter, login_email_limiter)
+        self.saved_config = {k: v for k, v in app.config.items() if k.startswith("LOGIN_THROTTLE_")}
+        for limiter in self.limiters:
+            limiter.reset()
+        super().setUp()
+
+    def tearDown(self):
+        app.config.update(self.saved_config)
+        for limiter in self.limiters:
+            limiter.reset()
+        super().tearDown()
+
+    def login(self, email="admin@example.com", password="WRONG"):
+        return self.client.post("/login", json={"email": email, "password": password})
+
+    def test_email_throttled_after_burst(self):
+        app.config["LOGIN_THROTTLE_EMAIL_BURST"] = 2
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login().status_code, 401)
+        r = self.login(email="ADMIN@example.com")
+        self.assertEqual(r.status_code, 429)
+        self.assertIn("Retry-After", r.headers)
+        # Other accounts are unaffected
+        self.assertEqual(self.login(email="volunteer@example.com", password="Password1").status_code, 200)
+
+    def test_ip_throttled_after_burst(self):
+        app.config["LOGIN_THROTTLE_IP_BURST"] = 1
+        self.assertEqual(self.login().status_code, 401)
+        self.assertEqual(self.login(email="volunteer@example.com").status_code, 429)
+
+    def test_throttled_attempt_skips_db_and_hash(self):
+        app.config["LOGIN_THROTTLE_IP_BURST"] = 0
+        with patch("app.find_user_by_email") as lookup, patch("models.verify_password") as verify:
+            r = self.login()
+        self.assertEqual(r.status_code, 429)
+        lookup.assert_not_called()
+        verify.assert_not_called()
+
+    def test_metrics_report_rejections(self):
+        app.config["LOGIN_THROTTLE_EMAIL_BURST"] = 0
+        self.login()
+        stats = json.loads(self.client.get("/metrics").data)["login_throttle"]
+        self.assertGreaterEqual(stats["by_email"]["rejected_total"], 1)
+        self.assertGreaterEqual(stats["by_ip"]["tracked_keys"], 1)
+
+
+class TestTokenBucketLimiter(unittest.TestCase):
+
+    def setUp(self):
+        from throttle import TokenBucketLimiter
+        self.now = [0.0]
+        self.limiter = TokenBucketLimiter(ttl_seconds=60, max_keys=3, clock=lambda: self.now[0])
+
+    def test_refills_over_time(self):
+        self.assertEqual(self.limiter.allow("k", rate=1, burst=1), (True, 0))
+        self.assertEqual(self.limiter.allow("k", rate=1, burst=1), (False, 1))
+        self.now[0] = 1.0
+        self.assertTrue(self.limiter.allow("k", rate=1, burst=1)[0])
+
+    def test_idle_buckets_evicted_by_ttl(self):
+        self.limiter.allow("a", rate=1, burst=5)
+        self.now[0] = 61.0
+        self.limiter.allow("b", rate=1, burst=5)
+        self.assertEqual(len(self.limiter), 1)
+        self.assertEqual(self.limiter.evicted_total, 1)
+
+    def test_max_keys_evicts_least_recent(self):
+        for key in ("a", "b", "c", "d"):
+            self.limiter.allow(key, rate=1, burst=5)
+        self.assertEqual(len(self.limiter), 3)
+        self.assertEqual(self.limiter.evicted_total, 1)
+
+
+#                      SESSION TOKEN TESTS
+
+class TestSessionTokens(BaseTestCase):
+
+    def login_token(self, email="volunteer@example.com", password="Password1"):
+        r = self.client.post("/login", json={"email": email, "password": password})
+        return json.loads(r.data)["token"]
+
+    def auth(self, token):
+        return {"Authorization": f"Bearer {token}"}
+
+    def test_login_returns_token(self):
+        r = self.client.post("/login", json={"email": "volunteer@example.com", "password": "Password1"})
+        data = json.loads(r.data)
+        self.assertEqual(data["token_type"], "Bearer")
+        self.assertGreater(data["expires_in"], 0)
+        self.assertLess(len(data["token"]), 200)
+
+    def test_token_skips_identity_lookup(self):
+        token = self.login_token()
+        with patch("app.find_user_by_email") as lookup:
+            r = self.client.get("/profile/volunteer@example.com", headers=self.auth(token))
+            self.client.get("/history/Volunteer@Example.com", headers=self.auth(token))
+            self.client.get("/user/volunteer@example.com/events", headers=self.auth(token))
+            self.client.get("/invites/user/volunteer@example.com", headers=self.auth(token))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)["full_name"], "John Doe")
+        lookup.assert_not_called()
+
+    def test_token_for_other_email_falls_back_to_lookup(self):
+        token = self.login_token()
+        r = self.client.get("/profile/admin@example.com", headers=self.auth(token))
+        self.assertEqual(json.loads(r.data)["full_name"], "Admin User")
+
+    def test_requests_without_token_still_work(self):
+        r = self.client.get("/history/volunteer@example.com")
+        self.assertEqual(r.status_code, 200)
+
+    def test_tampered_token_ignored(self):
+        from app import get_identity
+        token = self.login_token()
+        with patch("app.get_identity", wraps=get_identity) as lookup:
+            r = self.client.get("/profile/volunteer@example.com", headers=self.auth(token[:-2] + "xx"))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)["full_name"], "John Doe")
+        lookup.assert_called()
+
+    def test_token_from_other_key_falls_back(self):
+        token = self.login_token()
+        with patch.dict(app.config, {"SECRET_KEY": "restarted-with-another-key"}):
+            r = self.client.get("/history/volunteer@example.com", headers=self.auth(token))
+        self.assertEqual(r.status_code, 200)
+
+    def test_expired_token_falls_back(self):
+        token = self.login_token()
+        with patch.dict(app.config, {"SESSION_TOKEN_MAX_AGE": -1}):
+            r = self.client.get("/profile/volunteer@example.com", headers=self.auth(token))
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data)["full_name"], "John Doe")
+
+    def test_token_only_trusted_for_reads(self):
+        from app import resolve_user_id
+        from flask import g
+        stale = {"user_id": 9999, "role": "admin", "email": "volunteer@example.com"}
+        with app.test_request_context("/", method="GET"):
+            g.current_user = stale
+            self.assertEqual(resolve_user_id("volunteer@example.com"), 9999)
+        with app.test_request_context("/", method="PUT"):
+            g.current_user = stale
+            self.assertNotEqual(resolve_user_id("volunteer@example.com"), 9999)
+
+    def test_profile_put_still_checks_account(self):
+        token = self.login_token()
+        self.client.delete("/users/volunteer@example.com")
+        r = self.client.put("/profile/volunteer@example.com", json={"full_name": "Ghost"}, headers=self.auth(token))
+        self.assertEqual(r.status_code, 404)
+
+
+#                      IDENTITY CACHE TESTS
+
+class TestIdentityCache(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        from app import identity_cache
+        self.cache = identity_cache
+
+    def count_selects(self, func):
+        from sqlalchemy import event as sa_event
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            func()
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        return len([s for s in statements if s.lstrip().upper().startswith("SELECT")])
+
+    def test_second_request_skips_identity_query(self):
+        first = self.count_selects(lambda: self.client.get("/history/volunteer@example.com"))
+        second = self.count_selects(lambda: self.client.get("/history/volunteer@example.com"))
+        self.assertEqual(second, first - 1)
+        self.assertGreaterEqual(self.cache.hits, 1)
+
+    def test_cache_shared_across_handlers(self):
+        self.client.get("/profile/volunteer@example.com")
+        hits = self.cache.hits
+        self.client.get("/user/VOLUNTEER@example.com/events")
+        self.client.get("/invites/user/volunteer@example.com")
+        self.assertEqual(self.cache.hits, hits + 2)
+
+    def test_role_change_invalidates(self):
+        self.client.get("/history/volunteer@example.com")
+        self.client.put("/users/volunteer@example.com", json={"role": "admin"})
+        with app.app_context():
+            from app import get_identity
+            self.assertEqual(get_identity("volunteer@example.com").role, "admin")
+
+    def test_profile_put_invalidates(self):
+        self.client.get("/profile/volunteer@example.com")
+        self.client.put("/profile/volunteer@example.com", json={"full_name": "Jane Doe"})
+        with app.app_context():
+            from app import get_identity
+            self.assertEqual(get_identity("volunteer@example.com").full_name, "Jane Doe")
+
+    def test_delete_invalidates(self):
+        self.client.get("/history/volunteer@example.com")
+        self.client.delete("/users/volunteer@example.com")
+        r = self.client.get("/history/volunteer@example.com")
+        self.assertEqual(r.status_code, 404)
+
+    def test_unknown_email_not_cached(self):
+        self.client.get("/history/later@example.com")
+        self.client.post("/register", json={"email": "later@example.com", "password": "Password123"})
+        r = self.client.get("/history/later@example.com")
+        self.assertEqual(r.status_code, 200)
+
+    def test_evicted_on_commit_not_flush(self):
+        from app import get_identity
+        self.client.get("/history/volunteer@example.com")
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            user.role = "admin"
+            db.session.flush()
+            # Flushed but not committed: other requests still see the committed role
+            self.assertEqual(self.cache.get("volunteer@example.com").role, "volunteer")
+            db.session.rollback()
+            self.assertEqual(self.cache.get("volunteer@example.com").role, "volunteer")
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            user.role = "admin"
+            db.session.commit()
+            self.assertIsNone(self.cache.get("volunteer@example.com"))
+            self.assertEqual(get_identity("volunteer@example.com").role, "admin")
+
+    def test_metrics_expose_hit_rate(self):
+        self.client.get("/history/volunteer@example.com")
+        self.client.get("/history/volunteer@example.com")
+        stats = json.loads(self.client.get("/metrics").data)["identity_cache"]
+        self.assertGreater(stats["hit_rate"], 0)
+
+
+class TestIdentityCacheUnit(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        from identity_cache import IdentityCache, Identity
+        cache = IdentityCache(maxsize=2)
+        cache.put("a", Identity(1, "volunteer", None))
+        cache.put("b", Identity(2, "volunteer", None))
+        cache.get("a")
+        cache.put("c", Identity(3, "volunteer", None))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("a"))
+        self.assertEqual(cache.evictions, 1)
+        cache.invalidate_user(1)
+        self.assertIsNone(cache.get("a"))
+
+    def test_put_after_invalidation_is_dropped(self):
+        from identity_cache import IdentityCache, Identity
+        cache = IdentityCache()
+        generation = cache.generation()
+        cache.invalidate_user(1)
+        # Read before the invalidating commit: must not be cached
+        cache.put("a", Identity(1, "volunteer", None), generation)
+        self.assertIsNone(cache.get("a"))
+        cache.put("a", Identity(1, "admin", None), cache.generation())
+        self.assertEqual(cache.get("a").role, "admin")
+
+
+#                      VOLUNTEER STATS TESTS
+
+class TestVolunteerStats(BaseTestCase):
+
+    def stats(self, email="volunteer@example.com"):
+        r = self.client.get(f"/history/{email}?stats=true")
+        self.assertEqual(r.status_code, 200)
+        return json.loads(r.data)
+
+    def make_accepted_invite(self, event_id=2):
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            invite = EventInvite(user_id=user.id, event_id=event_id, status="pending")
+            db.session.add(invite)
+            db.session.commit()
+            invite_id = invite.id
+        self.client.put(f"/invites/{invite_id}", json={"status": "accepted"})
+        return invite_id
+
+    def test_history_with_stats_from_seed(self):
+        data = self.stats()
+        self.assertEqual(len(data["history"]), 1)
+        self.assertEqual(data["stats"]["events_attended"], 1)
+        self.assertEqual(data["stats"]["completed_count"], 0)
+        self.assertIsNotNone(data["stats"]["last_participation"])
+
+    def test_accepting_invite_increments_attended(self):
+        self.make_accepted_invite()
+        self.assertEqual(self.stats()["stats"]["events_attended"], 2)
+
+    def test_completion_toggles_completed_count(self):
+        invite_id = self.make_accepted_invite()
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        self.assertEqual(self.stats()["stats"]["completed_count"], 1)
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": False})
+        self.assertEqual(self.stats()["stats"]["completed_count"], 0)
+
+    def test_deleting_invite_takes_history_off_stats(self):
+        invite_id = self.make_accepted_invite()
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        self.client.delete(f"/invites/{invite_id}")
+        stats = self.stats()["stats"]
+        self.assertEqual(stats["events_attended"], 1)
+        self.assertEqual(stats["completed_count"], 0)
+
+    def test_deleting_event_updates_stats(self):
+        invite_id = self.make_accepted_invite(event_id=2)
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        self.client.delete("/events/2")
+        self.client.delete("/events/1")
+        stats = self.stats()["stats"]
+        self.assertEqual(stats["events_attended"], 0)
+        self.assertEqual(stats["completed_count"], 0)
+        self.assertIsNone(stats["last_participation"])
+
+    def test_user_without_activity_has_zero_stats(self):
+        data = self.stats("admin@example.com")
+        self.assertEqual(data["history"], [])
+        self.assertEqual(data["stats"], {"events_attended": 0, "completed_count": 0, "last_participation": None})
+
+    def test_history_is_single_query_after_identity(self):
+        from sqlalchemy import event as sa_event
+        self.make_accepted_invite()
+        self.client.get("/history/volunteer@example.com")  # warm the identity cache
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            r = self.client.get("/history/volunteer@example.com")
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(len(json.loads(r.data)), 2)
+        self.assertEqual(len(statements), 1)
+
+    def test_rebuild_matches_incremental(self):
+        from volunteer_stats import rebuild_volunteer_stats
+        invite_id = self.make_accepted_invite()
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        before = self.stats()["stats"]
+        with app.app_context():
+            rebuild_volunteer_stats()
+        self.assertEqual(self.stats()["stats"], before)
+
+    def test_rebuild_cli_command(self):
+        result = app.test_cli_runner().invoke(args=["rebuild-stats"])
+        self.assertIn("Rebuilt stats for 1 volunteers", result.output)
+
+
+#                          ACTIVITY LOG TESTS
+
+class TestActivityLog(BaseTestCase):
+
+    def activity(self, query=""):
+        r = self.client.get(f"/activity{query}")
+        self.assertEqual(r.status_code, 200)
+        return json.loads(r.data), r.headers.get("X-Next-Cursor")
+
+    def test_mutations_are_logged_newest_first(self):
+        self.client.post("/register", json={"email": "new@example.com", "password": "Password123"})
+        r = self.client.post("/events", json={
+            "event_name": "Logged Event", "description": "desc", "location": "Houston",
+            "required_skills": ["First Aid"], "urgency": "Low", "event_date": "2030-01-01"
+        })
+        event_id = json.loads(r.data)["event_id"]
+        self.client.post("/signup", json={"email": "new@example.com", "event_id": event_id})
+
+        data, cursor = self.activity()
+        self.assertEqual([a["type"] for a in data], ["signup_requested", "event_created", "registration"])
+        self.assertEqual(data[0]["user"], "new@example.com")
+        self.assertEqual(data[0]["event"], "Logged Event")
+        self.assertIsNone(data[2]["event"])
+        self.assertIsNone(cursor)
+
+    def test_invite_lifecycle_is_logged(self):
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            invite = EventInvite(user_id=user.id, event_id=2, status="pending")
+            db.session.add(invite)
+            db.session.commit()
+            invite_id = invite.id
+        self.client.put(f"/invites/{invite_id}", json={"status": "accepted"})
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+        self.client.delete(f"/invites/{invite_id}")
+        data, _ = self.activity()
+        self.assertEqual([a["type"] for a in data], ["invite_deleted", "invite_completed", "event_signup"])
+        self.assertTrue(all(a["user"] == "volunteer@example.com" for a in data))
+
+    def test_entries_survive_user_delete(self):
+        self.client.delete("/users/volunteer@example.com")
+        data, _ = self.activity()
+        self.assertEqual((data[0]["type"], data[0]["user"]), ("user_deleted", "volunteer@example.com"))
+
+    def test_failed_commit_logs_nothing(self):
+        with patch("app.db.session.commit", side_effect=Exception("DB Error")):
+            self.client.post("/register", json={"email": "new@example.com", "password": "Password123"})
+        data, _ = self.activity()
+        self.assertEqual(data, [])
+
+    def test_cursor_paging(self):
+        for i in range(5):
+            self.client.post("/register", json={"email": f"user{i}@example.com", "password": "Password123"})
+        first, cursor = self.activity("?limit=2")
+        self.assertEqual([a["user"] for a in first], ["user4@example.com", "user3@example.com"])
+        second, cursor = self.activity(f"?limit=2&cursor={cursor}")
+        self.assertEqual([a["user"] for a in second], ["user2@example.com", "user1@example.com"])
+        last, cursor = self.activity(f"?limit=2&cursor={cursor}")
+        self.assertEqual([a["user"] for a in last], ["user0@example.com"])
+        self.assertIsNone(cursor)
+
+    def test_since_filter(self):
+        self.client.post("/register", json={"email": "old@example.com", "password": "Password123"})
+        data, _ = self.activity()
+        self.client.post("/register", json={"email": "new@example.com", "password": "Password123"})
+        newer, _ = self.activity(f"?since={data[0]['time']}")
+        self.assertEqual([a["user"] for a in newer], ["new@example.com"])
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get("/activity?limit=0").status_code, 400)
+        self.assertEqual(self.client.get("/activity?limit=500").status_code, 400)
+        self.assertEqual(self.client.get("/activity?cursor=garbage").status_code, 400)
+        self.assertEqual(self.client.get("/activity?since=yesterday").status_code, 400)
+
+    def test_activity_is_single_query(self):
+        from sqlalchemy import event as sa_event
+        self.client.post("/register", json={"email": "new@example.com", "password": "Password123"})
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.client.get("/activity")
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertIn("activity_log", statements[0])
+
+
+#                      STREAMED REPORT TESTS
+
+class TestStreamedReports(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.chunk_rows = app.config['REPORT_CHUNK_ROWS']
+        app.config['REPORT_CHUNK_ROWS'] = 2
+        with app.app_context():
+            for i in range(5):
+                user = UserCredentials(email=f"stream{i}@example.com", role="volunteer", password_hash="x")
+                db.session.add(user)
+            db.session.commit()
+
+    def tearDown(self):
+        app.config['REPORT_CHUNK_ROWS'] = self.chunk_rows
+        super().tearDown()
+
+    def test_history_csv_is_streamed_in_chunks(self):
+        r = self.client.get("/reports/volunteer_history.csv")
+        self.assertTrue(r.is_streamed)
+        chunks = list(r.response)
+        # header + 6 volunteer rows, two rows per chunk
+        self.assertGreater(len(chunks), 3)
+        lines = b"".join(chunks).decode().strip().splitlines()
+        self.assertEqual(lines[0].split(",")[0], "Volunteer Email")
+        self.assertEqual(len(lines), 7)
+        self.assertIn("attachment; filename=volunteer_history_report_", r.headers["Content-Disposition"])
+
+    def test_assignments_csv_is_streamed(self):
+        r = self.client.get("/reports/event_assignments.csv")
+        self.assertTrue(r.is_streamed)
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+        self.assertEqual(rows[0][0], "Event ID")
+        self.assertEqual([row[0] for row in rows[1:]], sorted((row[0] for row in rows[1:]), key=int))
+
+    def test_query_error_before_streaming_is_500(self):
+        with app.app_context():
+            with patch("app.UserCredentials.query", new_callable=MagicMock) as query:
+                query.with_entities.side_effect = Exception("fail")
+                r = self.client.get("/reports/volunteer_history.csv")
+        self.assertEqual(r.status_code, 500)
+
+
+#                    SINGLE-JOIN REPORT QUERY TESTS
+
+class TestReportQueries(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            events = EventDetails.query.order_by(EventDetails.id).all()
+            for i in range(4):
+                user = UserCredentials(email=f"join{i}@example.com", role="volunteer", password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(UserProfile(id=user.id, full_name=f"Join {i}", skills="Logistics"))
+                for event in events[:i]:
+                    db.session.add(VolunteerHistory(user_id=user.id, event_id=event.id))
+            db.session.add(EventDetails(event_name="Empty Event"))
+            db.session.commit()
+
+    def count_queries(self, url):
+        from sqlalchemy import event as sa_event
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            r = self.client.get(url)
+            r.get_data()
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(r.status_code, 200)
+        return r, len(statements)
+
+    def test_each_report_is_one_query(self):
+        for url in ("/reports/json/volunteer_history", "/reports/json/event_assignments"):
+            _, count = self.count_queries(url)
+            self.assertEqual(count, 1, url)
+        # CSV downloads also read the delta watermark first
+        for url in ("/reports/volunteer_history.csv", "/reports/event_assignments.csv"):
+            _, count = self.count_queries(url)
+            self.assertEqual(count, 2, url)
+
+    def test_history_rows_from_join(self):
+        r, _ = self.count_queries("/reports/json/volunteer_history")
+        rows = [row for row in json.loads(r.data) if row["Email"].startswith("join")]
+        self.assertEqual(rows[0], {
+            "Email": "join0@example.com", "Full Name": "Join 0", "Skills": "Logistics",
+            "Event Name": "No History", "Event Date": "N/A"
+        })
+        with app.app_context():
+            seeded_events = EventDetails.query.count() - 1
+        self.assertEqual(len(rows), 1 + sum(min(i, seeded_events) for i in range(1, 4)))
+
+    def test_assignment_rows_from_join(self):
+        r, _ = self.count_queries("/reports/json/event_assignments")
+        rows = json.loads(r.data)
+        empty = [row for row in rows if row["Event Name"] == "Empty Event"]
+        self.assertEqual(empty, [{
+            "Event Name": "Empty Event", "Event Date": "N/A", "Location": "N/A",
+            "Volunteer": "None", "Volunteer Skills": "N/A"
+        }])
+        self.assertIn("join3@example.com", {row["Volunteer"] for row in rows})
+
+    def test_csv_matches_json_rows(self):
+        r, _ = self.count_queries("/reports/event_assignments.csv")
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))[1:]
+        json_rows = json.loads(self.client.get("/reports/json/event_assignments").data)
+        self.assertEqual(len(rows), len(json_rows))
+        self.assertEqual(rows[-1][1:5], ["Empty Event", "", "", "No Volunteers"])
+
+    def test_csv_leaves_missing_values_empty(self):
+        r = self.client.get("/reports/volunteer_history.csv")
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))[1:]
+        self.assertNotIn("N/A", {cell for row in rows for cell in row})
+
+
+#                        REPORT JOB TESTS
+
+class TestReportJobs(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        import tempfile
+        from app import report_jobs
+        self.jobs = report_jobs
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved = (report_jobs.artifact_dir, report_jobs.max_age_seconds, report_jobs.max_bytes)
+        report_jobs.artifact_dir = self.tmpdir.name
+
+    def tearDown(self):
+        self.jobs.artifact_dir, self.jobs.max_age_seconds, self.jobs.max_bytes = self.saved
+        self.tmpdir.cleanup()
+        super().tearDown()
+
+    def submit(self, report="volunteer_history"):
+        r = self.client.post("/reports/jobs", json={"report": report})
+        self.assertEqual(r.status_code, 202)
+        return json.loads(r.data)
+
+    def wait(self, job_id):
+        import time
+        for _ in range(200):
+            job = json.loads(self.client.get(f"/reports/jobs/{job_id}").data)
+            if job["status"] in ("done", "failed"):
+                return job
+            time.sleep(0.02)
+        self.fail("report job did not finish")
+
+    def test_submit_poll_download(self):
+        job = self.wait(self.submit()["job_id"])
+        self.assertEqual(job["status"], "done")
+        self.assertFalse(job["cached"])
+        r = self.client.get(job["download_url"])
+        self.assertEqual(r.status_code, 200)
+        self.assertIn("text/csv", r.content_type)
+        self.assertIn("volunteer@example.com", r.get_data(as_text=True))
+        self.assertIn("attachment; filename=volunteer_history_report_", r.headers["Content-Disposition"])
+        r.close()
+
+    def test_artifact_matches_streamed_report(self):
+        job = self.wait(self.submit("event_assignments")["job_id"])
+        r = self.client.get(job["download_url"])
+        self.assertEqual(r.get_data(as_text=True), self.client.get("/reports/event_assignments.csv").get_data(as_text=True))
+        r.close()
+
+    def test_same_data_version_reuses_artifact(self):
+        first = self.wait(self.submit()["job_id"])
+        second = self.submit()
+        self.assertEqual(second["status"], "done")
+        self.assertTrue(second["cached"])
+        self.assertEqual(second["data_version"], first["data_version"])
+
+    def test_write_changes_data_version(self):
+        first = self.wait(self.submit()["job_id"])
+        self.client.post("/register", json={"email": "new@example.com", "password": "Password123"})
+        second = self.wait(self.submit()["job_id"])
+        self.assertNotEqual(second["data_version"], first["data_version"])
+        self.assertFalse(second["cached"])
+        r = self.client.get(second["download_url"])
+        self.assertIn("new@example.com", r.get_data(as_text=True))
+        r.close()
+
+    def test_eviction_by_size_and_age(self):
+        import time
+        paths = []
+        for i in range(3):
+            path = self.jobs.artifact_path("volunteer_history", f"v{i}")
+            with open(path, "w") as f:
+                f.write("x" * 100)
+            os.utime(path, (time.time() - 10 + i, time.time() - 10 + i))
+            paths.append(path)
+        self.jobs.max_bytes = 250
+        self.assertEqual(self.jobs.evict(), 1)
+        self.assertFalse(os.path.exists(paths[0]))
+        self.jobs.max_age_seconds = 8.5
+        self.assertEqual(self.jobs.evict(), 1)
+        self.assertEqual([os.path.exists(p) for p in paths], [False, False, True])
+
+    def test_evicted_artifact_is_gone(self):
+        job = self.wait(self.submit()["job_id"])
+        os.remove(self.jobs.artifact_path(job["report"], job["data_version"]))
+        self.assertEqual(self.client.get(job["download_url"]).status_code, 410)
+
+    def test_failed_build_reports_error(self):
+        with patch("app._report_builder", return_value=MagicMock(side_effect=Exception("boom"))):
+            job = self.wait(self.submit()["job_id"])
+        self.assertEqual(job["status"], "failed")
+        self.assertEqual(job["error"], "boom")
+        self.assertEqual(self.client.get(f"/reports/jobs/{job['job_id']}/download").status_code, 409)
+        self.assertEqual([f for f in os.listdir(self.tmpdir.name)], [])
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.post("/reports/jobs", json={"report": "nope"}).status_code, 400)
+        self.assertEqual(self.client.get("/reports/jobs/missing").status_code, 404)
+        self.assertEqual(self.client.get("/reports/jobs/missing/download").status_code, 404)
+
+
+#                        DELTA REPORT TESTS
+
+class TestDeltaReports(BaseTestCase):
+
+    def add_history(self, email="volunteer@example.com", event_id=2):
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email=email).first()
+            db.session.add(VolunteerHistory(user_id=user.id, event_id=event_id))
+            db.session.commit()
+
+    def fetch(self, report, since=None):
+        url = f"/reports/{report}.csv"
+        r = self.client.get(url, query_string={"since": since} if since is not None else None)
+        self.assertEqual(r.status_code, 200)
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+        return rows[1:], r.headers["X-Next-Watermark"]
+
+    def test_full_report_returns_watermark(self):
+        rows, watermark = self.fetch("volunteer_history")
+        self.assertIn("volunteer@example.com", {row[0] for row in rows})
+        self.assertRegex(watermark, r"^\d{4}-\d\d-\d\dT[\d:.]+\|\d+$")
+
+    def test_delta_has_only_new_rows(self):
+        for report in ("volunteer_history", "event_assignments"):
+            _, watermark = self.fetch(report)
+            rows, same = self.fetch(report, watermark)
+            self.assertEqual((rows, same), ([], watermark))
+
+        self.add_history()
+        rows, next_watermark = self.fetch("volunteer_history", watermark)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][0], "volunteer@example.com")
+        self.assertNotEqual(next_watermark, watermark)
+
+        rows, _ = self.fetch("event_assignments", watermark)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0][4], "volunteer@example.com")
+
+        self.assertEqual(self.fetch("volunteer_history", next_watermark)[0], [])
+
+    def test_chained_deltas_cover_everything_once(self):
+        _, watermark = self.fetch("event_assignments")
+        seen = []
+        for _ in range(3):
+            self.add_history()
+            self.add_history()
+            rows, watermark = self.fetch("event_assignments", watermark)
+            seen.extend(rows)
+        self.assertEqual(len(seen), 6)
+
+    def test_delta_is_index_range_scan(self):
+        from sqlalchemy import text
+        from app import volunteer_history_report_query, event_assignments_report_query
+        since, upto = (datetime(2020, 1, 1), 0), (datetime(2100, 1, 1), 10 ** 9)
+        with app.app_context():
+            for query in (volunteer_history_report_query(since, upto), event_assignments_report_query(since, upto)):
+                sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+                plan = " ".join(row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql)))
+                self.assertIn("ix_volunteer_history_date_id", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_bad_watermark(self):
+        self.assertEqual(self.client.get("/reports/volunteer_history.csv?since=nope").status_code, 400)
+        self.assertEqual(self.client.get("/reports/event_assignments.csv?since=2024-01-01|x").status_code, 400)
+
+
+#                          BULK EXPORT TESTS
+
+class TestExport(BaseTestCase):
+
+    def export(self, query=""):
+        import gzip
+        r = self.client.get(f"/export{query}")
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn("Content-Encoding", r.headers)
+        self.assertEqual(r.content_type, "application/gzip")
+        self.assertRegex(r.headers["Content-Disposition"], r"filename=export_\d{4}-\d{2}-\d{2}\.ndjson\.gz$")
+        chunks = list(r.response)
+        text = gzip.decompress(b"".join(chunks)).decode()
+        return [json.loads(line) for line in text.splitlines()], chunks
+
+    def test_exports_all_tables_with_machine_keys(self):
+        lines, _ = self.export()
+        tables = [line["table"] for line in lines]
+        order = ["users", "profiles", "events", "invites", "history"]
+        self.assertEqual(list(dict.fromkeys(tables)), [t for t in order if t in tables])
+        self.assertIn("history", tables)
+        user = next(line["row"] for line in lines if line["table"] == "users")
+        self.assertEqual(set(user), {"id", "email", "email_normalized", "role"})
+        history = next(line["row"] for line in lines if line["table"] == "history")
+        self.assertIn("participation_date", history)
+        datetime.fromisoformat(history["participation_date"])
+
+    def test_row_counts_match_tables(self):
+        lines, _ = self.export()
+        with app.app_context():
+            expected = {
+                "users": UserCredentials.query.count(),
+                "events": EventDetails.query.count(),
+                "history": VolunteerHistory.query.count(),
+            }
+        for table, count in expected.items():
+            self.assertEqual(sum(line["table"] == table for line in lines), count, table)
+
+    def test_keyset_batches_and_incremental_compression(self):
+        with app.app_context():
+            for i in range(7):
+                db.session.add(UserCredentials(email=f"export{i}@example.com", role="volunteer", password_hash="x"))
+            db.session.commit()
+            user_count = UserCredentials.query.count()
+        lines, chunks = self.export("?tables=users&batch_size=2")
+        ids = [line["row"]["id"] for line in lines]
+        self.assertEqual(len(ids), user_count)
+        self.assertEqual(ids, sorted(ids))
+        # one compressed chunk per batch plus the gzip trailer
+        self.assertGreaterEqual(len(chunks), user_count // 2)
+
+    def test_selected_tables(self):
+        lines, _ = self.export("?tables=events,history")
+        self.assertEqual({line["table"] for line in lines}, {"events", "history"})
+
+    def test_bad_params(self):
+        self.assertEqual(self.client.get("/export?tables=users,secrets").status_code, 400)
+        self.assertEqual(self.client.get("/export?batch_size=0").status_code, 400)
+
+
+#                     PARALLEL REPORT BUILDER TESTS
+
+class TestParallelReports(BaseTestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        import parallel_reports
+        parallel_reports.shutdown()
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            for i in range(6):
+                event = EventDetails(event_name=f"Parallel {i}", location="Austin", event_date=datetime(2030, 1, i + 1).date())
+                db.session.add(event)
+                db.session.flush()
+                if i % 2:
+                    user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+                    db.session.add(VolunteerHistory(user_id=user.id, event_id=event.id))
+            db.session.commit()
+
+    def test_id_ranges(self):
+        from parallel_reports import id_ranges
+        self.assertEqual(id_ranges(1, 10, 3), [(1, 5), (5, 9), (9, 11)])
+        self.assertEqual(id_ranges(4, 5, 8), [(4, 5), (5, 6)])
+        self.assertEqual(id_ranges(None, None, 4), [])
+
+    def test_parallel_output_matches_serial(self):
+        for report in ("event_assignments", "volunteer_history"):
+            serial = self.client.get(f"/reports/{report}.csv")
+            for workers in (1, 2, 4):
+                parallel = self.client.get(f"/reports/{report}.csv?workers={workers}")
+                self.assertEqual(parallel.status_code, 200)
+                self.assertEqual(parallel.get_data(as_text=True), serial.get_data(as_text=True), (report, workers))
+                self.assertEqual(parallel.headers["X-Next-Watermark"], serial.headers["X-Next-Watermark"])
+
+    def test_builder_formats_ranges_in_order(self):
+        from app import parallel_report_chunks
+        with app.app_context():
+            chunks = list(parallel_report_chunks("event_assignments", 2))
+        self.assertGreater(len(chunks), 2)
+        rows = list(csv.reader(io.StringIO("".join(chunks))))
+        ids = [int(row[0]) for row in rows[1:]]
+        self.assertEqual(ids, sorted(ids))
+        self.assertIn(["Parallel 0", "2030-01-01", "Austin", "No Volunteers"], [row[1:5] for row in rows])
+
+    def test_pool_is_shared_between_reports(self):
+        import parallel_reports
+        self.client.get("/reports/event_assignments.csv?workers=2").get_data()
+        pool = parallel_reports._pool
+        self.assertIsNotNone(pool)
+        self.client.get("/reports/volunteer_history.csv?workers=2").get_data()
+        self.assertIs(parallel_reports._pool, pool)
+
+    def test_no_global_sqlite_converters(self):
+        import sqlite3
+        import parallel_reports  # noqa: F401
+        self.assertNotIn("DATETIME", sqlite3.converters)
+        self.assertEqual(parallel_reports.CONVERTERS["date"]("2030-01-01").year, 2030)
+
+    def test_bad_workers(self):
+        self.assertEqual(self.client.get("/reports/event_assignments.csv?workers=0").status_code, 400)
+        self.assertEqual(self.client.get("/reports/event_assignments.csv?workers=99").status_code, 400)
+
+
+#                      REPORT PREVIEW PAGING TESTS
+
+class TestReportPreview(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            events = EventDetails.query.order_by(EventDetails.id).all()
+            for i in range(5):
+                user = UserCredentials(email=f"page{i}@example.com", role="volunteer", password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                for event in events[:i % 3]:
+                    db.session.add(VolunteerHistory(user_id=user.id, event_id=event.id))
+            db.session.commit()
+
+    def walk(self, report, limit):
+        pages, cursor = [], None
+        while True:
+            query = {"limit": limit}
+            if cursor:
+                query["cursor"] = cursor
+            r = self.client.get(f"/reports/json/{report}", query_string=query)
+            self.assertEqual(r.status_code, 200)
+            page = json.loads(r.data)
+            self.assertLessEqual(len(page), limit)
+            pages.append(page)
+            cursor = r.headers.get("X-Next-Cursor")
+            if not cursor:
+                return pages
+
+    def test_pages_concatenate_to_full_report(self):
+        for report in ("volunteer_history", "event_assignments"):
+            full = json.loads(self.client.get(f"/reports/json/{report}").data)
+            for limit in (1, 2, 3, 100):
+                pages = self.walk(report, limit)
+                self.assertEqual([row for page in pages for row in page], full, (report, limit))
+
+    def test_count_on_demand(self):
+        full = json.loads(self.client.get("/reports/json/volunteer_history").data)
+        r = self.client.get("/reports/json/volunteer_history?limit=2&count=true")
+        self.assertEqual(r.headers["X-Total-Count"], str(len(full)))
+        self.assertNotIn("X-Total-Count", self.client.get("/reports/json/volunteer_history?limit=2").headers)
+
+    def test_cursor_alone_uses_default_limit(self):
+        r = self.client.get("/reports/json/event_assignments?cursor=0|0")
+        self.assertEqual(r.status_code, 200)
+        self.assertLessEqual(len(json.loads(r.data)), app.config['REPORT_PREVIEW_DEFAULT_LIMIT'])
+
+    def test_limit_is_pushed_into_sql(self):
+        from sqlalchemy import event as sa_event
+        statements = []
+        listener = lambda *args: statements.append((args[2], args[3]))
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.client.get("/reports/json/event_assignments?limit=2&cursor=1|0")
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        self.assertEqual(len(statements), 1)
+        self.assertIn("LIMIT", statements[0][0])
+        self.assertIn(3, statements[0][1])
+
+    def test_page_query_plans_do_not_sort_whole_report(self):
+        from sqlalchemy import text
+        from app import volunteer_history_report_query, event_assignments_report_query
+        with app.app_context():
+            for query, parent in ((volunteer_history_report_query(), UserCredentials.id),
+                                  (event_assignments_report_query(), EventDetails.id)):
+                query = query.add_columns(parent, VolunteerHistory.id).filter(
+                    parent >= 1, db.tuple_(parent, db.func.coalesce(VolunteerHistory.id, 0)) > (1, 0)
+                ).limit(51)
+                sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+                plan = [row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql))]
+                self.assertNotIn("USE TEMP B-TREE FOR ORDER BY", plan)
+                self.assertFalse(any("AUTOMATIC" in step for step in plan), plan)
+
+    def test_bad_params(self):
+        for query in ("limit=0", "limit=5000", "limit=abc", "cursor=x", "cursor=1|y"):
+            self.assertEqual(self.client.get(f"/reports/json/volunteer_history?{query}").status_code, 400, query)
+
+
+#                     REPORT DEFINITION TESTS
+
+class TestReportDefinitions(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            events = EventDetails.query.order_by(EventDetails.id).all()
+            for i, (city, state, skills) in enumerate([
+                ("Austin", "TX", "First Aid, Logistics"),
+                ("Dallas", "TX", "First Aid Training"),
+                ("Denver", "CO", "Logistics"),
+            ]):
+                user = UserCredentials(email=f"def{i}@example.com", role="volunteer", password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(UserProfile(id=user.id, full_name=f"Def {i}", city=city, state=state, skills=skills))
+                for event in events[:2]:
+                    db.session.add(VolunteerHistory(user_id=user.id, event_id=event.id))
+            db.session.commit()
+
+    def custom(self, definition, fmt="json"):
+        url = "/reports/json/custom" if fmt == "json" else "/reports/custom.csv"
+        return self.client.post(url, json=definition)
+
+    def test_group_and_count(self):
+        r = self.custom({
+            "columns": ["volunteer_state"],
+            "aggregates": [{"func": "count", "field": "volunteer_id", "distinct": True, "as": "volunteers"}],
+            "filters": [{"field": "volunteer_email", "op": "contains", "value": "def"}],
+            "sort": [{"field": "volunteers", "dir": "desc"}],
+        })
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(json.loads(r.data), [
+            {"volunteer_state": "TX", "volunteers": 2},
+            {"volunteer_state": "CO", "volunteers": 1},
+        ])
+
+    def test_has_skill_matches_whole_items(self):
+        r = self.custom({
+            "columns": ["volunteer_email"],
+            "filters": [{"field": "volunteer_skills", "op": "has_skill", "value": "first aid"},
+                        {"field": "volunteer_email", "op": "contains", "value": "def"}],
+            "group_by": ["volunteer_email"],
+        })
+        self.assertEqual([row["volunteer_email"] for row in json.loads(r.data)], ["def0@example.com"])
+
+    def test_csv_output_and_dates(self):
+        r = self.custom({
+            "columns": ["volunteer_email", "event_date"],
+            "filters": [{"field": "volunteer_email", "op": "eq", "value": "def2@example.com"}],
+            "sort": [{"field": "event_id"}],
+            "limit": 1,
+        }, fmt="csv")
+        self.assertEqual(r.status_code, 200)
+        rows = list(csv.reader(io.StringIO(r.get_data(as_text=True))))
+        self.assertEqual(rows[0], ["volunteer_email", "event_date"])
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[1][0], "def2@example.com")
+
+    def test_filters_are_bound_parameters(self):
+        from report_definitions import compile_definition
+        statement, _ = compile_definition({
+            "columns": ["volunteer_email"],
+            "filters": [{"field": "volunteer_city", "op": "eq", "value": "x'; DROP TABLE user_credentials; --"}],
+        })
+        self.assertNotIn("DROP", str(statement))
+        r = self.custom({
+            "columns": ["volunteer_email"],
+            "filters": [{"field": "volunteer_city", "op": "eq", "value": "x'; DROP TABLE user_credentials; --"}],
+        })
+        self.assertEqual(json.loads(r.data), [])
+
+    def test_invalid_definitions(self):
+        for definition in (
+            None,
+            {},
+            {"source": "users", "columns": ["volunteer_id"]},
+            {"columns": ["password_hash"]},
+            {"columns": ["volunteer_id"], "filters": [{"field": "event_date", "op": "gte", "value": "soon"}]},
+            {"columns": ["volunteer_id"], "filters": [{"field": "volunteer_id", "op": "like", "value": 1}]},
+            {"columns": ["volunteer_state", "volunteer_city"], "aggregates": [{"func": "count"}],
+             "group_by": ["volunteer_state"]},
+            {"aggregates": [{"func": "median", "field": "volunteer_id"}]},
+            {"columns": ["volunteer_id"], "sort": [{"field": "volunteer_id", "dir": "up"}]},
+            {"columns": ["volunteer_id"], "limit": 0},
+        ):
+            for fmt in ("json", "csv"):
+                self.assertEqual(self.custom(definition, fmt).status_code, 400, (definition, fmt))
+
+    def test_malformed_shapes(self):
+        for definition in (
+            {"columns": ["volunteer_id"], "filters": ["x"]},
+            {"aggregates": ["count"]},
+            {"columns": ["event_name"], "sort": ["event_name"]},
+            {"columns": [["a"]]},
+            {"columns": "event_name"},
+            {"columns": ["event_name"], "aggregates": [{"func": "count"}], "group_by": "event_name"},
+            {"columns": ["event_name"], "group_by": [{"field": "event_name"}]},
+            {"source": ["history"], "columns": ["event_name"]},
+            {"columns": ["event_name"], "filters": [{"field": ["event_name"], "value": "x"}]},
+            {"columns": ["event_name"], "filters": [{"field": "event_name", "op": ["eq"], "value": "x"}]},
+            {"columns": ["event_name"], "sort": [{"field": {"a": 1}}]},
+        ):
+            for fmt in ("json", "csv"):
+                r = self.custom(definition, fmt)
+                self.assertEqual(r.status_code, 400, (definition, fmt, r.data))
+
+    def test_builtin_reports_accept_filters(self):
+        rows = json.loads(self.client.get("/reports/json/volunteer_history?state=tx&skill=Logistics").data)
+        self.assertIn("def0@example.com", {row["Email"] for row in rows})
+        self.assertFalse({row["Email"] for row in rows} & {"def1@example.com", "def2@example.com"})
+
+        r = self.client.get("/reports/volunteer_history.csv?city=denver")
+        emails = {row[0] for row in list(csv.reader(io.StringIO(r.get_data(as_text=True))))[1:]}
+        self.assertIn("def2@example.com", emails)
+        self.assertFalse(emails & {"def0@example.com", "def1@example.com"})
+
+        with app.app_context():
+            first_date = EventDetails.query.order_by(EventDetails.id).first().event_date.isoformat()
+        rows = json.loads(self.client.get(
+            f"/reports/json/event_assignments?date_from={first_date}&date_to={first_date}").data)
+        self.assertTrue(rows)
+        self.assertTrue(all(row["Event Date"] == first_date for row in rows))
+
+    def test_filters_apply_to_parallel_builder(self):
+        serial = self.client.get("/reports/volunteer_history.csv?state=TX&date_from=2000-01-01")
+        parallel = self.client.get("/reports/volunteer_history.csv?state=TX&date_from=2000-01-01&workers=2")
+        self.assertEqual(parallel.status_code, 200)
+        self.assertEqual(parallel.get_data(as_text=True), serial.get_data(as_text=True))
+
+    def test_aliases_and_sort_stay_out_of_sql(self):
+        from report_definitions import compile_definition
+        r = self.custom({
+            "aggregates": [{"func": "count", "as": 'n" , (SELECT group_concat(password_hash) FROM user_credentials) --'}],
+            "sort": [{"field": 'n" , (SELECT group_concat(password_hash) FROM user_credentials) --'}],
+        })
+        self.assertEqual(r.status_code, 400)
+        statement, _ = compile_definition({
+            "columns": ["volunteer_state"],
+            "aggregates": [{"func": "count", "as": "volunteers"}],
+            "sort": [{"field": "volunteers", "dir": "desc"}],
+        })
+        self.assertIn("ORDER BY volunteers DESC", str(statement))
+
+    def test_contains_treats_wildcards_literally(self):
+        r = self.custom({"columns": ["volunteer_email"], "filters": [{"field": "volunteer_email", "op": "contains", "value": "def_"}]})
+        self.assertEqual(json.loads(r.data), [])
+        r = self.custom({"columns": ["volunteer_email"], "filters": [{"field": "volunteer_email", "op": "contains", "value": "%"}]})
+        self.assertEqual(json.loads(r.data), [])
+
+    def test_json_row_cap(self):
+        with patch.dict(app.config, {"CUSTOM_REPORT_JSON_MAX_ROWS": 2}):
+            self.assertEqual(self.custom({"columns": ["volunteer_id"], "limit": 3}).status_code, 400)
+            self.assertEqual(len(json.loads(self.custom({"columns": ["volunteer_id"]}).data)), 2)
+            self.assertEqual(self.custom({"columns": ["volunteer_id"], "limit": 3}, fmt="csv").status_code, 200)
+
+    def test_builtin_report_bad_filter(self):
+        for url in ("/reports/json/volunteer_history?date_from=tomorrow",
+                    "/reports/event_assignments.csv?date_to=2025-13-01"):
+            self.assertEqual(self.client.get(url).status_code, 400, url)
+
+
+#                     SKILL ANALYTICS TESTS
+
+class TestSkillAnalytics(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            db.session.add_all([
+                EventDetails(event_name="Hives", skills="Beekeeping, Logistics", volunteer_limit=3,
+                             urgency="High", event_date=datetime(2099, 1, 1).date()),
+                EventDetails(event_name="Honey", skills="Catering", required_skills="beekeeping",
+                             volunteer_limit=2, urgency="Low", event_date=datetime(2099, 2, 1).date()),
+                EventDetails(event_name="Old Hives", skills="Beekeeping", volunteer_limit=9,
+                             urgency="Critical", event_date=datetime(2000, 1, 1).date()),
+                EventDetails(event_name="Closed Hives", skills="Beekeeping", volunteer_limit=9,
+                             urgency="Critical", event_date=datetime(2099, 3, 1).date(), status="closed"),
+            ])
+            for i, role in enumerate(["volunteer", "volunteer", "admin"]):
+                user = UserCredentials(email=f"bee{i}@example.com", role=role, password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(UserProfile(id=user.id, full_name=f"Bee {i}", skills="Beekeeping"))
+            db.session.commit()
+
+    def skill(self, name):
+        rows = json.loads(self.client.get("/analytics/skills").data)
+        return next((row for row in rows if row["skill"].lower() == name.lower()), None)
+
+    def count_queries(self, url):
+        from sqlalchemy import event as sa_event
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+
+    def test_demand_and_supply(self):
+        self.assertEqual(self.skill("beekeeping"), {
+            "skill": "Beekeeping", "events": 2, "volunteer_slots": 5, "weighted_demand": 3 * 3 + 2 * 1,
+            "volunteers": 2, "shortfall": 3, "coverage": 0.4, "pressure": 5.5,
+        })
+        catering = self.skill("Catering")
+        self.assertEqual((catering["events"], catering["volunteers"], catering["coverage"]), (1, 0, 0.0))
+
+    def test_supply_only_skill_has_no_demand(self):
+        first_aid = self.skill("First Aid")
+        self.assertEqual(first_aid["volunteer_slots"], 0)
+        self.assertIsNone(first_aid["coverage"])
+        self.assertGreaterEqual(first_aid["volunteers"], 1)
+
+    def test_sorted_by_pressure(self):
+        rows = json.loads(self.client.get("/analytics/skills").data)
+        pressures = [row["pressure"] for row in rows]
+        self.assertEqual(pressures, sorted(pressures, reverse=True))
+
+    def test_cached_until_skills_change(self):
+        self.assertEqual(self.count_queries("/analytics/skills"), 2)
+        self.assertEqual(self.count_queries("/analytics/skills"), 0)
+
+        with app.app_context():
+            event = EventDetails.query.filter_by(event_name="Hives").first()
+            event.current_volunteers = 1
+            event.description = "Unrelated change"
+            db.session.commit()
+        self.assertEqual(self.count_queries("/analytics/skills"), 0)
+
+        with app.app_context():
+            profile = UserProfile.query.filter_by(full_name="Bee 2").first()
+            profile.user.role = "volunteer"
+            db.session.commit()
+        self.assertEqual(self.skill("Beekeeping")["volunteers"], 3)
+
+        with app.app_context():
+            EventDetails.query.filter_by(event_name="Honey").first().volunteer_limit = 4
+            db.session.commit()
+        self.assertEqual(self.skill("Beekeeping")["volunteer_slots"], 7)
+
+    def test_rollback_keeps_cache(self):
+        self.count_queries("/analytics/skills")
+        with app.app_context():
+            db.session.add(EventDetails(event_name="Rolled back", skills="Beekeeping", event_date=datetime(2099, 1, 1).date()))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.count_queries("/analytics/skills"), 0)
+
+    def test_core_insert_marks_change(self):
+        from skill_analytics import mark_skills_changed
+        self.count_queries("/analytics/skills")
+        with app.app_context():
+            user = UserCredentials(email="bee9@example.com", role="volunteer", password_hash="x")
+            db.session.add(user)
+            db.session.commit()
+            user_id = user.id
+        self.skill("Beekeeping")
+        with app.app_context():
+            db.session.execute(db.insert(UserProfile), [{"id": user_id, "full_name": "Bee 9", "skills": "Beekeeping"}])
+            mark_skills_changed(db.session)
+            db.session.commit()
+        self.assertEqual(self.skill("Beekeeping")["volunteers"], 3)
+
+    def test_metrics_include_cache(self):
+        self.client.get("/analytics/skills")
+        self.client.get("/analytics/skills")
+        stats = json.loads(self.client.get("/metrics").data)["skill_gap_cache"]
+        self.assertTrue(stats["cached"])
+        self.assertGreaterEqual(stats["hits"], 1)
+
+
+#                        OLAP PIVOT TESTS
+
+class TestOlapPivot(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            for i, (state, urgency) in enumerate([("CO", "High"), ("CO", "Low"), ("WA", "High")]):
+                event = EventDetails(event_name=f"Pivot {i}", state=state, city="Pivotville",
+                                     urgency=urgency, event_date=datetime(2031, i + 1, 1).date())
+                db.session.add(event)
+                db.session.flush()
+                for status in ("pending", "accepted")[:i + 1]:
+                    db.session.add(EventInvite(user_id=user.id, event_id=event.id, status=status,
+                                               created_at=datetime(2031, 5, 1)))
+            db.session.commit()
+
+    def pivot(self, **query):
+        r = self.client.get("/analytics/pivot", query_string=query)
+        self.assertEqual(r.status_code, 200, r.data)
+        return json.loads(r.data)
+
+    def test_group_by_and_filter(self):
+        rows = self.pivot(fact="invites", group_by="state,status", city="Pivotville")
+        self.assertEqual(sorted((row["state"], row["status"], row["count"]) for row in rows), [
+            ("CO", "accepted", 1), ("CO", "pending", 2), ("WA", "accepted", 1), ("WA", "pending", 1),
+        ])
+
+    def test_multiple_values_and_filters(self):
+        rows = self.pivot(fact="events", group_by="month", urgency="High,Critical", state="CO,WA")
+        self.assertEqual(sorted((row["month"], row["count"]) for row in rows), [("2031-01", 1), ("2031-03", 1)])
+        self.assertEqual(self.pivot(fact="events", state="NOWHERE"), [])
+
+    def test_total_without_group_by(self):
+        with app.app_context():
+            total = EventInvite.query.count()
+        self.assertEqual(self.pivot(fact="invites"), [{"count": total}])
+
+    def test_matches_sql(self):
+        rows = self.pivot(fact="history", group_by="state,urgency")
+        with app.app_context():
+            expected = db.session.execute(
+                db.select(EventDetails.state, EventDetails.urgency, db.func.count())
+                .select_from(VolunteerHistory).outerjoin(EventDetails, EventDetails.id == VolunteerHistory.event_id)
+                .group_by(EventDetails.state, EventDetails.urgency)
+            ).all()
+        self.assertEqual(sorted((row["state"], row["urgency"], row["count"]) for row in rows),
+                         sorted(tuple(row) for row in expected))
+
+    def test_incremental_refresh_reads_only_new_rows(self):
+        from app import olap_snapshot
+        self.pivot(fact="invites")
+        full_refreshes = olap_snapshot.stats()["full_refreshes"]
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            event = EventDetails.query.filter_by(event_name="Pivot 2").first()
+            db.session.add(EventInvite(user_id=user.id, event_id=event.id, status="declined"))
+            db.session.commit()
+
+        # Until the next refresh the snapshot doesn't see the new row
+        self.assertEqual(self.pivot(fact="invites", status="declined"), [])
+
+        statements = []
+        from sqlalchemy import event as sa_event
+        listener = lambda *args: statements.append((args[2], args[3]))
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            with app.app_context():
+                olap_snapshot.refresh_due()
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        rows = self.pivot(fact="invites", status="declined", group_by="state")
+        self.assertEqual(rows, [{"state": "WA", "count": 1}])
+        self.assertEqual(len(statements), len(olap_snapshot.stats()["rows"]))
+        self.assertTrue(all("id >" in sql for sql, _ in statements))
+        self.assertEqual(olap_snapshot.stats()["full_refreshes"], full_refreshes)
+
+    def test_full_refresh_picks_up_updates(self):
+        from app import olap_snapshot
+        self.pivot(fact="invites")
+        with app.app_context():
+            # A bulk UPDATE that doesn't report its rows: only a full reload sees it
+            EventInvite.query.filter_by(status="pending").update({"status": "expired"})
+            db.session.commit()
+            with patch.object(olap_snapshot, "full_refresh_seconds", 0):
+                olap_snapshot.refresh_due()
+        rows = self.pivot(fact="invites", status="expired")
+        self.assertEqual(rows[0]["count"], 3)
+
+    def test_status_updates_apply_incrementally(self):
+        from app import olap_snapshot, expire_stale_invites
+        self.pivot(fact="invites")
+        full_refreshes = olap_snapshot.stats()["full_refreshes"]
+        with app.app_context():
+            invite = EventInvite.query.filter_by(status="accepted").first()
+            invite.status = "declined"
+            EventInvite.query.filter_by(status="pending").update({"created_at": datetime(2020, 1, 1)})
+            db.session.commit()
+            expire_stale_invites(max_age_days=30)
+            olap_snapshot.refresh_due()
+            expected = dict(db.session.execute(
+                db.select(EventInvite.status, db.func.count()).group_by(EventInvite.status)).all())
+        rows = self.pivot(fact="invites", group_by="status")
+        self.assertEqual({row["status"]: row["count"] for row in rows}, expected)
+        self.assertEqual(expected.get("pending", 0), 0)
+        self.assertEqual(olap_snapshot.stats()["full_refreshes"], full_refreshes)
+
+    def test_event_changes_reach_joined_facts(self):
+        from app import olap_snapshot
+        self.pivot(fact="invites")
+        with app.app_context():
+            event = EventDetails.query.filter_by(event_name="Pivot 2").first()
+            event.state = "OR"
+            db.session.commit()
+            olap_snapshot.refresh_due()
+        rows = self.pivot(fact="invites", group_by="state", city="Pivotville")
+        self.assertEqual(sorted((row["state"], row["count"]) for row in rows), [("CO", 3), ("OR", 2)])
+
+    def test_no_refresh_on_request_thread(self):
+        from app import olap_snapshot
+        self.pivot(fact="invites")
+        stats = olap_snapshot.stats()
+        with patch.object(olap_snapshot, "refresh_seconds", 0), patch.object(olap_snapshot, "full_refresh_seconds", 0):
+            self.pivot(fact="invites")
+        after = olap_snapshot.stats()
+        self.assertEqual((after["full_refreshes"], after["incremental_refreshes"]),
+                         (stats["full_refreshes"], stats["incremental_refreshes"]))
+        self.assertFalse(after["background"])
+
+    def test_unknown_parameters_ignored(self):
+        rows = self.pivot(fact="history", color="red", _="1700000000")
+        self.assertEqual(rows, self.pivot(fact="history"))
+
+    def test_bad_requests(self):
+        for query in ({"fact": "users"}, {"fact": "events", "group_by": "type"}, {"fact": "history", "group_by": "color"}):
+            self.assertEqual(self.client.get("/analytics/pivot", query_string=query).status_code, 400, query)
+
+
+#                       DAILY ROLLUP TESTS
+
+class TestDailyRollups(BaseTestCase):
+
+    def today(self):
+        from datetime import timezone
+        return datetime.now(timezone.utc).date().isoformat()
+
+    def daily(self, query=""):
+        r = self.client.get(f"/analytics/daily{query}")
+        self.assertEqual(r.status_code, 200, r.data)
+        return json.loads(r.data)
+
+    def run_lifecycle(self):
+        self.client.post("/register", json={"email": "roll@example.com", "password": "Password123"})
+        self.client.post("/signup", json={"email": "roll@example.com", "event_id": 1})
+        self.client.post("/signup", json={"email": "volunteer@example.com", "event_id": 2})
+        with app.app_context():
+            invite_id = EventInvite.query.filter_by(event_id=1).first().id
+        self.client.put(f"/invites/{invite_id}", json={"status": "accepted"})
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+
+    def test_writes_update_today(self):
+        self.run_lifecycle()
+        days = self.daily()
+        self.assertEqual(len(days), 30)
+        self.assertEqual(days[-1], {
+            "day": self.today(), "registrations": 1, "signups": 2, "approvals": 1, "completions": 1
+        })
+        self.assertTrue(all(day["signups"] == 0 for day in days[:-1]))
+
+    def test_per_event_and_metric_selection(self):
+        self.run_lifecycle()
+        today = self.today()
+        self.assertEqual(self.daily(f"?from={today}&to={today}&event_id=1&metrics=signups,completions"),
+                         [{"day": today, "signups": 1, "completions": 1}])
+        self.assertEqual(self.daily(f"?from={today}&to={today}&event_id=2&metrics=approvals"),
+                         [{"day": today, "approvals": 0}])
+
+    def test_uncomplete_decrements(self):
+        self.run_lifecycle()
+        with app.app_context():
+            invite_id = EventInvite.query.filter_by(event_id=1).first().id
+        self.client.put(f"/invites/{invite_id}/complete", json={"completed": False})
+        self.assertEqual(self.daily("?metrics=completions")[-1]["completions"], 0)
+
+    def test_repeated_completion_counts_once(self):
+        self.run_lifecycle()
+        with app.app_context():
+            invite_id = EventInvite.query.filter_by(event_id=1).first().id
+        for _ in range(2):
+            r = self.client.put(f"/invites/{invite_id}/complete", json={"completed": True})
+            self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.daily("?metrics=completions")[-1]["completions"], 1)
+        for _ in range(3):
+            self.client.put(f"/invites/{invite_id}/complete", json={"completed": False})
+        self.assertEqual(self.daily("?metrics=completions")[-1]["completions"], 0)
+        from models import ActivityLog
+        with app.app_context():
+            logged = ActivityLog.query.filter(ActivityLog.type.in_(["invite_completed", "invite_uncompleted"])).count()
+        self.assertEqual(logged, 2)
+
+    def test_bulk_import_counts_registrations(self):
+        from werkzeug.security import generate_password_hash
+        fast_hash = generate_password_hash("Imported1", "pbkdf2:sha256:1000")
+        csv_text = "email,password_hash\n" + "".join(f"bulk{i}@example.com,{fast_hash}\n" for i in range(3))
+        self.client.post("/users/import", data=csv_text.encode(), content_type="text/csv", headers=admin_auth())
+        self.assertEqual(self.daily("?metrics=registrations")[-1]["registrations"], 3)
+
+    def test_rebuild_matches_incremental(self):
+        from daily_rollups import rebuild_daily_rollups
+        from models import ActivityLog, DailyRollup
+        self.run_lifecycle()
+        with app.app_context():
+            db.session.add(ActivityLog(type="signup_requested", event_id=2, created_at=datetime(2030, 1, 5, 23, 0)))
+            db.session.commit()
+            before = sorted(tuple(row) for row in db.session.execute(db.select(DailyRollup.__table__)))
+            rebuild_daily_rollups()
+            after = sorted(tuple(row) for row in db.session.execute(db.select(DailyRollup.__table__)))
+        self.assertEqual(before, after)
+        self.assertEqual(self.daily("?from=2030-01-05&to=2030-01-06&metrics=signups&event_id=2"),
+                         [{"day": "2030-01-05", "signups": 1}, {"day": "2030-01-06", "signups": 0}])
+
+    def test_range_read_uses_primary_key(self):
+        from sqlalchemy import text
+        from models import DailyRollup
+        with app.app_context():
+            query = DailyRollup.query.with_entities(DailyRollup.day, DailyRollup.count).filter(
+                DailyRollup.metric.in_(["signups", "approvals"]), DailyRollup.event_id == 0,
+                DailyRollup.day.between(datetime(2030, 1, 1).date(), datetime(2030, 2, 1).date()))
+            sql = str(query.statement.compile(db.engine, compile_kwargs={"literal_binds": True}))
+            plan = " ".join(row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql)))
+        self.assertIn("sqlite_autoindex_daily_rollup_1", plan)
+        self.assertIn("day>", plan)
+
+    def test_bad_params(self):
+        for query in ("?from=yesterday", "?from=2030-02-01&to=2030-01-01", "?from=2000-01-01&to=2030-01-01",
+                      "?metrics=visits"):
+            self.assertEqual(self.client.get(f"/analytics/daily{query}").status_code, 400, query)
+
+
+#                      GEO AGGREGATION TESTS
+
+class TestGeoAnalytics(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        with app.app_context():
+            for i, (state, zipcode, skills) in enumerate([
+                ("ZZ", "99501", "Kayaking"), ("ZZ", "99502", "First Aid"), ("ZY", "99601", "Kayaking"),
+            ]):
+                user = UserCredentials(email=f"geo{i}@example.com", role="volunteer", password_hash="x")
+                db.session.add(user)
+                db.session.flush()
+                db.session.add(UserProfile(id=user.id, full_name=f"Geo {i}", state=state, zipcode=zipcode, skills=skills))
+            db.session.add_all([
+                EventDetails(event_name="Geo A", state="ZZ", zipcode="99503", skills="Kayaking",
+                             event_date=datetime(2031, 1, 1).date()),
+                EventDetails(event_name="Geo B", state="ZX", zipcode="99701", required_skills="Kayaking",
+                             event_date=datetime(2031, 6, 1).date()),
+            ])
+            db.session.commit()
+
+    def geo(self, query=""):
+        r = self.client.get(f"/analytics/geo{query}")
+        self.assertEqual(r.status_code, 200, r.data)
+        return {row["region"]: (row["volunteers"], row["events"]) for row in json.loads(r.data)}
+
+    def count_queries(self, url):
+        from sqlalchemy import event as sa_event
+        statements = []
+        listener = lambda *args: statements.append(args[2])
+        with app.app_context():
+            engine = db.engine
+        sa_event.listen(engine, "before_cursor_execute", listener)
+        try:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", listener)
+        return len(statements)
+
+    def test_by_state(self):
+        regions = self.geo()
+        self.assertEqual((regions["ZZ"], regions["ZY"], regions["ZX"]), ((2, 1), (1, 0), (0, 1)))
+        self.assertEqual(regions["TX"][1], 2)
+
+    def test_by_zip_prefix_with_filters(self):
+        self.assertEqual({k: v for k, v in self.geo("?zip_prefix=3&skill=kayaking").items() if k.startswith("99")},
+                         {"995": (1, 1), "996": (1, 0), "997": (0, 1)})
+        regions = self.geo("?zip_prefix=4&date_from=2031-03-01&skill=Kayaking")
+        self.assertEqual(regions["9970"], (0, 1))
+        self.assertEqual(regions["9950"], (1, 0))
+
+    def test_cached_until_tables_change(self):
+        self.assertEqual(self.count_queries("/analytics/geo"), 2)
+        self.assertEqual(self.count_queries("/analytics/geo"), 0)
+        self.assertEqual(self.count_queries("/analytics/geo?zip_prefix=2"), 2)
+
+        # Commits to unrelated tables keep the cache
+        self.client.post("/signup", json={"email": "volunteer@example.com", "event_id": 1})
+        self.assertEqual(self.count_queries("/analytics/geo"), 0)
+
+        with app.app_context():
+            UserProfile.query.filter_by(full_name="Geo 2").first().state = "ZZ"
+            db.session.commit()
+        self.assertEqual(self.geo()["ZZ"], (3, 1))
+
+        with app.app_context():
+            EventDetails.query.filter_by(event_name="Geo B").delete()
+            db.session.commit()
+        self.assertNotIn("ZX", self.geo())
+
+    def test_rolled_back_changes_keep_cache(self):
+        self.geo()
+        with app.app_context():
+            db.session.add(EventDetails(event_name="Rolled back", state="ZQ"))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(self.count_queries("/analytics/geo"), 0)
+
+    def test_state_grouping_uses_index(self):
+        from sqlalchemy import text
+        from app import geo_counts
+        with app.app_context():
+            with patch("app.db.session.execute", wraps=db.session.execute) as execute:
+                geo_counts()
+            for call in execute.call_args_list:
+                sql = str(call.args[0].compile(db.engine, compile_kwargs={"literal_binds": True}))
+                plan = " ".join(row[-1] for row in db.session.execute(text("EXPLAIN QUERY PLAN " + sql)))
+                self.assertIn("state_zipcode", plan)
+                self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_bad_params(self):
+        for query in ("?zip_prefix=0", "?zip_prefix=9", "?zip_prefix=x", "?date_from=soon"):
+            self.assertEqual(self.client.get(f"/analytics/geo{query}").status_code, 400, query)
+
+
+#                    AVAILABILITY HEATMAP TESTS
+
+class TestAvailabilityHeatmap(BaseTestCase):
+
+    def setUp(self):
+        super().setUp()
+        for i, (skills, availability) in enumerate([
+            (["First Aid", "Logistics"], "2032-03-01, 2032-03-02"),
+            (["logistics"], "2032-03-02, not-a-date"),
+        ]):
+            email = f"avail{i}@example.com"
+            self.client.post("/register", json={"email": email, "password": "Password123"})
+            r = self.client.put(f"/profile/{email}", json={
+                "full_name": f"Avail {i}", "address1": "1 Main St", "city": "Austin", "state": "TX",
+                "zip_code": "78701", "skills": skills, "availability": availability.split(", "),
+            })
+            self.assertEqual(r.status_code, 200, r.data)
+
+    def days(self, query="?from=2032-03-01&to=2032-03-03"):
+        r = self.client.get(f"/analytics/availability{query}")
+        self.assertEqual(r.status_code, 200, r.data)
+        return json.loads(r.data)
+
+    def stored_counts(self):
+        from models import AvailabilityDay
+        with app.app_context():
+            return {(row.day, row.skill): row.count for row in AvailabilityDay.query if row.count}
+
+    def test_counts_per_day(self):
+        self.assertEqual([(d["day"], d["available"]) for d in self.days()],
+                         [("2032-03-01", 1), ("2032-03-02", 2), ("2032-03-03", 0)])
+
+    def test_skill_filter_and_breakdown(self):
+        self.assertEqual([d["available"] for d in self.days("?from=2032-03-01&to=2032-03-02&skill=LOGISTICS")], [1, 2])
+        self.assertEqual(self.days("?from=2032-03-02&to=2032-03-02&by_skill=true"),
+                         [{"day": "2032-03-02", "available": 2, "skills": {"first aid": 1, "logistics": 2}}])
+
+    def test_profile_update_moves_counts(self):
+        self.client.put("/profile/avail1@example.com", json={"availability": ["2032-03-03"], "skills": ["First Aid"]})
+        self.assertEqual([d["available"] for d in self.days()], [1, 1, 1])
+        self.assertEqual([d["available"] for d in self.days("?from=2032-03-01&to=2032-03-03&skill=first aid")], [1, 1, 1])
+        self.assertEqual([d["available"] for d in self.days("?from=2032-03-01&to=2032-03-03&skill=logistics")], [1, 1, 0])
+
+    def test_role_change_and_delete(self):
+        self.client.put("/users/avail0@example.com", json={"role": "admin"})
+        self.assertEqual([d["available"] for d in self.days()], [0, 1, 0])
+        self.client.put("/users/avail0@example.com", json={"role": "volunteer"})
+        self.assertEqual([d["available"] for d in self.days()], [1, 2, 0])
+        self.client.delete("/users/avail1@example.com")
+        self.assertEqual([d["available"] for d in self.days()], [1, 1, 0])
+
+    def test_rebuild_matches_incremental(self):
+        from availability import rebuild_availability
+        self.client.put("/profile/avail1@example.com", json={"availability": ["2032-03-03"]})
+        before = self.stored_counts()
+        with app.app_context():
+            rebuild_availability()
+        self.assertEqual(self.stored_counts(), before)
+
+    def test_bulk_import_counts(self):
+        from werkzeug.security import generate_password_hash
+        fast_hash = generate_password_hash("Imported1", "pbkdf2:sha256:1000")
+        csv_text = ("email,password_hash,full_name,skills,availability\n"
+                    f'bulkavail@example.com,{fast_hash},Bulk,Logistics,"2032-03-03"\n')
+        r = self.client.post("/users/import", data=csv_text.encode(), content_type="text/csv", headers=admin_auth())
+        self.assertEqual(json.loads(r.data)["imported"], 1, r.data)
+        self.assertEqual([d["available"] for d in self.days()], [1, 2, 1])
+
+    def test_bad_params(self):
+        for query in ("?from=tomorrow", "?from=2032-03-02&to=2032-03-01", "?from=2032-01-01&to=2034-01-01"):
+            self.assertEqual(self.client.get(f"/analytics/availability{query}").status_code, 400, query)
+
+
+#                     SERVER-SENT EVENTS TESTS
+
+class TestEventStream(BaseTestCase):
+
+    def open_stream(self, query="", headers=None):
+        with patch.dict(app.config, {"STREAM_HEARTBEAT_SECONDS": 0.01}):
+            r = self.client.get(f"/stream{query}", headers=headers or {}, buffered=False)
+        self.assertEqual(r.status_code, 200, r.data if not r.is_streamed else "")
+        self.assertEqual(r.mimetype, "text/event-stream")
+        self.addCleanup(r.close)
+        frames = iter(r.response)
+        self.assertEqual(next(frames), b"retry: 3000\n\n")
+        return frames
+
+    def read_events(self, frames, limit=20):
+        """Parsed events until the first keepalive (i.e. until the stream goes idle)."""
+        events = []
+        for _ in range(limit):
+            frame = next(frames).decode()
+            if frame.startswith(":"):
+                break
+            fields = dict(line.split(": ", 1) for line in frame.strip().split("\n"))
+            events.append((fields["event"], json.loads(fields["data"]), fields.get("id")))
+        return events
+
+    def invite(self, email, event_id):
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email=email).first()
+            invite = EventInvite(user_id=user.id, event_id=event_id)
+            db.session.add(invite)
+            db.session.commit()
+            return invite.id
+
+    def test_notification_pushed_after_commit(self):
+        frames = self.open_stream()
+        self.assertEqual(self.read_events(frames), [])
+        with app.app_context():
+            create_notification("Pushed hello")
+        events = self.read_events(frames)
+        self.assertEqual([(name, data["message"]) for name, data, _ in events], [("notification", "Pushed hello")])
+
+    def test_rollback_publishes_nothing(self):
+        from event_stream import broker
+        published = broker.stats()["published"]
+        with app.app_context():
+            db.session.add(Notification(message="Never committed"))
+            db.session.flush()
+            db.session.rollback()
+        self.assertEqual(broker.stats()["published"], published)
+
+    def test_invite_channels(self):
+        self.client.post("/register", json={"email": "other@example.com", "password": "Password123"})
+        volunteer = self.open_stream("?email=volunteer@example.com")
+        admin = self.open_stream("?email=admin@example.com")
+        self.read_events(volunteer)
+        self.read_events(admin)
+
+        mine = self.invite("volunteer@example.com", 1)
+        theirs = self.invite("other@example.com", 2)
+        self.client.put(f"/invites/{mine}", json={"status": "accepted"})
+
+        volunteer_events = [(name, data["invite_id"], data["status"])
+                            for name, data, _ in self.read_events(volunteer) if name.startswith("invite")]
+        self.assertEqual(volunteer_events, [("invite", mine, "pending"), ("invite", mine, "accepted")])
+        admin_invites = {data["invite_id"] for name, data, _ in self.read_events(admin) if name == "invite"}
+        self.assertEqual(admin_invites, {mine, theirs})
+
+    def test_expiry_sweep_is_pushed(self):
+        from app import expire_stale_invites
+        invite_id = self.invite("volunteer@example.com", 1)
+        frames = self.open_stream("?email=volunteer@example.com")
+        self.read_events(frames)
+        with app.app_context():
+            expire_stale_invites(max_age_days=-1)
+        events = [(data["invite_id"], data["status"]) for name, data, _ in self.read_events(frames) if name == "invite"]
+        self.assertEqual(events, [(invite_id, "expired")])
+
+    def test_resume_from_last_event_id(self):
+        from event_stream import broker
+        last_id = broker.stats()["last_id"]
+        with app.app_context():
+            for i in range(3):
+                create_notification(f"Resume {i}")
+        events = self.read_events(self.open_stream(headers={"Last-Event-ID": str(last_id)}))
+        resume = [(data["message"], event_id) for _, data, event_id in events if data["message"].startswith("Resume")]
+        self.assertEqual([message for message, _ in resume], ["Resume 0", "Resume 1", "Resume 2"])
+
+        events = self.read_events(self.open_stream(headers={"Last-Event-ID": resume[0][1]}))
+        self.assertEqual([data["message"] for _, data, _ in events], ["Resume 1", "Resume 2"])
+
+    def test_unsubscribe_on_close(self):
+        from event_stream import broker
+        before = broker.stats()["subscribers"]
+        with patch.dict(app.config, {"STREAM_HEARTBEAT_SECONDS": 0.01}):
+            r = self.client.get("/stream", buffered=False)
+        frames = iter(r.response)
+        next(frames)
+        self.assertEqual(broker.stats()["subscribers"], before + 1)
+        r.close()
+        self.assertEqual(broker.stats()["subscribers"], before)
+
+    def test_bad_requests(self):
+        self.assertEqual(self.client.get("/stream?email=nobody@example.com").status_code, 404)
+        self.assertEqual(self.client.get("/stream", headers={"Last-Event-ID": "abc"}).status_code, 400)
+        with patch.dict(app.config, {"STREAM_MAX_SUBSCRIBERS": 0}):
+            self.assertEqual(self.client.get("/stream").status_code, 503)
+
+
+class TestEventBroker(unittest.TestCase):
+
+    def test_overflow_cuts_off_slow_subscriber(self):
+        from event_stream import EventBroker
+        broker = EventBroker(history_size=10, buffer_size=2)
+        slow = broker.subscribe({"a"})
+        other = broker.subscribe({"b"})
+        for i in range(3):
+            broker.publish("tick", {"i": i}, {"a"})
+        self.assertTrue(slow.overflowed)
+        self.assertFalse(other.overflowed)
+        self.assertEqual([json.loads(m[2])["i"] for m in slow.wait(0)], [0, 1])
+        self.assertEqual(broker.stats()["overflows"], 1)
+
+    def test_missed_when_history_trimmed(self):
+        from event_stream import EventBroker
+        broker = EventBroker(history_size=2)
+        for i in range(5):
+            broker.publish("tick", {"i": i}, {"a"})
+        self.assertTrue(broker.subscribe({"a"}, last_event_id=1).missed)
+        caught_up = broker.subscribe({"a"}, last_event_id=3)
+        self.assertFalse(caught_up.missed)
+        self.assertEqual([m[0] for m in caught_up.wait(0)], [4, 5])
+        # Ids from before a restart
+        self.assertTrue(broker.subscribe({"a"}, last_event_id=99).missed)
+
+    def test_idle_wait_times_out(self):
+        from event_stream import EventBroker
+        subscription = EventBroker().subscribe({"a"})
+        self.assertEqual(subscription.wait(0.01), [])
+
+
+#                      PER-USER NOTIFICATION TESTS
+
+class TestUserNotifications(BaseTestCase):
+
+    def user_id(self, email):
+        with app.app_context():
+            return UserCredentials.query.filter_by(email=email).first().id
+
+    def badge(self, email):
+        r = self.client.get(f"/notifications/unread_count?email={email}")
+        self.assertEqual(r.status_code, 200)
+        return r.get_json()["unread"]
+
+    def direct(self, email, message):
+        with app.app_context():
+            notif = Notification(message=message, recipient_id=self.user_id(email))
+            db.session.add(notif)
+            db.session.commit()
+            return notif.id
+
+    def recount(self, email):
+        """The badge recomputed from scratch, to check the counters against."""
+        from notification_counters import rebuild_notification_counters, unread_count
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email=email).first()
+            rebuild_notification_counters()
+            return unread_count(user.id, user.role)
+
+    def test_direct_notification_only_for_recipient(self):
+        before = self.badge("admin@example.com")
+        self.direct("volunteer@example.com", "Just for you")
+        self.assertEqual(self.badge("volunteer@example.com"), 1)
+        self.assertEqual(self.badge("admin@example.com"), before)
+
+        mine = self.client.get("/notifications?email=volunteer@example.com").get_json()
+        self.assertEqual([(n["message"], n["read"], n["direct"]) for n in mine], [("Just for you", False, True)])
+        admin = self.client.get("/notifications?email=admin@example.com").get_json()
+        self.assertNotIn("Just for you", [n["message"] for n in admin])
+        # The legacy admin feed is broadcasts only
+        legacy = self.client.get("/notifications").get_json()
+        self.assertNotIn("Just for you", [n["message"] for n in legacy])
+
+    def test_broadcasts_read_per_user(self):
+        with app.app_context():
+            db.session.add(UserCredentials(email="second.admin@example.com", role="admin", password_hash="x"))
+            db.session.commit()
+        base = self.badge("admin@example.com")
+        with app.app_context():
+            create_notification("Admins only")
+            nid = Notification.query.filter_by(message="Admins only").first().id
+        self.assertEqual(self.badge("admin@example.com"), base + 1)
+        self.assertEqual(self.badge("second.admin@example.com"), base + 1)
+        self.assertEqual(self.badge("volunteer@example.com"), 0)
+
+        r = self.client.put(f"/notifications/{nid}/read?email=admin@example.com")
+        self.assertEqual(r.status_code, 200)
+        # Marking twice doesn't count twice
+        self.client.put(f"/notifications/{nid}/read?email=admin@example.com")
+        self.assertEqual(self.badge("admin@example.com"), base)
+        self.assertEqual(self.badge("second.admin@example.com"), base + 1)
+
+        unread = self.client.get("/notifications?email=admin@example.com&unread=true").get_json()
+        self.assertNotIn(nid, [n["id"] for n in unread])
+        other = self.client.get("/notifications?email=second.admin@example.com&unread=true").get_json()
+        self.assertIn(nid, [n["id"] for n in other])
+        self.assertEqual(self.badge("admin@example.com"), self.recount("admin@example.com"))
+
+    def test_mark_read_not_addressed_to_user(self):
+        nid = self.direct("volunteer@example.com", "Private")
+        r = self.client.put(f"/notifications/{nid}/read?email=admin@example.com")
+        self.assertEqual(r.status_code, 404)
+        self.assertEqual(self.badge("volunteer@example.com"), 1)
+
+        r = self.client.put(f"/notifications/{nid}/read?email=volunteer@example.com")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.badge("volunteer@example.com"), 0)
+
+    def test_read_all(self):
+        self.direct("volunteer@example.com", "One")
+        self.direct("volunteer@example.com", "Two")
+        with app.app_context():
+            create_notification("Admin notice")
+        self.assertGreater(self.badge("admin@example.com"), 0)
+
+        r = self.client.put("/notifications/read_all?email=volunteer@example.com")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(r.get_json()["marked"], 2)
+        r = self.client.put("/notifications/read_all?email=admin@example.com")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.badge("volunteer@example.com"), 0)
+        self.assertEqual(self.badge("admin@example.com"), 0)
+        self.assertEqual(self.recount("admin@example.com"), 0)
+        self.assertEqual(self.recount("volunteer@example.com"), 0)
+
+    def test_deleting_notifications_keeps_counts(self):
+        self.direct("volunteer@example.com", "Gone soon")
+        with app.app_context():
+            create_notification("Read then deleted")
+            nid = Notification.query.filter_by(message="Read then deleted").first().id
+        self.client.put(f"/notifications/{nid}/read?email=admin@example.com")
+        before = self.badge("admin@example.com")
+
+        with app.app_context():
+            for notif in Notification.query.filter(Notification.message.in_(["Gone soon", "Read then deleted"])):
+                db.session.delete(notif)
+            db.session.commit()
+        self.assertEqual(self.badge("volunteer@example.com"), 0)
+        self.assertEqual(self.badge("admin@example.com"), before)
+        self.assertEqual(self.recount("admin@example.com"), before)
+
+    def test_role_change_switches_audience(self):
+        with app.app_context():
+            create_notification("For admins")
+        before = self.badge("admin@example.com")
+        self.assertEqual(self.badge("volunteer@example.com"), 0)
+        with app.app_context():
+            user = UserCredentials.query.filter_by(email="volunteer@example.com").first()
+            user.role = "admin"
+            db.session.commit()
+        self.assertEqual(self.badge("volunteer@example.com"), before)
+        self.assertEqual(self.recount("volunteer@example.com"), before)
+
+    def test_invite_notifies_volunteer(self):
+        with app.app_context():
+            event = EventDetails.query.filter_by(event_name="Park Cleanup Day").first()
+            event_id = event.id
+        r = self.client.post("/invites", json={"email": "volunteer@example.com", "event_id": event_id, "type": "admin_invite"})
+        self.assertEqual(r.status_code, 201)
+        mine = self.client.get("/notifications?email=volunteer@example.com").get_json()
+        self.assertEqual([n["message"] for n in mine], ["You have been invited to Park Cleanup Day"])
+
+        r = self.client.post("/invites", json={"email": "volunteer@example.com", "event_id": event_id})
+        self.assertEqual(r.status_code, 201)
+        with app.app_context():
+            invite_id = EventInvite.query.filter_by(type="user_request", event_id=event_id).first().id
+        self.client.put(f"/invites/{invite_id}", json={"status": "accepted"})
+        mine = self.client.get("/notifications?email=volunteer@example.com&limit=1").get_json()
+        self.assertEqual([n["message"] for n in mine], ["Your request to join Park Cleanup Day was accepted"])
+        self.assertEqual(self.badge("volunteer@example.com"), 2)
+
+    def test_unread_count_is_one_query(self):
+        from sqlalchemy import event as sa_event
+        self.direct("volunteer@example.com", "Count me")
+        statements = []
+
+        def count(conn, cursor, statement, *args):
+            statements.append(statement)
+        with app.app_context():
+            engine = db.engine
+        self.badge("volunteer@example.com")  # warm the identity cache
+        sa_event.listen(engine, "before_cursor_execute", count)
+        try:
+            self.assertEqual(self.badge("volunteer@example.com"), 1)
+        finally:
+            sa_event.remove(engine, "before_cursor_execute", count)
+        self.assertEqual(len(statements), 1)
+        self.assertNotIn("notification ", statements[0].lower().replace("notification_", ""))
+
+    def test_validation_errors(self):
+        self.assertEqual(self.client.get("/notifications/unread_count").status_code, 400)
+        self.assertEqual(self.client.put("/notifications/read_all").status_code, 400)
+        self.assertEqual(self.client.get("/notifications/unread_count?email=nobody@example.com").status_code, 404)
+        self.assertEqual(self.client.get("/notifications?email=volunteer@example.com&limit=0").status_code, 400)
+        self.assertEqual(self.client.get("/notifications?email=volunteer@example.com&limit=x").status_code, 400)
+
+    def test_stream_channels(self):
+        from event_stream import broker
+        uid = self.user_id("volunteer@example.com")
+        mine = broker.subscribe({f"user:{uid}", "notifications:volunteer"})
+        feed = broker.subscribe({"notifications"})
+        self.addCleanup(broker.unsubscribe, mine)
+        self.addCleanup(broker.unsubscribe, feed)
+        self.direct("volunteer@example.com", "Direct push")
+        with app.app_context():
+            create_notification("Admin push")
+        self.assertEqual([json.loads(m[2])["message"] for m in mine.wait(0)], ["Direct push"])
+        self.assertEqual([json.loads(m[2])["message"] for m in feed.wait(0)], ["Admin push"])
+
+    def test_mark_read_twice_is_idempotent(self):
+        from models import NotificationReceipt
+        with app.app_context():
+            create_notification("Clicked twice")
+            nid = Notification.query.filter_by(message="Clicked twice").first().id
+            admin_id = self.user_id("admin@example.com")
+            # The other request's receipt is already there when this one inserts
+            db.session.add(NotificationReceipt(user_id=admin_id, notification_id=nid))
+            db.session.commit()
+        before = self.badge("admin@example.com")
+        r = self.client.put(f"/notifications/{nid}/read?email=admin@example.com")
+        self.assertEqual(r.status_code, 200)
+        self.assertEqual(self.badge("admin@example.com"), before)
+        self.assertEqual(before, self.recount("admin@example.com"))
+
+    def test_upgrade_keeps_legacy_read_flags(self):
+        from app import upgrade_schema
+        from models import BroadcastCounter, NotificationCounter
+        with app.app_context():
+            db.session.add(UserCredentials(email="second.admin@example.com", role="admin", password_hash="x"))
+            db.session.add_all([Notification(message="Old and read", read=True), Notification(message="Old unread")])
+            db.session.commit()
+            # As a database from before per-user notifications would look
+            Notification.query.update({Notification.audience: None}, synchronize_session=False)
+            BroadcastCounter.query.delete()
+            NotificationCounter.query.delete()
+            db.session.commit()
+            upgrade_schema()
+            unread = Notification.query.filter_by(read=False, recipient_id=None).count()
+        for email in ("admin@example.com", "second.admin@example.com"):
+            self.assertEqual(self.badge(email), unread)
+            messages = [n["message"] for n in self.client.get(f"/notifications?email={email}&unread=true").get_json()]
+            self.assertIn("Old unread", messages)
+            self.assertNotIn("Old and read", messages)
+
+    def test_legacy_mark_read_clears_admin_badges(self):
+        with app.app_context():
+            db.session.add(UserCredentials(email="second.admin@example.com", role="admin", password_hash="x"))
+            db.session.commit()
+            create_notification("Seen in the old feed")
+        before = {email: self.badge(email) for email in ("admin@example.com", "second.admin@example.com")}
+        feed = self.client.get("/notifications").get_json()
+        nid = next(n["id"] for n in feed if n["message"] == "Seen in the old feed")
+
+        r = self.client.put(f"/notifications/{nid}/read")
+        self.assertEqual(r.status_code, 200)
+        self.assertNotIn(nid, [n["id"] for n in self.client.get("/notifications").get_json()])
+        for email, count in before.items():
+            self.assertEqual(self.badge(email), count - 1, email)
+            self.assertEqual(self.badge(email), self.recount(email), email)
+
+        # Clearing the whole old feed leaves no admin badge behind
+        for notif in self.client.get("/notifications").get_json():
+            self.client.put(f"/notifications/{notif['id']}/read")
+        self.assertEqual(self.badge("second.admin@example.com"), 0)
+
+    def test_legacy_mark_read_only_for_admin_broadcasts(self):
+        nid = self.direct("volunteer@example.com", "Private")
+        self.assertEqual(self.client.put(f"/notifications/{nid}/read").status_code, 404)
+        self.assertEqual(self.badge("volunteer@example.com"), 1)
+
+    def test_user_delete_removes_notifications(self):
+        self.direct("volunteer@example.com", "Bye")
+        r = self.client.delete("/users/volunteer@example.com")
+        self.assertEqual(r.status_code, 200)
+        from models import NotificationCounter
+        with app.app_context():
+            self.assertIsNone(Notification.query.filter_by(message="Bye").first())
+            self.assertEqual(NotificationCounter.query.count(), 0)
+
+
+#                      AFTER-COMMIT HOOK TESTS
+
+class TestCommitHooks(BaseTestCase):
+
+    def test_handlers_run_after_commit_in_order(self):
+        from commit_hooks import on_commit, queue, _handlers
+        calls = []
+        on_commit("test_late", order=100)(lambda items: calls.append(("late", items)))
+        on_commit("test_broken")(lambda items: 1 / 0)
+        on_commit("test_early")(lambda items: calls.append(("early", items)))
+        self.addCleanup(lambda: [_handlers.pop(key) for key in ("test_late", "test_broken", "test_early")])
+        with app.app_context():
+            queue(db.session, "test_late", 1)
+            queue(db.session, "test_broken")
+            queue(db.session, "test_early", 2, 3)
+            self.assertEqual(calls, [])
+            db.session.commit()
+        # The failing handler is logged and skipped; the others still run
+        self.assertEqual(calls, [("early", [2, 3]), ("late", [1])])
+
+    def test_rollback_drops_queued_items(self):
+        from commit_hooks import on_commit, queue, _handlers
+        calls = []
+        on_commit("test_rollback")(calls.append)
+        self.addCleanup(_handlers.pop, "test_rollback")
+        with app.app_context():
+            db.session.execute(db.select(1))
+            queue(db.session, "test_rollback", "never")
+            db.session.rollback()
+            db.session.commit()
+        self.assertEqual(calls, [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,73 @@
+"""
+In-process token-bucket rate limiting.
+
+Each key (an IP, an email, ...) gets a bucket stored as a (tokens, last_update)
+tuple in an OrderedDict. Buckets move to the end whenever they are touched, so
+the idle ones are always at the front and can be evicted in O(1) per call.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class TokenBucketLimiter:
+    """Token buckets keyed by string with TTL and size-based eviction."""
+
+    def __init__(self, ttl_seconds=900, max_keys=100000, clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_keys = max_keys
+        self._clock = clock
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed_total = 0
+        self.rejected_total = 0
+        self.evicted_total = 0
+
+    def allow(self, key, rate, burst, cost=1):
+        """Take `cost` tokens from key's bucket.
+
+        rate is tokens refilled per second, burst the bucket size.
+        Returns (allowed, retry_after_seconds).
+        """
+        now = self._clock()
+        with self._lock:
+            self._evict(now)
+
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                self.allowed_total += 1
+                return True, 0
+
+            self._buckets[key] = (tokens, now)
+            self.rejected_total += 1
+            retry_after = math.ceil((cost - tokens) / rate) if rate > 0 else self.ttl_seconds
+            return False, retry_after
+
+    def _evict(self, now):
+        # Front of the dict = least recently touched; an idle bucket has refilled anyway
+        buckets = self._buckets
+        while buckets:
+            key, (_, updated) = next(iter(buckets.items()))
+            if now - updated < self.ttl_seconds and len(buckets) < self.max_keys:
+                break
+            del buckets[key]
+            self.evicted_total += 1
+
+    def reset(self):
+        with self._lock:
+            self._buckets.clear()
+
+    def __len__(self):
+        return len(self._buckets)
+
+    def stats(self):
+        return {
+            "tracked_keys": len(self._buckets),
+            "allowed_total": self.allowed_total,
+            "rejected_total": self.rejected_total,
+            "evicted_total": self.evicted_total,
+        }
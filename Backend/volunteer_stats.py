@@ -0,0 +1,143 @@
+"""
+Incremental upkeep of the volunteer_stats table.
+
+Every VolunteerHistory insert/delete and every change to EventInvite.completed
+adjusts the user's stats row inside the same transaction (ORM mapper events).
+Bulk deletes skip mapper events, so those go through delete_history() and
+delete_invites() instead. rebuild_volunteer_stats() recomputes everything.
+"""
+from sqlalchemy import event, func, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from models import db, VolunteerHistory, EventInvite, VolunteerStats
+
+stats_table = VolunteerStats.__table__
+history_table = VolunteerHistory.__table__
+
+
+def adjust_stats(connection, user_id, attended=0, completed=0, participation_date=None):
+    """Add deltas to a user's stats row, creating it if needed (SQLite upsert)."""
+    if user_id is None:
+        return
+    values = {
+        "user_id": user_id,
+        "events_attended": max(attended, 0),
+        "completed_count": max(completed, 0),
+        "last_participation": participation_date,
+    }
+    updates = {
+        "events_attended": stats_table.c.events_attended + attended,
+        "completed_count": stats_table.c.completed_count + completed,
+    }
+    if participation_date is not None:
+        new_date = db.literal(participation_date, db.DateTime)
+        updates["last_participation"] = func.max(
+            func.coalesce(stats_table.c.last_participation, new_date), new_date
+        )
+    connection.execute(
+        sqlite_insert(stats_table).values(**values).on_conflict_do_update(
+            index_elements=[stats_table.c.user_id], set_=updates
+        )
+    )
+
+
+def refresh_last_participation(connection, user_id):
+    """After a delete the latest date may be gone; one MAX over the (user_id, date) index."""
+    latest = db.select(func.max(history_table.c.participation_date)).where(
+        history_table.c.user_id == user_id
+    ).scalar_subquery()
+    connection.execute(
+        stats_table.update().where(stats_table.c.user_id == user_id).values(last_participation=latest)
+    )
+
+
+@event.listens_for(VolunteerHistory, 'after_insert')
+def _history_inserted(mapper, connection, target):
+    adjust_stats(connection, target.user_id, attended=1, participation_date=target.participation_date)
+
+
+@event.listens_for(VolunteerHistory, 'after_delete')
+def _history_deleted(mapper, connection, target):
+    adjust_stats(connection, target.user_id, attended=-1)
+    refresh_last_participation(connection, target.user_id)
+
+
+@event.listens_for(EventInvite, 'after_insert')
+def _invite_inserted(mapper, connection, target):
+    if target.completed:
+        adjust_stats(connection, target.user_id, completed=1)
+
+
+@event.listens_for(EventInvite, 'after_update')
+def _invite_updated(mapper, connection, target):
+    history = inspect(target).attrs.completed.history
+    if not history.has_changes():
+        return
+    was_completed = bool(history.deleted and history.deleted[0])
+    if bool(target.completed) != was_completed:
+        adjust_stats(connection, target.user_id, completed=1 if target.completed else -1)
+
+
+@event.listens_for(EventInvite, 'after_delete')
+def _invite_deleted(mapper, connection, target):
+    if target.completed:
+        adjust_stats(connection, target.user_id, completed=-1)
+
+
+def delete_history(*criteria):
+    """Bulk-delete VolunteerHistory rows matching criteria and take them off the stats."""
+    counts = VolunteerHistory.query.with_entities(
+        VolunteerHistory.user_id, func.count()
+    ).filter(*criteria).group_by(VolunteerHistory.user_id).all()
+
+    deleted = VolunteerHistory.query.filter(*criteria).delete(synchronize_session=False)
+    connection = db.session.connection()
+    for user_id, count in counts:
+        adjust_stats(connection, user_id, attended=-count)
+        refresh_last_participation(connection, user_id)
+    return deleted
+
+
+def delete_invites(*criteria):
+    """Bulk-delete EventInvite rows matching criteria, keeping completed_count right."""
+    counts = EventInvite.query.with_entities(
+        EventInvite.user_id, func.count()
+    ).filter(*criteria, EventInvite.completed.is_(True)).group_by(EventInvite.user_id).all()
+
+    deleted = EventInvite.query.filter(*criteria).delete(synchronize_session=False)
+    connection = db.session.connection()
+    for user_id, count in counts:
+        adjust_stats(connection, user_id, completed=-count)
+    return deleted
+
+
+def rebuild_volunteer_stats():
+    """Recompute every stats row from volunteer_history and event_invite."""
+    history = {user_id: (attended, last) for user_id, attended, last in VolunteerHistory.query.with_entities(
+        VolunteerHistory.user_id, func.count(), func.max(VolunteerHistory.participation_date)
+    ).filter(VolunteerHistory.user_id.isnot(None)).group_by(VolunteerHistory.user_id)}
+    completed = dict(EventInvite.query.with_entities(
+        EventInvite.user_id, func.count()
+    ).filter(EventInvite.completed.is_(True)).group_by(EventInvite.user_id).all())
+
+    VolunteerStats.query.delete()
+    rows = [{
+        "user_id": user_id,
+        "events_attended": history.get(user_id, (0, None))[0],
+        "completed_count": completed.get(user_id, 0),
+        "last_participation": history.get(user_id, (0, None))[1],
+    } for user_id in set(history) | set(completed)]
+    if rows:
+        db.session.execute(db.insert(VolunteerStats), rows)
+    db.session.commit()
+    return len(rows)
+
+
+def stats_for_user(user_id):
+    """The user's stats row as a dict (zeros if they have no activity yet)."""
+    stats = db.session.get(VolunteerStats, user_id)
+    return {
+        "events_attended": stats.events_attended if stats else 0,
+        "completed_count": stats.completed_count if stats else 0,
+        "last_participation": stats.last_participation.isoformat() if stats and stats.last_participation else None,
+    }
@@ -53,6 +53,7 @@ export default function App() {
         // Clear localStorage on logout
         localStorage.removeItem('userEmail');
         localStorage.removeItem('userRole');
+        localStorage.removeItem('token');
     };
 
     // Notification queue management
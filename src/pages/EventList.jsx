@@ -1,11 +1,12 @@
 import React, { useEffect, useState } from 'react';
+import { apiFetch } from '../utils/api';
 
 
 export default function EventList({ onSelect }) {
 	const [events, setEvents] = useState([]);
 
 	useEffect(() => {
-		fetch('http://localhost:5001/events')
+		apiFetch('http://localhost:5001/events')
 			.then(res => res.json()) // Read the response and covert to json
 			.then(data => {
 				// Map flask get, and format it for our page then set it
@@ -22,6 +22,7 @@ import CheckCircleIcon from "@mui/icons-material/CheckCircle";
 import CancelIcon from "@mui/icons-material/Cancel";
 // import Header from "../../../components/Header"; // Mocked below
 import { useState, useEffect } from "react";
+import { apiFetch } from "../../../utils/api";
 
 
 const tokens = (mode) => {
@@ -180,7 +181,7 @@ const Dashboard = () => {
   // --- THIS FUNCTION IS NOW FULLY SUPPORTED BY THE BACKEND ---
   const fetchPendingRequests = async () => {
     try {
-      const response = await fetch('http://localhost:5001/invites?status=pending&type=user_request');
+      const response = await apiFetch('http://localhost:5001/invites?status=pending&type=user_request');
       if (!response.ok) {
         throw new Error('Failed to fetch pending requests');
       }
@@ -189,7 +190,7 @@ const Dashboard = () => {
       const enrichedRequests = await Promise.all(
         data.map(async (request) => {
           try {
-            const eventRes = await fetch(`http://localhost:5001/events/${request.event_id}`);
+            const eventRes = await apiFetch(`http://localhost:5001/events/${request.event_id}`);
             if (eventRes.ok) {
               const event = await eventRes.json();
               return { ...request, event };
@@ -219,15 +220,16 @@ const Dashboard = () => {
       setIsLoadingReport(true);
       setReportData([]); // Clear previous data
       
+      // The preview only shows the first rows; the server pages in SQL
       let endpoint = '';
       if (reportTabValue === 0) {
-        endpoint = 'http://localhost:5001/reports/json/volunteer_history';
+        endpoint = 'http://localhost:5001/reports/json/volunteer_history?limit=50';
       } else {
-        endpoint = 'http://localhost:5001/reports/json/event_assignments';
+        endpoint = 'http://localhost:5001/reports/json/event_assignments?limit=50';
       }
       
       try {
-        const response = await fetch(endpoint);
+        const response = await apiFetch(endpoint);
         if (!response.ok) {
           throw new Error('Failed to fetch report data');
         }
@@ -245,7 +247,7 @@ const Dashboard = () => {
 
   const handleApprove = async (inviteId) => {
     try {
-      const response = await fetch(`http://localhost:5001/invites/${inviteId}`, {
+      const response = await apiFetch(`http://localhost:5001/invites/${inviteId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ status: 'accepted' }),
@@ -263,7 +265,7 @@ const Dashboard = () => {
 
   const handleReject = async (inviteId) => {
     try {
-      const response = await fetch(`http://localhost:5001/invites/${inviteId}`, {
+      const response = await apiFetch(`http://localhost:5001/invites/${inviteId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ status: 'declined' }),
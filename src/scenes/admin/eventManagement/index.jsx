@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import CustomMultiSelect from '../../../components/CustomMultiSelect';
 import { SKILLS_LIST, URGENCY_LEVELS } from '../../../utils/constants';
 import { useTheme } from '@mui/material/styles';
+import { apiFetch } from '../../../utils/api';
 
 const EventManagementPage = ({ addNotification }) => {
     const navigate = useNavigate();
@@ -30,7 +31,7 @@ const EventManagementPage = ({ addNotification }) => {
         };
 
         try {
-            const res = await fetch('http://localhost:5001/events', {
+            const res = await apiFetch('http://localhost:5001/events', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(eventFormData),
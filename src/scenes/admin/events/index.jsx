@@ -7,6 +7,7 @@ import ExpandMoreIcon from "@mui/icons-material/ExpandMore";
 import ExpandLessIcon from "@mui/icons-material/ExpandLess";
 import { useState, useEffect } from "react";
 import { SKILLS_LIST } from '../../../utils/constants';
+import { apiFetch } from "../../../utils/api";
 
 const Events = () => {
   const theme = useTheme();
@@ -22,7 +23,7 @@ const Events = () => {
 
   // Fetch events from backend API
   const fetchEvents = () => {
-    fetch('http://localhost:5001/events')
+    apiFetch('http://localhost:5001/events')
       .then(res => res.json())
       .then(data => {
         const formatted = data.map(ev => ({
@@ -67,7 +68,7 @@ const Events = () => {
   const fetchEventVolunteers = async (eventId) => {
     try {
       // Fetch all accepted invites for this event
-      const response = await fetch(`http://localhost:5001/invites?status=accepted`);
+      const response = await apiFetch(`http://localhost:5001/invites?status=accepted`);
       if (!response.ok) {
         throw new Error('Failed to fetch volunteers');
       }
@@ -79,7 +80,7 @@ const Events = () => {
       const volunteersWithDetails = await Promise.all(
         eventInvites.map(async (invite) => {
           try {
-            const userRes = await fetch(`http://localhost:5001/profile/${encodeURIComponent(invite.user_email)}`);
+            const userRes = await apiFetch(`http://localhost:5001/profile/${encodeURIComponent(invite.user_email)}`);
             if (userRes.ok) {
               const profile = await userRes.json();
               return {
@@ -113,7 +114,7 @@ const Events = () => {
 
   const handleToggleCompletion = async (eventId, inviteId, currentStatus) => {
     try {
-      const response = await fetch(`http://localhost:5001/invites/${inviteId}/complete`, {
+      const response = await apiFetch(`http://localhost:5001/invites/${inviteId}/complete`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ completed: !currentStatus }),
@@ -147,7 +148,7 @@ const Events = () => {
 
     // Delete from backend
     try {
-      const response = await fetch(`http://localhost:5001/events/${id}`, {
+      const response = await apiFetch(`http://localhost:5001/events/${id}`, {
         method: 'DELETE',
       });
 
@@ -184,7 +185,7 @@ const Events = () => {
 
   const handleSaveEdit = async (eventId) => {
     try {
-      const response = await fetch(`http://localhost:5001/events/${eventId}`, {
+      const response = await apiFetch(`http://localhost:5001/events/${eventId}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
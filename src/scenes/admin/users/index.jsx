@@ -9,6 +9,7 @@ import DeleteIcon from "@mui/icons-material/Delete";
 import PersonAddIcon from "@mui/icons-material/PersonAdd";
 import Header from "../../../components/Header";
 import { useState, useEffect } from "react";
+import { apiFetch } from "../../../utils/api";
 
 const Users = ({ addNotification }) => {
   const theme = useTheme();
@@ -32,7 +33,7 @@ const Users = ({ addNotification }) => {
 
   // Fetch users from backend
   const fetchUsers = () => {
-    fetch('http://localhost:5001/users')
+    apiFetch('http://localhost:5001/users')
       .then(res => res.json())
       .then(data => {
         setRows(data);
@@ -42,7 +43,7 @@ const Users = ({ addNotification }) => {
 
   // Fetch events for invite dropdown
   const fetchEvents = () => {
-    fetch('http://localhost:5001/events?only_open=true')
+    apiFetch('http://localhost:5001/events?only_open=true')
       .then(res => {
         if (!res.ok) {
           throw new Error(`HTTP error! status: ${res.status}`);
@@ -73,7 +74,7 @@ const Users = ({ addNotification }) => {
     setRows(rows.filter((row) => row.email !== email));
 
     try {
-      const response = await fetch(`http://localhost:5001/users/${email}`, {
+      const response = await apiFetch(`http://localhost:5001/users/${email}`, {
         method: 'DELETE',
       });
 
@@ -95,7 +96,7 @@ const Users = ({ addNotification }) => {
     setRows(rows.map((row) => (row.id === updatedRow.id ? updatedRow : row)));
 
     try {
-      const response = await fetch(`http://localhost:5001/users/${updatedRow.email}`, {
+      const response = await apiFetch(`http://localhost:5001/users/${updatedRow.email}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -123,7 +124,7 @@ const Users = ({ addNotification }) => {
     setRows(rows.map(row => row.email === email ? { ...row, role: newRole } : row));
 
     try {
-      const response = await fetch(`http://localhost:5001/users/${email}`, {
+      const response = await apiFetch(`http://localhost:5001/users/${email}`, {
         method: 'PUT',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({ role: newRole }),
@@ -153,7 +154,7 @@ const Users = ({ addNotification }) => {
     }
 
     try {
-      const response = await fetch('http://localhost:5001/invites', {
+      const response = await apiFetch('http://localhost:5001/invites', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
@@ -10,6 +10,7 @@ import EventNoteIcon from '@mui/icons-material/EventNote';
 import EventIcon from "@mui/icons-material/Event";
 import NotificationsOutlinedIcon from "@mui/icons-material/NotificationsOutlined";
 import MenuOutlinedIcon from "@mui/icons-material/MenuOutlined";
+import { apiFetch } from "../../../utils/api";
 
 const Item = ({ title, to, icon, selected, setSelected }) => {
   const theme = useTheme();
@@ -42,7 +43,7 @@ const Sidebar = () => {
 
       if (userEmail) {
         // Fetch user profile to get full name
-        fetch(`http://localhost:5001/profile/${userEmail}`)
+        apiFetch(`http://localhost:5001/profile/${userEmail}`)
           .then(res => res.json())
           .then(data => {
             if (data.full_name) {
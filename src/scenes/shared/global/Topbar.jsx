@@ -10,6 +10,7 @@ import NotificationsOutlinedIcon from "@mui/icons-material/NotificationsOutlined
 import LogoutIcon from '@mui/icons-material/Logout';
 import SearchIcon from "@mui/icons-material/Search";
 import { mockNotifications } from "../../../data/mockNotifications";
+import { apiFetch } from "../../../utils/api";
 
 const Topbar = ({ onLogout }) => {
     const theme = useTheme();
@@ -21,27 +22,40 @@ const Topbar = ({ onLogout }) => {
     const [notificationAnchor, setNotificationAnchor] = useState(null);
     const [notifications, setNotifications] = useState([]);
     const [unreadCount, setUnreadCount] = useState(0);
+    const userEmail = encodeURIComponent(localStorage.getItem('userEmail') || '');
 
-    // Fetch notifications on component mount and poll for updates
+    // Fetch notifications on mount, then refetch whenever the server pushes one
     useEffect(() => {
         fetchNotifications();
 
-        // Poll every 5 seconds for new notifications
-        const interval = setInterval(fetchNotifications, 5000);
+        const stream = new EventSource(`http://localhost:5001/stream?email=${userEmail}`);
+        stream.addEventListener('notification', fetchNotifications);
+        // Sent when some pushes were missed (e.g. after a long disconnect)
+        stream.addEventListener('reset', fetchNotifications);
 
-        return () => clearInterval(interval);
+        // Slow safety net in case the stream is blocked by a proxy
+        const interval = setInterval(fetchNotifications, 60000);
+
+        return () => {
+            stream.close();
+            clearInterval(interval);
+        };
     }, []);
 
     const fetchNotifications = async () => {
         try {
-            const response = await fetch('http://localhost:5001/notifications');
+            const [response, countResponse] = await Promise.all([
+                apiFetch(`http://localhost:5001/notifications?email=${userEmail}`),
+                apiFetch(`http://localhost:5001/notifications/unread_count?email=${userEmail}`),
+            ]);
             const data = await response.json();
+            const { unread } = await countResponse.json();
 
             // Format notifications for display
             const formattedNotifications = data.map(notif => ({
                 id: notif.id,
                 message: notif.message,
-                time: new Date(notif.time).toLocaleString('en-US', {
+                time: new Date(notif.created_at).toLocaleString('en-US', {
                     month: 'short',
                     day: 'numeric',
                     hour: 'numeric',
@@ -51,7 +65,7 @@ const Topbar = ({ onLogout }) => {
             }));
 
             setNotifications(formattedNotifications);
-            setUnreadCount(formattedNotifications.filter(n => !n.read).length);
+            setUnreadCount(unread);
         } catch (error) {
             console.error("Failed to fetch notifications:", error);
             // Fallback to mock data if backend fails
@@ -82,7 +96,7 @@ const Topbar = ({ onLogout }) => {
 
         // Update backend
         try {
-            await fetch(`http://localhost:5001/notifications/${notificationId}/read`, {
+            await apiFetch(`http://localhost:5001/notifications/${notificationId}/read?email=${userEmail}`, {
                 method: 'PUT',
             });
         } catch (error) {
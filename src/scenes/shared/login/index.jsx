@@ -33,6 +33,8 @@ const LoginPage = ({ setLoggedInUser, addNotification }) => {
             // Save user data to localStorage for session persistence
             localStorage.setItem('userEmail', user.email);
             localStorage.setItem('userRole', user.role);
+            // Lets the backend skip its user lookup on per-user reads (see utils/api.js)
+            localStorage.setItem('token', data.token);
 
             addNotification("Login successful!", "success");
 
@@ -4,6 +4,7 @@ import { tokens } from "../../../theme";
 import PersonIcon from '@mui/icons-material/Person';
 import CheckBoxIcon from '@mui/icons-material/CheckBox';
 import CalendarMonthIcon from '@mui/icons-material/CalendarMonth';
+import { apiFetch } from '../../../utils/api';
 
 const AdminNotifications = ({ addNotification }) => {
     const theme = useTheme();
@@ -30,8 +31,8 @@ const AdminNotifications = ({ addNotification }) => {
     const fetchAdminStats = async () => {
         try {
             // Placeholder - Need to implement these endpoints in Flask later on if we push to Reclaim
-            const eventsRes = await fetch('http://localhost:5001/events');
-            const usersRes = await fetch('http://localhost:5001/users');
+            const eventsRes = await apiFetch('http://localhost:5001/events');
+            const usersRes = await apiFetch('http://localhost:5001/users');
 
             if (!eventsRes.ok || !usersRes.ok) {
                 throw new Error('Failed to fetch statistics');
@@ -64,7 +65,7 @@ const AdminNotifications = ({ addNotification }) => {
             });
 
             // Fetch real activity data from backend
-            const activityRes = await fetch('http://localhost:5001/activity');
+            const activityRes = await apiFetch('http://localhost:5001/activity');
 
             if (!activityRes.ok) {
                 throw new Error('Failed to fetch activity data');
@@ -115,9 +116,23 @@ const AdminNotifications = ({ addNotification }) => {
     const ActivityItem = ({ activity }) => {
         const getActivityIcon = (type) => {
             switch(type) {
-                case 'registration': return <PersonIcon />;
-                case 'event_signup': return <CheckBoxIcon />;
-                case 'event_created': return <CalendarMonthIcon />;
+                case 'registration':
+                case 'profile_updated':
+                case 'user_updated':
+                case 'user_deleted':
+                    return <PersonIcon />;
+                case 'event_signup':
+                case 'signup_requested':
+                case 'admin_invite':
+                case 'invite_declined':
+                case 'invite_deleted':
+                case 'invite_completed':
+                case 'invite_uncompleted':
+                    return <CheckBoxIcon />;
+                case 'event_created':
+                case 'event_updated':
+                case 'event_deleted':
+                    return <CalendarMonthIcon />;
                 default: return <span></span>;
             }
         };
@@ -135,6 +150,28 @@ const AdminNotifications = ({ addNotification }) => {
                     return `${userDisplay} signed up for ${activity.event}`;
                 case 'event_created':
                     return `New event created: ${activity.event}`;
+                case 'event_updated':
+                    return `Event updated: ${activity.event}`;
+                case 'event_deleted':
+                    return `Event deleted: ${activity.event}`;
+                case 'signup_requested':
+                    return `${userDisplay} requested to join ${activity.event}`;
+                case 'admin_invite':
+                    return `${userDisplay} was invited to ${activity.event}`;
+                case 'invite_declined':
+                    return `${userDisplay} was declined for ${activity.event}`;
+                case 'invite_deleted':
+                    return `${userDisplay} was removed from ${activity.event}`;
+                case 'invite_completed':
+                    return `${userDisplay} completed ${activity.event}`;
+                case 'invite_uncompleted':
+                    return `${userDisplay} marked not completed for ${activity.event}`;
+                case 'profile_updated':
+                    return `${userDisplay} updated their profile`;
+                case 'user_updated':
+                    return `User updated: ${userDisplay}`;
+                case 'user_deleted':
+                    return `User deleted: ${userDisplay}`;
                 default:
                     return 'Activity';
             }
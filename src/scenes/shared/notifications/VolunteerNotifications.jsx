@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
 import { useNavigate } from 'react-router-dom';
+import { apiFetch } from '../../../utils/api';
 
 const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
     const navigate = useNavigate();
@@ -18,9 +19,22 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
         fetchUserEvents();
         fetchPendingInvites();
 
-        // Polling for invites every 5 seconds
-        const interval = setInterval(fetchPendingInvites, 5000);
-        return () => clearInterval(interval);
+        // Refetch when the server pushes an invite change for this user
+        const stream = new EventSource(`http://localhost:5001/stream?email=${encodeURIComponent(loggedInUser.email)}`);
+        const refresh = () => {
+            fetchPendingInvites();
+            fetchUserEvents();
+        };
+        stream.addEventListener('invite', refresh);
+        stream.addEventListener('invite_deleted', refresh);
+        stream.addEventListener('reset', refresh);
+
+        // Slow safety net in case the stream is blocked by a proxy
+        const interval = setInterval(fetchPendingInvites, 60000);
+        return () => {
+            stream.close();
+            clearInterval(interval);
+        };
     }, [loggedInUser?.email, navigate]);
 
     const fetchPendingInvites = async () => {
@@ -28,7 +42,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
             const userEmail = loggedInUser.email || localStorage.getItem('userEmail');
             if (!userEmail) return;
 
-            const res = await fetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}?status=pending&type=admin_invite`);
+            const res = await apiFetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}?status=pending&type=admin_invite`);
 
             if (!res.ok) {
                 throw new Error('Failed to fetch invites');
@@ -52,7 +66,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
 
             console.log('Fetching events for user:', userEmail);
 
-            const res = await fetch(`http://localhost:5001/user/${encodeURIComponent(userEmail)}/events`);
+            const res = await apiFetch(`http://localhost:5001/user/${encodeURIComponent(userEmail)}/events`);
 
             if (!res.ok) {
                 const errorText = await res.text();
@@ -84,7 +98,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
 
     const handleAcceptInvite = async (inviteId) => {
         try {
-            const response = await fetch(`http://localhost:5001/invites/${inviteId}`, {
+            const response = await apiFetch(`http://localhost:5001/invites/${inviteId}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ status: 'accepted' }),
@@ -108,7 +122,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
 
     const handleDeclineInvite = async (inviteId) => {
         try {
-            const response = await fetch(`http://localhost:5001/invites/${inviteId}`, {
+            const response = await apiFetch(`http://localhost:5001/invites/${inviteId}`, {
                 method: 'PUT',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({ status: 'declined' }),
@@ -141,7 +155,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
 
         try {
             // Find the invite ID for this user and event
-            const response = await fetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
+            const response = await apiFetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
             if (!response.ok) {
                 throw new Error('Failed to fetch invites');
             }
@@ -155,7 +169,7 @@ const VolunteerNotifications = ({ loggedInUser, addNotification }) => {
             }
 
             // Delete the invite
-            const deleteResponse = await fetch(`http://localhost:5001/invites/${invite.id}`, {
+            const deleteResponse = await apiFetch(`http://localhost:5001/invites/${invite.id}`, {
                 method: 'DELETE',
             });
 
@@ -3,6 +3,7 @@ import { useNavigate } from 'react-router-dom';
 import CustomMultiSelect from '../../../components/CustomMultiSelect';
 import { XIcon } from '../../../components/Icons';
 import { US_STATES, SKILLS_LIST } from '../../../utils/constants';
+import { apiFetch } from '../../../utils/api';
 
 const ProfilePage = ({ loggedInUser, setLoggedInUser, addNotification }) => {
     const navigate = useNavigate();
@@ -28,7 +29,7 @@ const ProfilePage = ({ loggedInUser, setLoggedInUser, addNotification }) => {
 
         (async () => {
             try {
-                const res = await fetch(`http://localhost:5001/profile/${encodeURIComponent(loggedInUser.email)}`);
+                const res = await apiFetch(`http://localhost:5001/profile/${encodeURIComponent(loggedInUser.email)}`);
                 if (!res.ok) throw new Error(`Failed to load profile (${res.status})`);
                 const p = await res.json();
 
@@ -65,7 +66,7 @@ const ProfilePage = ({ loggedInUser, setLoggedInUser, addNotification }) => {
         };
 
         try {
-            const res = await fetch(`http://localhost:5001/profile/${encodeURIComponent(loggedInUser.email)}`, {
+            const res = await apiFetch(`http://localhost:5001/profile/${encodeURIComponent(loggedInUser.email)}`, {
                 method: "PUT",
                 headers: { "Content-Type": "application/json" },
                 body: JSON.stringify(profileForm),
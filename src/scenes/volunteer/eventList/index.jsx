@@ -1,4 +1,5 @@
 import { useEffect, useState } from 'react';
+import { apiFetch } from '../../../utils/api';
 
 const EventList = ({ addNotification }) => {
     const [events, setEvents] = useState([]);
@@ -11,7 +12,7 @@ const EventList = ({ addNotification }) => {
     const [filterUrgency, setFilterUrgency] = useState('');
 
     const fetchEvents = () => {
-        fetch('http://localhost:5001/events')
+        apiFetch('http://localhost:5001/events')
             .then(res => {
                 if (!res.ok) {
                     throw new Error(`HTTP error! status: ${res.status}`);
@@ -47,7 +48,7 @@ const EventList = ({ addNotification }) => {
         if (!userEmail) return;
 
         try {
-            const response = await fetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
+            const response = await apiFetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
             if (response.ok) {
                 const invites = await response.json();
 
@@ -104,7 +105,7 @@ const EventList = ({ addNotification }) => {
         }
 
         try {
-            const response = await fetch('http://localhost:5001/invites', {
+            const response = await apiFetch('http://localhost:5001/invites', {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify({
@@ -148,7 +149,7 @@ const EventList = ({ addNotification }) => {
 
         try {
             // Find the invite ID for this user and event
-            const response = await fetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
+            const response = await apiFetch(`http://localhost:5001/invites/user/${encodeURIComponent(userEmail)}`);
             if (!response.ok) {
                 throw new Error('Failed to fetch invites');
             }
@@ -162,7 +163,7 @@ const EventList = ({ addNotification }) => {
             }
 
             // Delete the invite
-            const deleteResponse = await fetch(`http://localhost:5001/invites/${invite.id}`, {
+            const deleteResponse = await apiFetch(`http://localhost:5001/invites/${invite.id}`, {
                 method: 'DELETE',
             });
 
@@ -0,0 +1,12 @@
+// fetch() for backend calls: sends the session token from login when there is one.
+// The token only lets the backend skip its user lookup; calls work without it.
+export const apiFetch = (url, options = {}) => {
+    const token = localStorage.getItem('token');
+    if (!token) {
+        return fetch(url, options);
+    }
+    return fetch(url, {
+        ...options,
+        headers: { ...options.headers, Authorization: `Bearer ${token}` },
+    });
+};